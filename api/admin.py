@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, File, UploadFile, Form
+from fastapi import APIRouter, Depends, HTTPException, File, UploadFile, Form, Response
 
 router = APIRouter(prefix="/admin", tags=["api/admin"])
 
@@ -16,101 +16,95 @@ from utils.forms import ReviewBody
 
 # -------- DBM Imports --------
 from utils.dbm import (
-    get_atlas_session, get_dc_session,
+    get_atlas_async_session, get_dc_async_session,
     CohortDefinition,
     CertOath, ChrtInfo, ChrtCert,
     SchmInfo, SchmConnectInfo,
-    provision_user, copy_tables_by_cohort_id
+    provision_user_isolated
 )
-from utils.auth import verify_token
-
-from sqlmodel import Session, select, update, or_
+from utils.identity import Identity, require_admin, identity_cache_stats, invalidate_identity
+from utils.jobs import enqueue_materialization, retry_job, get_job, list_jobs
+from utils.stats import load_stats, patient_count, record_counts
+from utils.loaders import load_applied_cohorts, load_cert_oaths, load_user_names
+from utils.paging import PageParams, APPLY_SORTS, page_params, page_rows
+from utils.fanout import fan_out, sequence
+from utils.pools import pool_stats
+from utils.blobs import reconcile_documents
+from utils.cleanup import enqueue_gc, get_gc_run, list_gc_runs
+from utils.auth import token_cache_stats, invalidate_tokens
+
+from sqlmodel import select, update, or_
+from sqlmodel.ext.asyncio.session import AsyncSession
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy import Table, MetaData, Column, String
 from sqlalchemy.schema import CreateSchema, DropSchema
 
 
 # -------- Tool Imports --------
-from utils.tools import findout_id, findout_name, findout_role, mapping_id_name
+from utils.tools import findout_name
 
 
 # -------- Logging Setup --------
-import logging
-logger = logging.getLogger("uvicorn.error")
-logger.setLevel(logging.DEBUG)
+from utils.logs import get_logger
+logger = get_logger(__name__)
 
 
 # -------- Routes --------
 @router.get("/")
 async def get_all_cohorts(
-    session_atlas: Session = Depends(get_atlas_session),
-    user = Depends(verify_token)):
-
-    user_role = "public" if findout_role(session_atlas, user["sub"]) else "admin"
-
-    if user_role == "public":
-        raise HTTPException(status_code=402, detail="User is not an admin")
+    identity: Identity = Depends(require_admin)):
 
     return "Allowed"
 
 @router.get("/applies")
 async def get_all_applies(
-    session_atlas: Session = Depends(get_atlas_session),
-    session_dc: Session =  Depends(get_dc_session),
-    user = Depends(verify_token)) -> list[dict]:
-
-    user_role = "public" if findout_role(session_atlas, user["sub"]) else "admin"
+    response: Response,
+    page: PageParams = Depends(page_params),
+    session_atlas: AsyncSession = Depends(get_atlas_async_session),
+    session_dc: AsyncSession = Depends(get_dc_async_session),
+    identity: Identity = Depends(require_admin)) -> list[dict]:
 
-    if user_role == "public":
-        raise HTTPException(status_code=402, detail="User is not an admin")
+    # ChrtInfo 와 ChrtCert 는 DB 에서 join, 문서는 한 번에 가져옴
+    applies = await load_applied_cohorts(session_dc, page=page)
+    applies, next_cursor = page_rows(applies, page, APPLY_SORTS)
+    chrt_infos = [ci for ci, _ in applies]
 
-    stmt = select(ChrtCert).where(ChrtCert.cur_status != "before_apply")
-    chrt_certs = session_dc.exec(stmt).all()
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = next_cursor
 
-    applied_ids = [cc.id for cc in chrt_certs]
+    ids = list(set([ci.owner for ci in chrt_infos]))
 
-    stmt = select(ChrtInfo).where(ChrtInfo.id.in_(applied_ids))
-    chrt_infos = session_dc.exec(stmt).all()
-
-    ids = [ci.owner for ci in chrt_infos]
-
-    id_name_mapping = mapping_id_name(session_atlas, ids)
-
-    import random
+    # ATLAS 사용자 이름과 DataCenter 통계, 문서는 동시에 조회
+    id_name_mapping, (chrt_stats, cert_oaths) = await fan_out(
+        load_user_names(session_atlas, ids),
+        sequence(
+            load_stats(session_dc, chrt_infos),
+            load_cert_oaths(session_dc, [ci.id for ci in chrt_infos])))
 
     results = []
 
-    if chrt_certs is None:
-        return results
-    
-    for ci in chrt_infos:
-        for cr in chrt_certs:
-            if ci.id == cr.id:
-                tables = [False for i in range(46)] if ci.tables is None else [True if table in ci.tables else False for table in list(TABLE_NAME.__members__.keys())]
-                cohort_info_temp = CohortInfoTemp(ci.id, ci.name, ci.description, random.randint(0, 203040),
-                                                id_name_mapping[ci.owner], ci.created_at, ci.modified_at, ci.origin)
-                cohort_cert_temp = CohortCertTemp(cr.applied_at, cr.resolved_at, cr.cur_status, cr.review)
-                table_info_temp = TableInfoTemp([random.randint(0,203040) for r in range(46)], tables)
+    for ci, cr in applies:
+        tables = [False for i in range(46)] if ci.tables is None else [True if table in ci.tables else False for table in list(TABLE_NAME.__members__.keys())]
+        cohort_info_temp = CohortInfoTemp(ci.id, ci.name, ci.description, patient_count(chrt_stats.get(ci.id)),
+                                        id_name_mapping[ci.owner], ci.created_at, ci.modified_at, ci.origin)
+        cohort_cert_temp = CohortCertTemp(cr.applied_at, cr.resolved_at, cr.cur_status, cr.review)
+        table_info_temp = TableInfoTemp(record_counts(chrt_stats.get(ci.id)), tables)
 
-                stmt = select(CertOath).where(CertOath.document_for == ci.id)
-                cert_oaths = session_dc.exec(stmt).all()
+        irb_drb_temps = []
 
-                irb_drb_temps = []
+        for co in cert_oaths[ci.id]:
+            irb_drb_temps.append(IRBDRBTemp(co.name, co.path, co.size, co.mime, co.sha256, co.uploaded_at, co.id))
 
-                for co in cert_oaths:
-                    docs_path = os.path.abspath(__file__ + "/../../documents")
+        file_group_temp = FileGroupTemp(irb_drb_temps)
 
-                    irb_drb_temps.append(IRBDRBTemp(co.name, co.path, os.path.getsize(docs_path + co.path)))
-
-                file_group_temp = FileGroupTemp(irb_drb_temps)
-
-                results.append(
-                    AdminCohortDetailTemp(
-                        cohort_info_temp,
-                        cohort_cert_temp,
-                        table_info_temp,
-                        file_group_temp
-                    ).json(table_name_only=True)
-                )
+        results.append(
+            AdminCohortDetailTemp(
+                cohort_info_temp,
+                cohort_cert_temp,
+                table_info_temp,
+                file_group_temp
+            ).json(table_name_only=True)
+        )
 
     return results
 
@@ -118,44 +112,38 @@ async def get_all_applies(
 async def approve_cohort_by_id(
     cohort_id: int,
     review: ReviewBody | None,
-    session_atlas: Session = Depends(get_atlas_session),
-    session_dc: Session = Depends(get_dc_session),
-    user = Depends(verify_token)) -> dict:
+    session_dc: AsyncSession = Depends(get_dc_async_session),
+    identity: Identity = Depends(require_admin)) -> dict:
 
     if cohort_id is None:
         logger.error("Cohort id not found")
         raise HTTPException(status_code=404, detail="Cohort id not found")
 
-    user_role = "public" if findout_role(session_atlas, user["sub"]) else "admin"
-
-    if user_role == "public":
-        raise HTTPException(status_code=402, detail="User is not an admin")
-    
     stmt = select(ChrtCert).where(ChrtCert.id == cohort_id)
-    chrt_cert = session_dc.exec(stmt).first()
+    chrt_cert = (await session_dc.exec(stmt)).first()
 
     chrt_cert.cur_status = "approved"
     chrt_cert.resolved_at = datetime.now()
     chrt_cert.review = review.review if review is not None else None
     session_dc.add(chrt_cert)
-    session_dc.commit()
+    await session_dc.commit()
 
     stmt = select(ChrtInfo).where(ChrtInfo.id == cohort_id)
-    chrt_info = session_dc.exec(stmt).first()
+    chrt_info = (await session_dc.exec(stmt)).first()
     
     user_id = chrt_info.owner
 
     # Get SchmInfo
     stmt = select(SchmInfo).where(SchmInfo.owner == user_id, SchmInfo.schema_from == cohort_id)
-    schm_info = session_dc.exec(stmt).first()
+    schm_info = (await session_dc.exec(stmt)).first()
     
     # Get SchmConnectInfo
     stmt = select(SchmConnectInfo).where(SchmConnectInfo.id == schm_info.id)
-    schm_cinfo = session_dc.exec(stmt).first()
+    schm_cinfo = (await session_dc.exec(stmt)).first()
 
     # Create SchmConnectInfo
     if schm_cinfo is None:
-        logger.debug(f"Creating schema connect info")
+        logger.debug("Creating schema connect info")
 
         # Connect Information
         host = "34.64.249.196" # "127.0.0.1"
@@ -171,134 +159,205 @@ async def approve_cohort_by_id(
         schm_cinfo.password = password
         
         session_dc.add(schm_cinfo)
-        session_dc.commit()
+        await session_dc.commit()
 
         schema_name = f"schema_{user_id}_{schm_info.id}"
 
-        session_dc.exec(CreateSchema(schema_name, True))
-        session_dc.commit()
+        await session_dc.exec(CreateSchema(schema_name, True))
+        await session_dc.commit()
 
-        provision_user(session_dc, username, password, "datacenter", schema_name)
+        await run_in_threadpool(provision_user_isolated, username, password, "datacenter", schema_name)
 
-        copy_tables_by_cohort_id(session_atlas, session_dc, schema_name, cohort_id)
+        # 테이블 복사는 백그라운드 작업으로 처리
+        job = enqueue_materialization(cohort_id, schema_name)
 
-    return {"msg": "success"}
+        return {"msg": "success", "jobId": job.id}
+
+    return {"msg": "success", "jobId": None}
+
+@router.post("/applies/id/{cohort_id}/materialize")
+async def rematerialize_cohort_by_id(
+    cohort_id: int,
+    session_dc: AsyncSession = Depends(get_dc_async_session),
+    identity: Identity = Depends(require_admin)) -> dict:
+
+    # 재시작 등으로 작업 기록이 사라진 승인된 코호트를 다시 복사
+    # 이미 복사된 테이블은 건너뛰므로 남은 테이블만 복사됨
+    stmt = select(ChrtCert).where(ChrtCert.id == cohort_id)
+    chrt_cert = (await session_dc.exec(stmt)).first()
+
+    if chrt_cert is None or chrt_cert.cur_status != "approved":
+        raise HTTPException(status_code=409, detail="Only approved cohorts can be materialized")
+
+    stmt = select(SchmInfo).where(SchmInfo.schema_from == cohort_id)
+    schm_info = (await session_dc.exec(stmt)).first()
+
+    if schm_info is None:
+        raise HTTPException(status_code=404, detail="Schema of the cohort not found")
+
+    # 진행 중인 작업이 있으면 그대로 반환
+    for job in list_jobs(cohort_id):
+        if job.status in ("queued", "running"):
+            return {"msg": "running", "jobId": job.id}
+
+    job = enqueue_materialization(cohort_id, f"schema_{schm_info.owner}_{schm_info.id}")
+
+    return {"msg": "success", "jobId": job.id}
+
+@router.get("/jobs")
+async def get_materialize_jobs(
+    cohort_id: int | None = None,
+    identity: Identity = Depends(require_admin)) -> list[dict]:
+
+    return [job.json() for job in list_jobs(cohort_id)]
+
+@router.get("/jobs/{job_id}")
+async def get_materialize_job(
+    job_id: int,
+    identity: Identity = Depends(require_admin)) -> dict:
+
+    job = get_job(job_id)
+
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    return job.json()
+
+@router.post("/jobs/{job_id}/retry")
+async def retry_materialize_job(
+    job_id: int,
+    identity: Identity = Depends(require_admin)) -> dict:
+
+    if get_job(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    job = retry_job(job_id)
+
+    if job is None:
+        raise HTTPException(status_code=409, detail="Only failed jobs can be retried")
+
+    return job.json()
+
+@router.get("/cache/identity")
+async def get_identity_cache(
+    identity: Identity = Depends(require_admin)) -> dict:
+
+    return identity_cache_stats()
+
+@router.post("/cache/identity/invalidate")
+async def invalidate_identity_cache(
+    name: str | None = None,
+    identity: Identity = Depends(require_admin)) -> dict:
+
+    # name 이 없으면 전체 비움 (ATLAS 에서 권한이 바뀐 경우)
+    invalidate_identity(name)
+
+    return identity_cache_stats()
+
+@router.get("/cache/token")
+async def get_token_cache(
+    identity: Identity = Depends(require_admin)) -> dict:
+
+    return token_cache_stats()
+
+@router.post("/cache/token/invalidate")
+async def invalidate_token_cache(
+    identity: Identity = Depends(require_admin)) -> dict:
+
+    # 다음 요청부터 모든 토큰의 서명과 만료를 다시 검증
+    invalidate_tokens()
+
+    return token_cache_stats()
+
+@router.get("/pools")
+async def get_pool_stats(
+    identity: Identity = Depends(require_admin)) -> dict:
+
+    return pool_stats()
 
 @router.post("/applies/id/{cohort_id}/reject")
 async def reject_cohort_by_id(
     cohort_id: int,
     review: ReviewBody | None,
-    session_atlas: Session = Depends(get_atlas_session),
-    session_dc: Session = Depends(get_dc_session),
-    user = Depends(verify_token)) -> dict:
+    session_dc: AsyncSession = Depends(get_dc_async_session),
+    identity: Identity = Depends(require_admin)) -> dict:
 
     if cohort_id is None:
         logger.error("Cohort id not found")
         raise HTTPException(status_code=404, detail="Cohort id not found")
 
-    user_role = "public" if findout_role(session_atlas, user["sub"]) else "admin"
-
-    if user_role == "public":
-        raise HTTPException(status_code=402, detail="User is not an admin")
-    
     stmt = select(ChrtCert).where(ChrtCert.id == cohort_id)
-    chrt_cert = session_dc.exec(stmt).first()
+    chrt_cert = (await session_dc.exec(stmt)).first()
 
     chrt_cert.cur_status = "rejected"
     chrt_cert.resolved_at = datetime.now()
     chrt_cert.review = review.review if review is not None else None
     session_dc.add(chrt_cert)
-    session_dc.commit()
+    await session_dc.commit()
 
     stmt = select(ChrtInfo).where(ChrtInfo.id == cohort_id)
-    chrt_info = session_dc.exec(stmt).first()
+    chrt_info = (await session_dc.exec(stmt)).first()
     
     user_id = chrt_info.owner
 
     # Get SchmInfo
     stmt = select(SchmInfo).where(SchmInfo.owner == user_id, SchmInfo.schema_from == cohort_id)
-    schm_info = session_dc.exec(stmt).first()
+    schm_info = (await session_dc.exec(stmt)).first()
     
     # Get SchmConnectInfo
     stmt = select(SchmConnectInfo).where(SchmConnectInfo.id == schm_info.id)
-    schm_cinfo = session_dc.exec(stmt).first()
+    schm_cinfo = (await session_dc.exec(stmt)).first()
 
     # Create SchmConnectInfo
     if schm_cinfo is not None:
-        session_dc.delete(schm_cinfo)
-        session_dc.commit()
+        await session_dc.delete(schm_cinfo)
+        await session_dc.commit()
 
     return {"msg": "success"}
 
-@router.get("/clean/document")
+@router.post("/clean/document")
 async def clean_documents(
-    session_atlas: Session = Depends(get_atlas_session),
-    session_dc: Session = Depends(get_dc_session),
-    user = Depends(verify_token)):
-
-    user_role = "public" if findout_role(session_atlas, user["sub"]) else "admin"
-
-    if user_role == "public":
-        raise HTTPException(status_code=402, detail="User is not an admin")
-    
-    docs_path = os.path.abspath(__file__ + "/../../documents")
-
-    # 1. documents 내 폴더 이름이 db에 cohort_id로 정의되어 있지 않은 경우,
-    #    해당 폴더 삭제
-    stmt = select(ChrtInfo)
-    chrt_infos = session_dc.exec(stmt).all()
+    dry_run: bool = True,
+    identity: Identity = Depends(require_admin)) -> dict:
 
-    cids = [ci.id for ci in chrt_infos]
+    # 백그라운드에서 실행, dry_run 이면 삭제 대상만 보고
+    return enqueue_gc(dry_run).json()
 
-    doc_listdir = os.listdir(docs_path)
+@router.get("/clean/document/runs")
+async def get_document_gc_runs(
+    identity: Identity = Depends(require_admin)) -> list[dict]:
 
-    if chrt_infos is None:
-        logger.debug(f"Cohort info is empty")
-        return True
-    
-    for dir in doc_listdir: 
-        if not int(dir) in cids:
-            doc_listfile = os.listdir(docs_path + "/" + dir)
+    return [run.json() for run in list_gc_runs()]
 
-            for file in doc_listfile:
-                os.remove(f"{docs_path}/{dir}/{file}")
-                # logger.debug(f"File is removed: {dir}/{file}")
+@router.get("/clean/document/runs/{run_id}")
+async def get_document_gc_run(
+    run_id: int,
+    identity: Identity = Depends(require_admin)) -> dict:
 
-            os.removedirs(f"{docs_path}/{dir}")
-            logger.debug(f"Folder is removed: {dir}")
+    run = get_gc_run(run_id)
 
-    # 2. documents 내 {cohort_id} 폴더 안에 cert oath 테이블에 없는 파일이 존재하는 경우,
-    #    해당 파일 삭제
-    doc_listdir = os.listdir(docs_path)
-
-    stmt = select(CertOath)
-    cert_oaths = session_dc.exec(stmt).all()
-
-    if cert_oaths is None:
-        logger.debug(f"Cert oath is empty")
-        return True
+    if run is None:
+        raise HTTPException(status_code=404, detail="GC run not found")
 
-    cert_oath_paths = [co.path for co in cert_oaths]
+    return run.json()
 
-    for dir in doc_listdir:
-        doc_listfile = os.listdir(docs_path + "/" + dir)
+@router.post("/documents/reconcile")
+async def reconcile_document_records(
+    fix: bool = False,
+    verify: bool = False,
+    identity: Identity = Depends(require_admin)) -> dict:
 
-        for file in doc_listfile:
-            if not f"/{dir}/{file}" in cert_oath_paths:
-                os.remove(f"{docs_path}/{dir}/{file}")
-                logger.debug(f"File is removed: {dir}/{file}")
-            
-    return True
+    # fix 가 없으면 어긋난 항목만 보고, verify 는 모든 파일의 hash 를 다시 계산 (느림)
+    return await run_in_threadpool(reconcile_documents, fix, verify)
 
 @router.get("/clean/schema")
 async def clean_schema(
-    session_atlas: Session = Depends(get_atlas_session),
-    session_dc: Session = Depends(get_dc_session),
-    user = Depends(verify_token)):
+    session_dc: AsyncSession = Depends(get_dc_async_session),
+    identity: Identity = Depends(require_admin)):
 
     # SchmInfo 존재 여부에 따라 로직이 달라질 예정
     stmt = select(SchmInfo)
-    schm_infos = session_dc.exec(stmt).all()
+    schm_infos = (await session_dc.exec(stmt)).all()
 
     if schm_infos is None:
         logger.debug("Schema info is empty")
@@ -315,16 +374,16 @@ async def clean_schema(
     )
 
     stmt = select(schemata.c.schema_name).where(or_(schemata.c.schema_name.ilike(f"%schema_%")))
-    schema_names = session_dc.exec(stmt).all()
+    schema_names = (await session_dc.exec(stmt)).all()
 
-    logger.debug(f"Schema List: {schema_names}")
+    logger.debug("Schema List: %s", schema_names)
 
     schema_names_on_db = [f"schema_{si.owner}_{si.id}" for si in schm_infos]
 
     for schema_name in schema_names:
         if not schema_name in schema_names_on_db:
-            session_dc.exec(DropSchema(schema_name, cascade=True, if_exists=True))
-            logger.debug(f"Schema is removed: {schema_name}")
-    session_dc.commit()
+            await session_dc.exec(DropSchema(schema_name, cascade=True, if_exists=True))
+            logger.debug("Schema is removed: %s", schema_name)
+    await session_dc.commit()
 
     return True
\ No newline at end of file
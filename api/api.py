@@ -38,9 +38,8 @@ from utils.tools import compare_dates, findout_id, findout_name, findout_role
 
 
 # -------- Logging Setup --------
-import logging
-logger = logging.getLogger("uvicorn.error")
-logger.setLevel(logging.DEBUG)
+from utils.logs import get_logger
+logger = get_logger(__name__)
 
 
 # -------- Routes --------
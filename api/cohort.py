@@ -1,9 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException, File, UploadFile, Form
+from fastapi import APIRouter, Depends, HTTPException, File, UploadFile, Form, Response
 
 router = APIRouter(prefix="/cohort", tags=["api/cohort"])
 
 # -------- Imports --------
 import os
+import json
 import aiofiles
 from datetime import datetime
 
@@ -12,48 +13,63 @@ from utils.structure import CohortDetail, CohortInfoTemp, CohortDetailTemp, Tabl
 
 # -------- DBM Imports --------
 from utils.dbm import (
-    get_atlas_session, get_dc_session,
+    get_atlas_async_session, get_dc_async_session,
     CohortDefinition,
     CertOath, ChrtInfo, ChrtCert,
     SchmInfo, SchmConnectInfo,
 )
 from utils.auth import verify_token
+from utils.identity import Identity, get_identity
 
-from sqlmodel import Session, select, update
+from sqlmodel import select, update
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 
 # -------- Tool Imports --------
-from utils.tools import findout_id, findout_name, mapping_id_name
+from utils.stats import load_stats, patient_count, record_counts
+from utils.loaders import load_user_names
+from utils.fanout import fan_out
+from utils.paging import PageParams, page_params, apply_page, page_rows
+from utils.uploads import StagedUpload, stage_uploads, discard_uploads, guess_mime
+from utils.blobs import blob_path, is_sha256, acquire_blob, acquire_stored_blob, release_cert_oaths, find_blob
 
 
 # -------- Logging Setup --------
-import logging
-logger = logging.getLogger("uvicorn.error")
-logger.setLevel(logging.DEBUG)
+from utils.logs import get_logger
+logger = get_logger(__name__)
 
 
 # -------- Routes --------
 @router.get("/")
 async def get_all_cohorts(
-    session_atlas: Session = Depends(get_atlas_session),
-    session_dc: Session =  Depends(get_dc_session),
+    response: Response,
+    page: PageParams = Depends(page_params),
+    session_atlas: AsyncSession = Depends(get_atlas_async_session),
+    session_dc: AsyncSession = Depends(get_dc_async_session),
     user = Depends(verify_token)) -> list[dict]:
 
     stmt = select(ChrtInfo)
-    chrt_infos = session_dc.exec(stmt).all()
 
-    ids = list(set([ci.owner for ci in chrt_infos]))
+    if page.status is not None:
+        stmt = stmt.join(ChrtCert, ChrtCert.id == ChrtInfo.id)
+
+    stmt = apply_page(stmt, page, ChrtInfo.created_at)
+    chrt_infos, next_cursor = page_rows((await session_dc.exec(stmt)).all(), page)
 
-    id_name_mapping = mapping_id_name(session_atlas, ids)
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = next_cursor
 
-    logger.debug(f"ids: {ids}, id_name_mapping: {id_name_mapping}")
+    ids = list(set([ci.owner for ci in chrt_infos]))
 
-    import random
+    # ATLAS 사용자 이름과 DataCenter 통계는 동시에 조회
+    id_name_mapping, chrt_stats = await fan_out(
+        load_user_names(session_atlas, ids),
+        load_stats(session_dc, chrt_infos))
 
     results = []
     for ci in chrt_infos:
         results.append(
-            CohortInfoTemp(ci.id, ci.name, ci.description, random.randint(0, 203040),
+            CohortInfoTemp(ci.id, ci.name, ci.description, patient_count(chrt_stats.get(ci.id)),
                              id_name_mapping[ci.owner], ci.created_at, ci.modified_at, "ATLAS").json())
 
     return results
@@ -61,34 +77,42 @@ async def get_all_cohorts(
 @router.get("/id/{cohort_id}")
 async def get_cohort_by_id(
     cohort_id: int | None,
-    session_atlas: Session = Depends(get_atlas_session),
-    session_dc: Session = Depends(get_dc_session),
-    user = Depends(verify_token)) -> dict:
+    session_atlas: AsyncSession = Depends(get_atlas_async_session),
+    session_dc: AsyncSession = Depends(get_dc_async_session),
+    identity: Identity = Depends(get_identity)) -> dict:
 
     if cohort_id is None:
         logger.error("Cohort id not found")
         raise HTTPException(status_code=404, detail="Cohort id not found")
     
     stmt = select(ChrtInfo).where(ChrtInfo.id == cohort_id)
-    chrt_info = session_dc.exec(stmt).first()
+    chrt_info = (await session_dc.exec(stmt)).first()
 
     if chrt_info is None:
         logger.error("Cohort id not found on DataCenter")
         raise HTTPException(status_code=404, detail="Cohort id not found on DataCenter")
 
-    owner_name = findout_name(session_atlas, chrt_info.owner)
+    owner_names, chrt_stats = await fan_out(
+        load_user_names(session_atlas, [chrt_info.owner]),
+        load_stats(session_dc, [chrt_info]))
+
+    if chrt_info.owner not in owner_names:
+        logger.error("User not found in database")
+        raise HTTPException(status_code=404, detail="User not found")
+
+    owner_name = owner_names[chrt_info.owner]
 
-    import random
+    chrt_stat = chrt_stats.get(chrt_info.id)
 
     stmt = select(ChrtCert).where(ChrtCert.id == cohort_id)
-    chrt_cert = session_dc.exec(stmt).first()
+    chrt_cert = (await session_dc.exec(stmt)).first()
 
     schm_info_temp = None
     file_group_temp = None
 
     if chrt_cert is not None and chrt_cert.cur_status != "before_apply":
         stmt = select(SchmInfo).where(SchmInfo.schema_from == cohort_id)
-        schm_info = session_dc.exec(stmt).first()
+        schm_info = (await session_dc.exec(stmt)).first()
 
         if schm_info is None:
             raise HTTPException(status_code=404, detail="Schema info is not found on DataCenter")
@@ -96,15 +120,19 @@ async def get_cohort_by_id(
         schm_info_temp = SchemaInfoTemp(schm_info.name, schm_info.description)
 
         stmt = select(CertOath).where(CertOath.document_for == cohort_id)
-        cert_oaths = session_dc.exec(stmt).all()
+        cert_oaths = (await session_dc.exec(stmt)).all()
 
         irb_drb_temps = []
 
         if cert_oaths is not None:
+            # 문서 경로와 hash 는 소유자와 관리자에게만 노출
+            can_read = identity.is_admin or chrt_info.owner == identity.id
+
             for co in cert_oaths:
-                docs_path = os.path.abspath(__file__ + "/../../documents")
-            
-                irb_drb_temps.append(IRBDRBTemp(co.name, co.path, os.path.getsize(docs_path + co.path)))
+                if can_read:
+                    irb_drb_temps.append(IRBDRBTemp(co.name, co.path, co.size, co.mime, co.sha256, co.uploaded_at, co.id))
+                else:
+                    irb_drb_temps.append(IRBDRBTemp(co.name, None, co.size, co.mime, None, co.uploaded_at))
 
             file_group_temp = FileGroupTemp(irb_drb_temps)
 
@@ -114,9 +142,9 @@ async def get_cohort_by_id(
     results = CohortDetailTemp(
         CohortInfoTemp(
             cohort_id, chrt_info.name, chrt_info.description,
-            random.randint(0, 203040), owner_name, chrt_info.created_at, chrt_info.modified_at, "ATLAS"
+            patient_count(chrt_stat), owner_name, chrt_info.created_at, chrt_info.modified_at, "ATLAS"
         ),
-        TableInfoTemp([random.randint(0,203040) for r in range(46)], tables),
+        TableInfoTemp(record_counts(chrt_stat), tables),
         schm_info_temp,
         file_group_temp
     ).json()
@@ -129,16 +157,16 @@ async def apply_cohort(
     name: str | None = Form(...),           # for schema
     description: str | None = Form(...),    # for schema
     tables: list[str] = Form(...),
-    files: list[UploadFile] = File(...),
-    session_atlas: Session = Depends(get_atlas_session),
-    session_dc: Session = Depends(get_dc_session),
-    user = Depends(verify_token)) -> str:
+    files: list[UploadFile] = File([]),
+    reuse: str | None = Form(None),         # 이미 저장된 문서 {"파일 이름": "sha256"}
+    session_dc: AsyncSession = Depends(get_dc_async_session),
+    identity: Identity = Depends(get_identity)) -> str:
 
     if cohort_id is None:
         logger.error("Cohort id not found")
         raise HTTPException(status_code=404, detail="Cohort id not found")
 
-    user_id = findout_id(session_atlas, user["sub"])
+    user_id = identity.id
 
     if user_id is None:
         logger.error("User id not found")
@@ -146,7 +174,7 @@ async def apply_cohort(
 
     # It should be existed
     stmt = select(ChrtInfo).where(ChrtInfo.id == cohort_id)
-    chrt_info = session_dc.exec(stmt).first()
+    chrt_info = (await session_dc.exec(stmt)).first()
 
     # It name or description is empty set default
     if name is None:
@@ -155,18 +183,55 @@ async def apply_cohort(
         description = chrt_info.description
 
 
+    reuse = parse_reuse(reuse)
+
+    # 크기 제한을 넘으면 DB 를 바꾸기 전에 413 으로 중단
+    staged = await stage_uploads(files)
+
+    try:
+        return await _apply_cohort(cohort_id, chrt_info, name, description, tables, files, staged, reuse, session_dc, user_id)
+    finally:
+        # 최종 위치로 옮기지 않은 임시 파일 정리
+        discard_uploads(staged)
+
+def parse_reuse(reuse: str | None) -> dict[str, str]:
+    if reuse is None or reuse == "":
+        return dict()
+
+    try:
+        parsed = json.loads(reuse)
+    except ValueError:
+        raise HTTPException(status_code=422, detail="reuse must be a JSON object")
+
+    if not isinstance(parsed, dict) or not all(isinstance(k, str) and isinstance(v, str) and is_sha256(v) for k, v in parsed.items()):
+        raise HTTPException(status_code=422, detail="reuse must map file names to sha256 hashes")
+
+    return parsed
+
+async def _apply_cohort(
+    cohort_id: int,
+    chrt_info: ChrtInfo,
+    name: str,
+    description: str,
+    tables: list[str],
+    files: list[UploadFile],
+    staged: dict[str, StagedUpload],
+    reuse: dict[str, str],
+    session_dc: AsyncSession,
+    user_id: int) -> str:
+
     # Table upload handling
-    logger.debug(f"Tables: {tables} \n Files: {[file.filename for file in files]}")
-    logger.debug(f"Table dimension: {len(tables)} / {len(tables[0])}")
+    logger.debug("Tables: %s \n Files: %s", tables, [file.filename for file in files])
+    logger.debug("Table dimension: %s / %s", len(tables), len(tables[0]))
 
     stmt = update(ChrtInfo).where(ChrtInfo.id == cohort_id).values(tables=tables)
-    session_dc.exec(stmt)
-    session_dc.commit()
+    await session_dc.exec(stmt)
+    await session_dc.commit()
 
 
     # Get SchmInfo
     stmt = select(SchmInfo).where(SchmInfo.owner == user_id, SchmInfo.schema_from == cohort_id)
-    schm_info = session_dc.exec(stmt).first()
+    schm_info = (await session_dc.exec(stmt)).first()
 
     # Create SchmInfo
     if schm_info is None:
@@ -183,11 +248,11 @@ async def apply_cohort(
         schm_info.description = description
 
     session_dc.add(schm_info)
-    session_dc.commit()
+    await session_dc.commit()
 
     # Get CohortCert
     stmt = select(ChrtCert).where(ChrtCert.id == cohort_id)
-    schm_cert = session_dc.exec(stmt).first()
+    schm_cert = (await session_dc.exec(stmt)).first()
     
     # If cohort is new one
     if schm_cert is None:
@@ -195,80 +260,47 @@ async def apply_cohort(
         schm_cert = ChrtCert(id=cohort_id)
 
     # File handling
-    docs_path = os.path.abspath(__file__ + "/../../documents")
-    if not os.path.exists(docs_path):
-        os.makedirs(docs_path)
-
-    # Answer Sheets
-    file_names = [file.filename for file in files]
+    # 같은 이름으로 이미 있는 문서는 그대로 두고, 목록에서 빠진 문서만 제거
+    file_names = list(staged.keys()) + [name for name in reuse if name not in staged]
 
     stmt = select(CertOath).where(CertOath.document_for == cohort_id)
-    cert_oaths = session_dc.exec(stmt).all()
-    
-    # File removing
-    if cert_oaths is not None:
-        for co in cert_oaths:
-            if not co.name in file_names:
-                os.remove(f"{docs_path}{co.path}")
-                session_dc.delete(co)
+    cert_oaths = (await session_dc.exec(stmt)).all()
 
-    session_dc.commit()
+    # File removing
+    await release_cert_oaths(session_dc, [co for co in cert_oaths if co.name not in file_names])
 
     # File uploading
-    # Folder checking and creation
-    cert_oath_dir = os.path.join(docs_path, str(cohort_id))
-    if not os.path.exists(cert_oath_dir):
-        logger.debug(f"Folder Created")
-        os.makedirs(cert_oath_dir)
+    # 내용이 같은 문서는 blob 하나를 함께 참조
+    co_file_names = set(co.name for co in cert_oaths)
 
-    stmt = select(CertOath).where(CertOath.document_for == cohort_id)
-    cert_oaths = session_dc.exec(stmt).all()
-
-    co_file_names = None
-
-    if cert_oaths is not None:
-        co_file_names = [co.name for co in cert_oaths]
-    
     cert_oath_list = []
 
-    for file in files:
-        file_name = file.filename
+    for file_name in file_names:
+        if file_name in co_file_names:
+            continue
 
-        if co_file_names is not None:
-            if file_name in co_file_names:
-                continue
+        upload = staged.get(file_name)
 
-        file_path = f"/{cohort_id}"
-        _, file_extension = os.path.splitext(file.filename)
+        if upload is not None:
+            sha256 = await acquire_blob(session_dc, upload, user_id)
+            size, mime = upload.size, upload.mime
+        else:
+            sha256 = reuse[file_name]
+            size, mime = await acquire_stored_blob(session_dc, sha256, user_id)
+
+        _, file_extension = os.path.splitext(file_name)
         file_type = file_extension[1:]
         file_category = "IRB" if "irb" in file_name.lower() else "DRB" if "drb" in file_name.lower() else "ETC"
-        
-        co = CertOath(name=file_name, path=file_path, type=file_type, category=file_category, document_for=cohort_id)
-        cert_oath_list.append(co)
-
-    session_dc.add_all(cert_oath_list)
-    session_dc.commit()
 
+        co = CertOath(name=file_name, path=blob_path(sha256), sha256=sha256,
+                      size=size, mime=mime or guess_mime(file_name), uploaded_at=datetime.now(),
+                      type=file_type, category=file_category, document_for=cohort_id)
+        cert_oath_list.append(co)
 
-    # Change file_path by id
-    stmt = select(CertOath).where(CertOath.document_for == cohort_id)
-    cert_oaths = session_dc.exec(stmt).all()
-
-    for co in cert_oaths:
-        if not "_" in co.path:
-
-            co.path += f"/{cohort_id}_{co.id}.{co.type}"
-
-            logger.debug(f"File path: {docs_path} + {co.path}")
-
-            for file in files:
-                if file.filename == co.name:
-                    async with aiofiles.open(os.path.join(docs_path + co.path), 'wb') as out_file:
-                        content = await file.read()
-                        await out_file.write(content)
+        logger.debug("Document %s is stored as %s", file_name, sha256)
 
-    session_dc.add_all(cert_oaths)
-    session_dc.commit()
+    session_dc.add_all(cert_oath_list)
+    await session_dc.commit()
 
     # Update SchmCert
     schm_cert.applied_at = datetime.now()
@@ -277,6 +309,20 @@ async def apply_cohort(
     schm_cert.review = None
 
     session_dc.add(schm_cert)
-    session_dc.commit()
+    await session_dc.commit()
+
+    return "Apply Success"
+
+@router.get("/documents/{sha256}")
+async def check_document(
+    sha256: str,
+    session_dc: AsyncSession = Depends(get_dc_async_session),
+    identity: Identity = Depends(get_identity)) -> dict:
+
+    # 업로드 전에 확인해서 이미 저장된 문서는 apply 의 reuse 로 보냄 (본인 cohort 가 참조하는 문서만)
+    if not is_sha256(sha256):
+        raise HTTPException(status_code=422, detail="sha256 must be 64 lowercase hex characters")
+
+    doc_blob = await find_blob(session_dc, sha256, identity.id)
 
-    return "Apply Success"
\ No newline at end of file
+    return {"exists": doc_blob is not None, "size": doc_blob.size if doc_blob is not None else None}
@@ -19,13 +19,14 @@ router.include_router(user_schema.router)
 
 # -------- DBM Imports --------
 from utils.dbm import (
-    get_atlas_session, get_dc_session,
+    get_atlas_async_session, get_dc_async_session,
     CohortDefinition, SecUser,
     CertOath, ChrtInfo, ChrtCert
 )
 from utils.auth import verify_token
 
-from sqlmodel import Session, select, update
+from sqlmodel import select, update
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 
 # -------- Tool Imports --------
@@ -33,17 +34,15 @@ from utils.tools import findout_id, findout_name
 
 
 # -------- Logging Setup --------
-import logging
-logger = logging.getLogger("uvicorn.error")
-logger.setLevel(logging.DEBUG)
+from utils.logs import get_logger
+logger = get_logger(__name__)
 
 
 # -------- Routes --------
 @router.get("/")
 async def get_user(
-    session: Session = Depends(get_atlas_session),
+    session: AsyncSession = Depends(get_atlas_async_session),
     user = Depends(verify_token)) -> SecUser:
-    logger.debug(f"User: {user}")
     data = user["sub"]
 
     if data is None:
@@ -52,7 +51,7 @@ async def get_user(
     
     else:
         stmt = select(SecUser).where(SecUser.name == data)
-        user_data = session.exec(stmt).first()
+        user_data = (await session.exec(stmt)).first()
         if user_data is None:
             logger.error("User not found in database")
             raise HTTPException(status_code=404, detail="User not found in database")
@@ -60,11 +59,10 @@ async def get_user(
 
 @router.get("/all")
 async def get_user(
-    session: Session = Depends(get_atlas_session)) -> list[SecUser]:
+    session: AsyncSession = Depends(get_atlas_async_session)) -> list[SecUser]:
     stmt = select(SecUser)
 
-    data = session.exec(stmt).all()
-    logger.debug(f"User data: {data}")
+    data = (await session.exec(stmt)).all()
     return data
 
 @router.get("/verify")
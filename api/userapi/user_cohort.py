@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, File, UploadFile, Form
+from fastapi import APIRouter, Depends, HTTPException, File, UploadFile, Form, Response
 
 router = APIRouter(prefix="/cohort")
 
@@ -12,181 +12,187 @@ from utils.structure import CohortDetail, CohortInfoTemp, CohortDetailTemp, Tabl
 
 # -------- DBM Imports --------
 from utils.dbm import (
-    get_atlas_session, get_dc_session,
+    get_atlas_async_session, get_dc_async_session,
     CohortDefinition,
     CertOath, ChrtInfo, ChrtCert,
     SchmInfo, SchmConnectInfo
 )
-from utils.auth import verify_token
+from utils.identity import Identity, get_identity
 
-from sqlmodel import Session, select, update
+from sqlmodel import select, update
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 
 # -------- Tool Imports --------
-from utils.tools import findout_id, findout_name, get_syncable
+from utils.tools import findout_name, get_syncable, refresh_incrementally, index_by
+from utils.stats import load_stats, patient_count, record_counts
+from utils.loaders import load_cohorts_with_cert, load_applied_cohorts, load_cert_oaths, load_connect_infos
+from utils.paging import PageParams, APPLY_SORTS, page_params, page_rows
+from utils.blobs import release_cert_oaths
 
 
 # -------- Logging Setup --------
-import logging
-logger = logging.getLogger("uvicorn.error")
-logger.setLevel(logging.DEBUG)
+from utils.logs import get_logger
+logger = get_logger(__name__)
 
 
 # -------- Routes --------
 @router.get("/")
 async def get_my_cohorts(
-    session_atlas: Session = Depends(get_atlas_session),
-    session_dc: Session = Depends(get_dc_session),
-    user = Depends(verify_token)) -> list[dict]:
+    response: Response,
+    page: PageParams = Depends(page_params),
+    session_atlas: AsyncSession = Depends(get_atlas_async_session),
+    session_dc: AsyncSession = Depends(get_dc_async_session),
+    identity: Identity = Depends(get_identity)) -> list[dict]:
 
-    user_id = findout_id(session_atlas, user["sub"])
-    
-    stmt = select(ChrtInfo).where(ChrtInfo.owner == user_id)
-    chrt_infos = session_dc.exec(stmt).all()
-
-    stmt = select(ChrtCert).where(ChrtCert.id.in_([ci.id for ci in chrt_infos]))
-    chrt_certs = session_dc.exec(stmt).all()
-
-    syncables = get_syncable(session_atlas, session_dc, user["sub"])
+    user_id = identity.id
 
-    import random
+    # 본인 코호트만 조회
+    page.owner = None
 
-    results = []
+    cohorts = await load_cohorts_with_cert(session_dc, user_id, page=page)
+    cohorts, next_cursor = page_rows(cohorts, page, APPLY_SORTS)
+    chrt_infos = [ci for ci, _ in cohorts]
 
-    if chrt_certs is None:
-        return results
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = next_cursor
 
-    for ci in chrt_infos:
-        for cc in chrt_certs:
-            if ci.id == cc.id:
-                tables = [False for i in range(46)] if ci.tables is None else [True if table in ci.tables else False for table in list(TABLE_NAME.__members__.keys())]
+    syncables = await get_syncable(session_atlas, session_dc, user_id)
 
-                cohort_info_temp = CohortInfoTemp(ci.id, ci.name, ci.description,
-                                        random.randint(0, 203040), user["sub"], ci.created_at, ci.modified_at, ci.origin)
-                schema_cert_temp = CohortCertTemp(cc.applied_at, cc.resolved_at, cc.cur_status, cc.review)
-                table_info_temp = TableInfoTemp([random.randint(0,203040) for r in range(46)], tables)
-                # tables = [TABLE_NAME(j+1).name for j, val in enumerate([random.randint(0, 1) if i > 0 else 1 for i in range(random.randint(1, 46))]) if val == 1]
-                connect_info_temp = None
+    chrt_stats = await load_stats(session_dc, chrt_infos)
 
-                if cc.cur_status == "approved":
-                    connect_info_temp = ConnectInfoTemp("data-center-db.hosplital.com", "omop_cdm", "kim_researcher_001", 5432, "cohort_1_kim_researcher_001", "temp_password_123")
+    results = []
 
-                # else:
-                #     raise HTTPException(status_code=404, detail="Schm info status not found")
-                
-                results.append(
-                    AppliedCohortDetailTemp(
-                        cohort_info_temp,
-                        schema_cert_temp,
-                        table_info_temp,
-                        connect_info_temp,
-                        syncables[ci.id]
-                    ).json()
-                )
+    for ci, cc in cohorts:
+        tables = [False for i in range(46)] if ci.tables is None else [True if table in ci.tables else False for table in list(TABLE_NAME.__members__.keys())]
+
+        cohort_info_temp = CohortInfoTemp(ci.id, ci.name, ci.description,
+                                patient_count(chrt_stats.get(ci.id)), identity.name, ci.created_at, ci.modified_at, ci.origin)
+        schema_cert_temp = CohortCertTemp(cc.applied_at, cc.resolved_at, cc.cur_status, cc.review)
+        table_info_temp = TableInfoTemp(record_counts(chrt_stats.get(ci.id)), tables)
+        # tables = [TABLE_NAME(j+1).name for j, val in enumerate([random.randint(0, 1) if i > 0 else 1 for i in range(random.randint(1, 46))]) if val == 1]
+        connect_info_temp = None
+
+        if cc.cur_status == "approved":
+            connect_info_temp = ConnectInfoTemp("data-center-db.hosplital.com", "omop_cdm", "kim_researcher_001", 5432, "cohort_1_kim_researcher_001", "temp_password_123")
+
+        # else:
+        #     raise HTTPException(status_code=404, detail="Schm info status not found")
+
+        results.append(
+            AppliedCohortDetailTemp(
+                cohort_info_temp,
+                schema_cert_temp,
+                table_info_temp,
+                FileGroupTemp([]),
+                connect_info_temp,
+                syncables[ci.id]
+            ).json()
+        )
 
     return results
 
 @router.get("/applies")
 async def get_my_applied_cohorts(
-    session_atlas: Session = Depends(get_atlas_session),
-    session_dc: Session = Depends(get_dc_session),
-    user = Depends(verify_token)) -> list[dict]:
+    response: Response,
+    page: PageParams = Depends(page_params),
+    session_atlas: AsyncSession = Depends(get_atlas_async_session),
+    session_dc: AsyncSession = Depends(get_dc_async_session),
+    identity: Identity = Depends(get_identity)) -> list[dict]:
 
-    user_id = findout_id(session_atlas, user["sub"])
-    
-    stmt = select(ChrtInfo).where(ChrtInfo.owner == user_id)
-    chrt_infos = session_dc.exec(stmt).all()
+    user_id = identity.id
 
-    stmt = select(ChrtCert).where(ChrtCert.cur_status != "before_apply", ChrtCert.id.in_([ci.id for ci in chrt_infos]))
-    chrt_certs = session_dc.exec(stmt).all()
+    # 코호트 수와 관계없이 정해진 수의 쿼리만 사용
+    page.owner = None
 
-    syncables = get_syncable(session_atlas, session_dc, user["sub"])
+    applied = await load_applied_cohorts(session_dc, user_id, page)
+    applied, next_cursor = page_rows(applied, page, APPLY_SORTS)
 
-    import random
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = next_cursor
 
-    results = []
+    chrt_infos = [ci for ci, _ in applied]
+    cohort_ids = [ci.id for ci in chrt_infos]
+    approved_ids = [ci.id for ci, cc in applied if cc.cur_status == "approved"]
 
-    if chrt_certs is None:
-        return results
+    cert_oaths = await load_cert_oaths(session_dc, cohort_ids)
+    connect_infos = await load_connect_infos(session_dc, approved_ids)
 
-    for ci in chrt_infos:
-        for cc in chrt_certs:
-            if ci.id == cc.id:
-                tables = [False for i in range(46)] if ci.tables is None else [True if table in ci.tables else False for table in list(TABLE_NAME.__members__.keys())]
+    syncables = await get_syncable(session_atlas, session_dc, user_id)
 
-                cohort_info_temp = CohortInfoTemp(ci.id, ci.name, ci.description,
-                                        random.randint(0, 203040), user["sub"], ci.created_at, ci.modified_at, ci.origin)
-                schema_cert_temp = CohortCertTemp(cc.applied_at, cc.resolved_at, cc.cur_status, cc.review)
-                table_info_temp = TableInfoTemp([random.randint(0,203040) for r in range(46)], tables)
-                
-                # IRB DRB
-                stmt = select(CertOath).where(CertOath.document_for == ci.id)
-                cert_oaths = session_dc.exec(stmt).all()
+    chrt_stats = await load_stats(session_dc, chrt_infos)
 
-                irb_drb_temps = []
+    results = []
 
-                for co in cert_oaths:
-                    docs_path = os.path.abspath(__file__ + "/../../../documents")
+    for ci, cc in applied:
+        tables = [False for i in range(46)] if ci.tables is None else [True if table in ci.tables else False for table in list(TABLE_NAME.__members__.keys())]
 
-                    irb_drb_temps.append(IRBDRBTemp(co.name, co.path, os.path.getsize(docs_path + co.path)))
+        cohort_info_temp = CohortInfoTemp(ci.id, ci.name, ci.description,
+                                patient_count(chrt_stats.get(ci.id)), identity.name, ci.created_at, ci.modified_at, ci.origin)
+        schema_cert_temp = CohortCertTemp(cc.applied_at, cc.resolved_at, cc.cur_status, cc.review)
+        table_info_temp = TableInfoTemp(record_counts(chrt_stats.get(ci.id)), tables)
 
-                file_group_temp = FileGroupTemp(irb_drb_temps)
+        # IRB DRB
+        irb_drb_temps = []
 
-                connect_info_temp = None
+        for co in cert_oaths[ci.id]:
+            irb_drb_temps.append(IRBDRBTemp(co.name, co.path, co.size, co.mime, co.sha256, co.uploaded_at, co.id))
 
-                if cc.cur_status == "approved":
-                    stmt = select(SchmInfo).where(SchmInfo.schema_from == ci.id)
-                    schm_info = session_dc.exec(stmt).first()
+        file_group_temp = FileGroupTemp(irb_drb_temps)
 
-                    stmt = select(SchmConnectInfo).where(SchmConnectInfo.id == schm_info.id)
-                    schm_conn_info = session_dc.exec(stmt).first()
-                    connect_info_temp = ConnectInfoTemp(schm_conn_info.host, "datacenter", schm_conn_info.username, schm_conn_info.port, f"schema_{schm_info.owner}_{schm_info.id}", schm_conn_info.password)
+        connect_info_temp = None
 
-                # else:
-                #     raise HTTPException(status_code=404, detail="Schm info status not found")
-                
-                results.append(
-                    AppliedCohortDetailTemp(
-                        cohort_info_temp,
-                        schema_cert_temp,
-                        table_info_temp,
-                        file_group_temp,
-                        connect_info_temp,
-                        syncables[ci.id]
-                    ).json()
-                )
+        if ci.id in connect_infos:
+            schm_info, schm_conn_info = connect_infos[ci.id]
+            connect_info_temp = ConnectInfoTemp(schm_conn_info.host, "datacenter", schm_conn_info.username, schm_conn_info.port, f"schema_{schm_info.owner}_{schm_info.id}", schm_conn_info.password)
+
+        results.append(
+            AppliedCohortDetailTemp(
+                cohort_info_temp,
+                schema_cert_temp,
+                table_info_temp,
+                file_group_temp,
+                connect_info_temp,
+                syncables[ci.id]
+            ).json()
+        )
 
     return results
 
 @router.get("/sync")
 async def sync_cohorts(
     cohort_id: int | None = None,
-    session_atlas: Session = Depends(get_atlas_session),
-    session_dc: Session = Depends(get_dc_session),
-    user = Depends(verify_token)):
+    incremental: bool = False,
+    session_atlas: AsyncSession = Depends(get_atlas_async_session),
+    session_dc: AsyncSession = Depends(get_dc_async_session),
+    identity: Identity = Depends(get_identity)):
 
     synced = False
 
-    user_id = findout_id(session_atlas, user["sub"])
+    user_id = identity.id
 
     if cohort_id is not None:
         stmt = select(ChrtInfo).where(ChrtInfo.id == cohort_id)
-        chrt_info = session_dc.exec(stmt).first()
+        chrt_info = (await session_dc.exec(stmt)).first()
 
         if chrt_info is None:
             raise HTTPException(404, "Cohort is not found on yours")
 
         stmt = select(CohortDefinition).where(CohortDefinition.created_by_id == user_id,
                                               CohortDefinition.id == chrt_info.ext_id)
-        chrt_def = session_atlas.exec(stmt).first()
+        chrt_def = (await session_atlas.exec(stmt)).first()
 
         if chrt_def is None:
             raise HTTPException(401, "This cohort is not yours")
 
-        if chrt_info.modified_at < chrt_def.modified_date:
+        if chrt_info.modified_at < chrt_def.modified_date and incremental and await refresh_incrementally(session_dc, chrt_info, chrt_def):
+            # 재승인 없이 바뀐 대상자만 반영
+            synced = True
+
+        elif chrt_info.modified_at < chrt_def.modified_date:
             # ChrtCert applied_at과 status, resolved_at 수정
             stmt = select(ChrtCert).where(ChrtCert.id == chrt_info.id)
-            schm_cert = session_dc.exec(stmt).first()
+            schm_cert = (await session_dc.exec(stmt)).first()
 
             if schm_cert is not None:
                 schm_cert.applied_at = None
@@ -196,11 +202,9 @@ async def sync_cohorts(
 
             # CertOaths 모두 제거
             stmt = select(CertOath).where(CertOath.document_for == chrt_info.id)
-            cert_oaths = session_dc.exec(stmt).all()
+            cert_oaths = (await session_dc.exec(stmt)).all()
 
-            if cert_oaths is not None:
-                for co in cert_oaths:
-                    session_dc.delete(co)
+            await release_cert_oaths(session_dc, cert_oaths)
 
             # SchmInfo 내용 제거
             # stmt = select(SchmInfo).where()
@@ -211,7 +215,7 @@ async def sync_cohorts(
             chrt_info.modified_at = chrt_def.modified_date
             chrt_info.tables = None
             session_dc.add(chrt_info)
-            session_dc.commit()
+            await session_dc.commit()
 
             synced = True
     
@@ -221,18 +225,18 @@ async def sync_cohorts(
     # 만일 외부 Cohort 수정일이 DC Cohort 수정일보다 늦으면, Schema를 재승인 받도록 함.
 
         stmt = select(CohortDefinition).where(CohortDefinition.created_by_id == user_id)
-        chrt_defs = session_atlas.exec(stmt).all()
+        chrt_defs = (await session_atlas.exec(stmt)).all()
 
-        logger.debug(f"chrt_defs length: {len(chrt_defs)}")
+        logger.debug("chrt_defs length: %s", len(chrt_defs))
 
         stmt = select(ChrtInfo).where(ChrtInfo.owner == user_id)
-        chrt_infos = session_dc.exec(stmt).all()
+        chrt_infos = (await session_dc.exec(stmt)).all()
 
-        holding_ext_ids = [ci.ext_id for ci in chrt_infos]
+        chrt_infos_by_ext_id = index_by(chrt_infos, "ext_id")
 
         for cd in chrt_defs:
             # New cohort detected
-            if cd.id not in holding_ext_ids:
+            if cd.id not in chrt_infos_by_ext_id:
                 chrt_info = ChrtInfo()
                 chrt_info.id = None
                 chrt_info.ext_id = cd.id
@@ -249,39 +253,41 @@ async def sync_cohorts(
 
             # Existed cohort
             else:
-                for ci in chrt_infos:
-                    if ci.ext_id == cd.id:
-                        if ci.modified_at < cd.modified_date:
-                            # ChrtCert applied_at과 status, resolved_at 수정
-                            stmt = select(ChrtCert).where(ChrtCert.id == ci.id)
-                            schm_cert = session_dc.exec(stmt).first()
-                            schm_cert.applied_at = None
-                            schm_cert.cur_status = "before_apply"
-                            schm_cert.resolved_at = None
-                            schm_cert.review = None
-
-                            # CertOaths 모두 제거
-                            stmt = select(CertOath).where(CertOath.document_for == ci.id)
-                            cert_oaths = session_dc.exec(stmt).all()
-
-                            if cert_oaths is not None:
-                                for co in cert_oaths:
-                                    session_dc.delete(co)
-
-                            # SchmInfo 내용 제거
-                            # stmt = select(SchmInfo).where()
-
-                            # SchmConnectInfo 내용 제거
-
-                            # ChrtInfo modified_at 수정 및 tables 제거
-                            ci.modified_at = cd.modified_date
-                            ci.tables = None
-                            session_dc.add(ci)
-                            session_dc.commit()
-
-                            synced = True
-
-    session_dc.commit()
+                ci = chrt_infos_by_ext_id[cd.id]
+
+                if ci.modified_at < cd.modified_date and incremental and await refresh_incrementally(session_dc, ci, cd):
+                    # 재승인 없이 바뀐 대상자만 반영
+                    synced = True
+
+                elif ci.modified_at < cd.modified_date:
+                    # ChrtCert applied_at과 status, resolved_at 수정
+                    stmt = select(ChrtCert).where(ChrtCert.id == ci.id)
+                    schm_cert = (await session_dc.exec(stmt)).first()
+                    schm_cert.applied_at = None
+                    schm_cert.cur_status = "before_apply"
+                    schm_cert.resolved_at = None
+                    schm_cert.review = None
+
+                    # CertOaths 모두 제거
+                    stmt = select(CertOath).where(CertOath.document_for == ci.id)
+                    cert_oaths = (await session_dc.exec(stmt)).all()
+
+                    await release_cert_oaths(session_dc, cert_oaths)
+
+                    # SchmInfo 내용 제거
+                    # stmt = select(SchmInfo).where()
+
+                    # SchmConnectInfo 내용 제거
+
+                    # ChrtInfo modified_at 수정 및 tables 제거
+                    ci.modified_at = cd.modified_date
+                    ci.tables = None
+                    session_dc.add(ci)
+                    await session_dc.commit()
+
+                    synced = True
+
+    await session_dc.commit()
 
     logger.debug("Synchronization Success" if synced else "All are up to date")
 
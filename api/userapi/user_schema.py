@@ -17,7 +17,7 @@ from utils.dbm import (
     get_atlas_session, get_dc_session,
     CohortDefinition, SecUser, SecUserRole,
     CertOath, ChrtInfo, ChrtCert,
-    make_school_model, provision_user, copy_tables_by_cohort_id
+    make_school_model, provision_user
 )
 from utils.auth import verify_token
 
@@ -29,9 +29,8 @@ from utils.tools import compare_dates, findout_id, findout_name, findout_role
 
 
 # -------- Logging Setup --------
-import logging
-logger = logging.getLogger("uvicorn.error")
-logger.setLevel(logging.DEBUG)
+from utils.logs import get_logger
+logger = get_logger(__name__)
 
 # @router.get("/id/{schema_id}/create")
 # async def create_schema_on_db(
@@ -73,6 +72,6 @@ logger.setLevel(logging.DEBUG)
 
 #     provision_user(session_dc, "u" + str(user_id), "1234", "datacenter", schema_name)
 
-#     copy_tables_by_cohort_id(session_atlas, session_dc, schema_name, schema_id)
+#     enqueue_materialization(schema_id, schema_name)
     
 #     return {"result": "success"}
\ No newline at end of file
@@ -1,5 +1,5 @@
-from fastapi import FastAPI, Depends
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi import FastAPI, Depends, Request
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
@@ -19,28 +19,28 @@ from utils import render
 
 
 # -------- Logging Setup --------
-import logging
-logger = logging.getLogger("uvicorn.error")
-logger.setLevel(logging.DEBUG)
+from utils.logs import get_logger
+logger = get_logger(__name__)
 
 
 # -------- Authentication Setup --------
-from passlib.context import CryptContext
-from datetime import datetime, timezone, timedelta
-import jwt, json
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-from utils.auth import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES
+from utils.auth import verify_password, create_access_token, create_refresh_token, verify_refresh_token
 
 
 # -------- Database Connection Setup --------
-from utils.dbm import Security, SecUser, get_atlas_session
-from sqlmodel import Session, select
+from utils.dbm import Security, SecUser, get_atlas_async_session, atlas_async_engine, dc_async_engine, bootstrap_dc, bootstrap_fdw
+from utils.transfer import TRANSFER_ENGINE
+from utils.pools import start_pool_tuner
+from utils.cleanup import start_gc_scheduler
+from utils.jobs import claim_worker
+from utils.metrics import MetricsMiddleware, METRICS_ALLOWED_HOSTS, expose
+from utils.uploads import UploadLimitMiddleware
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 
 # -------- Tools Setup --------
-from utils.tools import findout_role
+from utils.identity import resolve_identity, invalidate_identity
 
 
 ## ------- FastAPI Application Setup --------
@@ -56,46 +56,90 @@ app.include_router(temp.router, include_in_schema=False)
 # For protected documents
 app.include_router(documents.router)
 
+# 업로드 요청은 form 을 읽기 전에 크기 확인 (CORS 안쪽이라 413 에도 CORS 헤더가 붙음)
+app.add_middleware(UploadLimitMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # 목록 API 의 다음 페이지 cursor
+    expose_headers=["X-Next-Cursor"],
 )
 
+# 요청 수, 지연 시간, 요청당 쿼리 수 수집
+app.add_middleware(MetricsMiddleware)
+
 templates = Jinja2Templates(directory="templates")
 
 
+# -------- Startup --------
+@app.on_event("startup")
+def bootstrap():
+    bootstrap_dc()
+
+    # 작업 / GC 상태가 메모리에 있으므로 process 하나만 허용
+    claim_worker()
+
+    # POOL_ADAPTIVE 가 켜져 있으면 대기 시간에 따라 pool 크기 조절
+    start_pool_tuner()
+
+    # GC_INTERVAL_HOURS 가 있으면 주기적으로 문서 GC 실행
+    start_gc_scheduler()
+
+    # FDW 서버와 foreign schema 는 서버 시작 시 한 번만 준비
+    # 실패하면 첫 복사 작업에서 다시 시도
+    if TRANSFER_ENGINE == "fdw":
+        try:
+            bootstrap_fdw()
+        except Exception as e:
+            logger.error("FDW bootstrap failed: %s", e)
+
+@app.on_event("shutdown")
+async def dispose_engines():
+    await atlas_async_engine.dispose()
+    await dc_async_engine.dispose()
+
+
 # -------- Routes --------
 @app.get("/", response_class=HTMLResponse)
 async def render_base() -> HTMLResponse:
     return templates.TemplateResponse("index.html", {"request": {}})
 
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def get_metrics(request: Request) -> PlainTextResponse:
+    # 내부 수집기에서만 접근 가능
+    if request.client is None or request.client.host not in METRICS_ALLOWED_HOSTS:
+        return PlainTextResponse("Not Found", status_code=404)
+
+    return PlainTextResponse(expose(), media_type="text/plain; version=0.0.4")
+
 @app.post("/login", response_class=JSONResponse, tags=["login"])
 async def send_login_post(
     loginForm: LoginBody,
-    session_atlas: Session = Depends(get_atlas_session)) -> JSONResponse:
+    session_atlas: AsyncSession = Depends(get_atlas_async_session)) -> JSONResponse:
 
-    logger.debug(f"Attempting login with id={loginForm.id} and pw")
-    logger.debug(f"pw is {loginForm.pw}")
+    logger.debug("Attempting login with id=%s", loginForm.id)
 
-    # Get account info with cryptonized password
-    stmt = select(Security).where(
-        Security.email == loginForm.id)
-    output = session_atlas.exec(stmt).first()
+    output = await find_account(session_atlas, loginForm.id)
 
     content = dict()
 
     # login fail
     if output is None:
-        logger.warning(f"Login failed for id={loginForm.id}, ID is not matched")
+        logger.warning("Login failed for id=%s, ID is not matched", loginForm.id)
 
         content["error"] = "ID is not matched"
 
         return JSONResponse(content=content, status_code=401)
-    elif pwd_context.verify(loginForm.pw, output.password) is False:
-        logger.warning(f"Login failed for id={loginForm.id}, PW is not matched")
+
+    # bcrypt 검증은 이벤트 루프를 막지 않도록 별도 스레드에서 실행
+    verified, new_hash = await verify_password(loginForm.pw, output.password)
+
+    if verified is False:
+        logger.warning("Login failed for id=%s, PW is not matched", loginForm.id)
 
         content["error"] = "PW is not matched"
         
@@ -103,25 +147,58 @@ async def send_login_post(
     
     # login success
     else:
-        logger.info(f"Login successful for id={loginForm.id}")
+        logger.info("Login successful for id=%s", loginForm.id)
 
-        payload = {"sub": loginForm.id, "aud": "normal_user",
-                   "iat": datetime.now(timezone.utc),
-                   "exp": datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)}
-        
-        access_token = jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHM)
+        # 해시 설정이 바뀐 경우 로그인하면서 다시 저장
+        if new_hash is not None:
+            await store_password(session_atlas, output, new_hash)
 
-        # Get user info
-        stmt = select(SecUser).where(SecUser.login == loginForm.id)
-        user_info = session_atlas.exec(stmt).first()
+        return await issue_tokens(session_atlas, loginForm.id)
 
-        user_role = "public" if findout_role(session_atlas, user_info.name) else "admin"
+@app.post("/refresh", response_class=JSONResponse, tags=["login"])
+async def refresh_login(
+    session_atlas: AsyncSession = Depends(get_atlas_async_session),
+    refresh = Depends(verify_refresh_token)) -> JSONResponse:
 
-        # Client Request Form
-        content = {"id": user_info.login, "name": user_info.name, "token": access_token, "role": user_role}
-        
-        headers = {"Authorization": f"Bearer {access_token}",
-                   "X-Access-Token": access_token,
-                   "Content-Type": "application/json"}
+    # 새 access token 의 uid / role 은 DB 에서 다시 읽음
+    return await issue_tokens(session_atlas, refresh["sub"])
+
+async def find_account(session_atlas: AsyncSession, login: str) -> Security | None:
+    # Get account info with cryptonized password
+    stmt = select(Security).where(
+        Security.email == login)
+
+    return (await session_atlas.exec(stmt)).first()
+
+async def store_password(session_atlas: AsyncSession, account: Security, new_hash: str):
+    account.password = new_hash
+    session_atlas.add(account)
+    await session_atlas.commit()
+
+    logger.info("Password hash is updated for id=%s", account.email)
+
+async def issue_tokens(session_atlas: AsyncSession, login: str) -> JSONResponse:
+    # Get user info
+    stmt = select(SecUser).where(SecUser.login == login)
+    user_info = (await session_atlas.exec(stmt)).first()
+
+    if user_info is None:
+        return JSONResponse(content={"error": "User not found"}, status_code=401)
+
+    # 캐시된 사용자 정보를 새로 읽음 (권한 변경 반영)
+    invalidate_identity(user_info.name)
+    identity = await resolve_identity(session_atlas, user_info.name)
+
+    access_token = create_access_token(login, identity.id, identity.name, identity.role)
+    refresh_token = create_refresh_token(login)
+
+    # Client Request Form
+    content = {"id": user_info.login, "name": user_info.name, "token": access_token,
+               "refreshToken": refresh_token, "role": identity.role}
+
+    headers = {"Authorization": f"Bearer {access_token}",
+               "X-Access-Token": access_token,
+               "X-Refresh-Token": refresh_token,
+               "Content-Type": "application/json"}
 
-        return JSONResponse(content=content, headers=headers)
\ No newline at end of file
+    return JSONResponse(content=content, headers=headers)
\ No newline at end of file
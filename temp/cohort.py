@@ -27,9 +27,8 @@ from utils.tools import findout_id, findout_name, mapping_id_name
 
 
 # -------- Logging Setup --------
-import logging
-logger = logging.getLogger("uvicorn.error")
-logger.setLevel(logging.DEBUG)
+from utils.logs import get_logger
+logger = get_logger(__name__)
 
 
 # -------- Routes --------
@@ -116,8 +115,8 @@ async def apply_cohort(
 
 
     # Table upload handling
-    logger.debug(f"Tables: {tables} \n Files: {[file.filename for file in files]}")
-    logger.debug(f"Table dimension: {len(tables)} / {len(tables[0])}")
+    logger.debug("Tables: %s \n Files: %s", tables, [file.filename for file in files])
+    logger.debug("Table dimension: %s / %s", len(tables), len(tables[0]))
 
     stmt = update(ChrtInfo).where(ChrtInfo.id == cohort_id).values(tables=tables)
     session_dc.exec(stmt)
@@ -173,7 +172,7 @@ async def apply_cohort(
     cert_oath_dir = os.path.join(docs_path, str(cohort_id))
 
     if not os.path.exists(cert_oath_dir):
-        logger.debug(f"Folder Created")
+        logger.debug("Folder Created")
         os.makedirs(cert_oath_dir)
     
     cert_oath_list = []
@@ -198,7 +197,7 @@ async def apply_cohort(
     for cert_oath in cert_oaths:
         cert_oath.path += f"/{cohort_id}_{cert_oath.id}.{cert_oath.type}"
 
-        logger.debug(f"File path: {docs_path} + {cert_oath.path}")
+        logger.debug("File path: %s + %s", docs_path, cert_oath.path)
 
         for file in files:
             if file.filename == cert_oath.name:
@@ -37,9 +37,8 @@ from utils.tools import compare_dates, findout_id, findout_name, findout_role
 
 
 # -------- Logging Setup --------
-import logging
-logger = logging.getLogger("uvicorn.error")
-logger.setLevel(logging.DEBUG)
+from utils.logs import get_logger
+logger = get_logger(__name__)
 
 
 # -------- Routes --------
@@ -63,7 +62,6 @@ def api_list():
 async def get_user(
     session: Session = Depends(get_atlas_session),
     user = Depends(verify_token)) -> SecUser:
-    logger.debug(f"User: {user}")
     data = user["sub"]
 
     if data is None:
@@ -84,7 +82,6 @@ async def get_user(
     stmt = select(SecUser)
 
     data = session.exec(stmt).all()
-    logger.debug(f"User data: {data}")
     return data
 
 @router.get("/verify")
@@ -99,7 +96,6 @@ async def verify_user(
 async def get_role(
     session: Session = Depends(get_atlas_session),
     user = Depends(verify_token)) -> str:
-    logger.debug(f"User: {user}")
     
     # Get user ID from database
     user_info = session.exec(select(SecUser).where(
@@ -121,7 +117,7 @@ async def get_cohort(
 
     user_role = "public" if findout_role(session_atlas, user["sub"]) else "admin"
 
-    logger.debug(f"User role is {user_role}")
+    logger.debug("User role is %s", user_role)
     
     if user_role == "admin":
         stmt = select(ChrtInfo)
@@ -210,13 +206,13 @@ async def sync_cohort(
     )).all()
 
     # Check difference in length to find out there are new cohorts
-    logger.debug(f"Length Difference: {len(atlas_chrts)- len(dc_chrts)}")
+    logger.debug("Length Difference: %s", len(atlas_chrts)- len(dc_chrts))
     
     atlas_chrts_ids = [c.id for c in atlas_chrts]
 
     need_to_add = [c for c in atlas_chrts if c.id not in [d.ext_id for d in dc_chrts]]
 
-    logger.debug(f"Need to add: {len(need_to_add)} cohorts")
+    logger.debug("Need to add: %s cohorts", len(need_to_add))
 
     if len(need_to_add) > 0:
         schm_info_list = [ChrtInfo(ext_id=c.id, name=c.name, description=c.description, owner=user_id, tables=None, origin="ATLAS", created_at=c.created_date, modified_at=c.modified_date) for c in need_to_add]
@@ -227,13 +223,13 @@ async def sync_cohort(
         # Add to schm_cert too
         ext_ids = [c.id for c in need_to_add]
 
-        logger.debug(f"Externel ids {ext_ids}")
+        logger.debug("Externel ids %s", ext_ids)
 
         stmt = select(ChrtInfo).where(ChrtInfo.ext_id.in_(ext_ids))
 
         new_schm_infos = session_dc.exec(stmt).all()
 
-        logger.debug(f"New schm_infos {new_schm_infos}")
+        logger.debug("New schm_infos %s", new_schm_infos)
         
         schm_cert_list = [ChrtCert(id=d.id) for d in new_schm_infos]
 
@@ -256,7 +252,7 @@ async def sync_cohort(
                 session_dc.add(schm_info)
         
         session_dc.commit()
-        logger.debug(f"Updated {len(need_to_update)} cohorts in DataCenter")
+        logger.debug("Updated %s cohorts in DataCenter", len(need_to_update))
 
         return "Cohorts in DataCenter are updated successfully"
 
@@ -273,7 +269,7 @@ async def search_schema(
 
     params = params.strip()
 
-    logger.debug(f"Search params: {params}, condition: {condition}")
+    logger.debug("Search params: %s, condition: %s", params, condition)
     
     items = params.split()
 
@@ -287,7 +283,7 @@ async def search_schema(
             for kw in items
         ]
 
-        logger.debug(f"{db_conditions}")
+        logger.debug("%s", db_conditions)
         stmt = select(ChrtInfo).where(or_(*db_conditions))
 
     elif condition == "user":
@@ -305,7 +301,7 @@ async def search_schema(
 
     result = session_dc.exec(stmt).all()
 
-    logger.debug(f"Search result: {result}")
+    logger.debug("Search result: %s", result)
 
     return result
 
@@ -33,9 +33,8 @@ from utils.tools import findout_id, findout_name
 
 
 # -------- Logging Setup --------
-import logging
-logger = logging.getLogger("uvicorn.error")
-logger.setLevel(logging.DEBUG)
+from utils.logs import get_logger
+logger = get_logger(__name__)
 
 
 # -------- Routes --------
@@ -43,7 +42,6 @@ logger.setLevel(logging.DEBUG)
 async def get_user(
     session: Session = Depends(get_atlas_session),
     user = Depends(verify_token)) -> SecUser:
-    logger.debug(f"User: {user}")
     data = user["sub"]
 
     if data is None:
@@ -64,7 +62,6 @@ async def get_user(
     stmt = select(SecUser)
 
     data = session.exec(stmt).all()
-    logger.debug(f"User data: {data}")
     return data
 
 @router.get("/verify")
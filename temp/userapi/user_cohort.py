@@ -26,9 +26,8 @@ from utils.tools import findout_id, findout_name
 
 
 # -------- Logging Setup --------
-import logging
-logger = logging.getLogger("uvicorn.error")
-logger.setLevel(logging.DEBUG)
+from utils.logs import get_logger
+logger = get_logger(__name__)
 
 
 # -------- Routes --------
@@ -103,8 +102,8 @@ async def apply_cohort(
 
     # Create SchemaInfo
     # Table upload handling
-    logger.debug(f"Tables: {tables} \n Files: {[file.filename for file in files]}")
-    logger.debug(f"Table dimension: {len(tables)} / {len(tables[0])}")
+    logger.debug("Tables: %s \n Files: %s", tables, [file.filename for file in files])
+    logger.debug("Table dimension: %s / %s", len(tables), len(tables[0]))
 
     if schm_info is None:
         c_date = datetime.strptime(created_at, "%Y-%m-%d %H:%M:%S.%f")
@@ -162,7 +161,7 @@ async def apply_cohort(
     cert_oath_dir = os.path.join(docs_path, str(schema_id))
 
     if not os.path.exists(cert_oath_dir):
-        logger.debug(f"Folder Created")
+        logger.debug("Folder Created")
         os.makedirs(cert_oath_dir)
     
     cert_oath_list = []
@@ -187,7 +186,7 @@ async def apply_cohort(
     for cert_oath in cert_oaths:
         cert_oath.path += f"/{schema_id}_{cert_oath.id}.{cert_oath.type}"
 
-        logger.debug(f"File path: {docs_path} + {cert_oath.path}")
+        logger.debug("File path: %s + %s", docs_path, cert_oath.path)
 
         for file in files:
             if file.filename == cert_oath.name:
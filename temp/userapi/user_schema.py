@@ -26,9 +26,8 @@ from utils.tools import compare_dates, findout_id, findout_name, findout_role
 
 
 # -------- Logging Setup --------
-import logging
-logger = logging.getLogger("uvicorn.error")
-logger.setLevel(logging.DEBUG)
+from utils.logs import get_logger
+logger = get_logger(__name__)
 
 
 # -------- Routes --------
@@ -40,7 +39,7 @@ async def get_all_schemas(
 
     user_role = "public" if findout_role(session_atlas, user["sub"]) else "admin"
 
-    logger.debug(f"User role is {user_role}")
+    logger.debug("User role is %s", user_role)
     
     if user_role == "admin":
         stmt = select(ChrtCert).where(ChrtCert.cur_status != "before_apply")
@@ -87,16 +86,13 @@ async def get_all_schemas(
 
         user_schm_status = {e.id: e.cur_status for e in user_schm_certs}
 
-        logger.debug(f"Before length: {len(user_schm_infos)}")
+        logger.debug("Before length: %s", len(user_schm_infos))
 
         for i in range(len(user_schm_infos)-1, -1, -1):
-            logger.debug(f"i: {i}")
-            logger.debug(f"schm_info.id: {user_schm_infos[i].id}, statuses: {user_schm_status.keys()}")
-            logger.debug(f"schm_info.id is in?: {user_schm_infos[i].id in user_schm_status.keys()}")
             if user_schm_infos[i].id not in user_schm_status.keys():
                 del user_schm_infos[i]
 
-        logger.debug(f"After length: {len(user_schm_infos)}")
+        logger.debug("After length: %s", len(user_schm_infos))
 
         user_summary = []
 
@@ -203,28 +199,28 @@ async def apply_schema(
 
     remained_files = json.loads(remained_files)
 
-    logger.debug(f"Dumps: {remained_files}")
+    logger.debug("Dumps: %s", remained_files)
 
     if type(remained_files) == dict:
         remained_files = [remained_files]
 
-    logger.debug(f"List: {remained_files}")
+    logger.debug("List: %s", remained_files)
 
     # Need to remove '/documents'
-    logger.debug(f"Remained_files: {[file['path'][10:] for file in remained_files]}")
+    logger.debug("Remained_files: %s", [file['path'][10:] for file in remained_files])
 
     #  Files removing
     if len(remained_files) > 0:
         for co in cert_oaths:
             if co.path not in [file["path"][10:] for file in remained_files]:
-                logger.debug(f"Removing file: {co.name} at {co.path}\n{docs_path} + {co.path}\nTotal path: {os.path.join(docs_path, co.path)}")
+                logger.debug("Removing file: %s at %s\n%s + %s\nTotal path: %s", co.name, co.path, docs_path, co.path, os.path.join(docs_path, co.path))
                 os.remove(f"{docs_path}/{co.path}")
                 session_dc.delete(co)
 
     # Remove all files
     elif cert_oaths is not None:
         for co in cert_oaths:
-            logger.debug(f"Removing file: {co.name} at {co.path}\n{docs_path} + {co.path}\nTotal path: {os.path.join(docs_path, co.path)}")
+            logger.debug("Removing file: %s at %s\n%s + %s\nTotal path: %s", co.name, co.path, docs_path, co.path, os.path.join(docs_path, co.path))
             os.remove(f"{docs_path}/{co.path}")
             session_dc.delete(co)
     
@@ -261,7 +257,7 @@ async def apply_schema(
         for cert_oath in cert_oaths:
             cert_oath.path += f"/{schema_id}_{cert_oath.id}.{cert_oath.type}"
 
-            logger.debug(f"File path: {docs_path} + {cert_oath.path}")
+            logger.debug("File path: %s + %s", docs_path, cert_oath.path)
 
             for file in files:
                 if file.filename == cert_oath.name:
@@ -0,0 +1,106 @@
+import asyncio
+import os
+import sys
+import time
+
+import pytest
+
+# 저장소 루트에서 실행하는 main.py 와 같은 방식으로 utils, api 를 import
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+
+# -------- DB Fixtures --------
+# secret.py 의 DB 에 붙어서 읽기만 함 (연결할 수 없으면 skip)
+async def _reachable(engine) -> str | None:
+    from sqlalchemy import text
+
+    try:
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+    except Exception as e:
+        return str(e)
+
+    return None
+
+@pytest.fixture
+def dc_session():
+    # 동기 engine (복사 작업, 통계 등 백그라운드 경로)
+    from sqlalchemy import text
+    from sqlmodel import Session
+    from utils.dbm import dc_engine
+
+    try:
+        session = Session(dc_engine)
+        session.exec(text("SELECT 1"))
+    except Exception as e:
+        pytest.skip(f"Database is not reachable: {e}")
+
+    try:
+        yield session
+    finally:
+        session.rollback()
+        session.close()
+
+@pytest.fixture
+def run_db():
+    from utils.dbm import atlas_async_engine, dc_async_engine
+
+    # asyncpg connection 은 event loop 에 묶이므로 test 하나를 loop 하나에서 실행하고 pool 을 비움
+    def run(test):
+        async def main():
+            try:
+                for engine in (atlas_async_engine, dc_async_engine):
+                    error = await _reachable(engine)
+
+                    if error is not None:
+                        return error, None
+
+                return None, await test()
+            finally:
+                await atlas_async_engine.dispose()
+                await dc_async_engine.dispose()
+
+        error, result = asyncio.run(main())
+
+        if error is not None:
+            pytest.skip(f"Database is not reachable: {error}")
+
+        return result
+
+    return run
+
+
+# -------- Benchmarks --------
+# @pytest.mark.bench 는 시간이 오래 걸리므로 --bench 를 줄 때만 실행
+#   python -m pytest -q --bench -s tests
+def pytest_addoption(parser):
+    parser.addoption("--bench", action="store_true", default=False, help="benchmark 도 실행")
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "bench: 시간이 오래 걸리는 benchmark (--bench 로 실행)")
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--bench"):
+        return
+
+    skip = pytest.mark.skip(reason="benchmark 는 --bench 로 실행")
+
+    for item in items:
+        if "bench" in item.keywords:
+            item.add_marker(skip)
+
+@pytest.fixture
+def timed():
+    # 여러 번 실행해서 가장 빠른 시간 (seconds)
+    def run(fn, *args, repeat: int = 3) -> float:
+        best = None
+
+        for _ in range(repeat):
+            started = time.perf_counter()
+            fn(*args)
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+
+        return best
+
+    return run
@@ -0,0 +1,29 @@
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("jwt")
+pytest.importorskip("passlib")
+pytest.importorskip("secret", reason="secret.py 가 필요함")
+
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+
+from utils.auth import create_refresh_token, verify_refresh_token
+
+
+def _creds(token: str) -> HTTPAuthorizationCredentials:
+    return HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+
+def test_refresh_token_is_single_use():
+    token = create_refresh_token("tester")
+
+    assert verify_refresh_token(_creds(token))["sub"] == "tester"
+
+    # /refresh 에서 새 토큰을 받은 뒤 이전 토큰은 거절
+    with pytest.raises(HTTPException) as error:
+        verify_refresh_token(_creds(token))
+
+    assert error.value.status_code == 401
+
+def test_refresh_tokens_are_distinct():
+    assert create_refresh_token("tester") != create_refresh_token("tester")
@@ -0,0 +1,55 @@
+import asyncio
+import time
+
+import pytest
+
+pytest.importorskip("sqlmodel")
+pytest.importorskip("secret", reason="secret.py (DB 접속 정보) 가 필요함")
+
+from sqlalchemy import text
+from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from utils.dbm import dc_engine, dc_async_engine
+
+
+# 동시에 들어온 요청이 각각 느린 쿼리 하나를 실행할 때의 처리량
+#   이전 방식: async route 안에서 동기 Session 사용 (event loop 를 막아서 하나씩 실행됨)
+REQUESTS = 20
+QUERY_SECONDS = 0.05
+
+async def _async_request():
+    async with AsyncSession(dc_async_engine, expire_on_commit=False) as session_dc:
+        await session_dc.exec(text("SELECT pg_sleep(:seconds)"), params={"seconds": QUERY_SECONDS})
+
+async def _sync_request():
+    with Session(dc_engine) as session_dc:
+        session_dc.exec(text("SELECT pg_sleep(:seconds)"), params={"seconds": QUERY_SECONDS})
+
+async def _burst(request) -> float:
+    started = time.perf_counter()
+    await asyncio.gather(*[request() for _ in range(REQUESTS)])
+
+    return REQUESTS / (time.perf_counter() - started)
+
+@pytest.mark.bench
+def test_bench_concurrent_requests(run_db):
+    pool_size = dc_async_engine.pool.size()
+
+    if pool_size < 4:
+        pytest.skip(f"DC_POOL_SIZE {pool_size} is too small to compare")
+
+    async def test():
+        # 첫 연결 비용은 빼고 잼
+        await _async_request()
+        await _sync_request()
+
+        return await _burst(_sync_request), await _burst(_async_request)
+
+    sync_rate, async_rate = run_db(test)
+
+    print(f"\n{REQUESTS} requests x {QUERY_SECONDS * 1000:.0f}ms query: sync session {sync_rate:.1f} req/s"
+          f" / async session (pool {pool_size}) {async_rate:.1f} req/s")
+
+    # 동기 Session 은 요청 수만큼 직렬, async 는 pool 크기만큼 동시에 실행
+    assert async_rate > sync_rate * 3
@@ -0,0 +1,56 @@
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("sqlmodel")
+pytest.importorskip("secret", reason="secret.py 가 필요함")
+
+from utils.tools import index_by, group_by
+
+
+# 목록 API 에서 ChrtInfo - CohortDefinition, ChrtInfo - CertOath 를 맞추는 비용
+COHORTS = 10_000
+
+def _rows():
+    chrt_infos = [SimpleNamespace(id=i, ext_id=COHORTS - i) for i in range(COHORTS)]
+    chrt_defs = [SimpleNamespace(id=i) for i in range(COHORTS)]
+    cert_oaths = [SimpleNamespace(id=i, document_for=i // 2) for i in range(COHORTS * 2)]
+
+    return chrt_infos, chrt_defs, cert_oaths
+
+def nested_join(chrt_infos, chrt_defs, cert_oaths):
+    # 이전 방식: for ci in ...: for cd in ...: if ...
+    results = []
+
+    for ci in chrt_infos:
+        for cd in chrt_defs:
+            if ci.ext_id == cd.id:
+                results.append((ci, cd, [co for co in cert_oaths if co.document_for == ci.id]))
+                break
+
+    return results
+
+def indexed_join(chrt_infos, chrt_defs, cert_oaths):
+    chrt_defs_by_id = index_by(chrt_defs, "id")
+    cert_oaths_by_cohort = group_by(cert_oaths, "document_for")
+
+    return [(ci, chrt_defs_by_id[ci.ext_id], cert_oaths_by_cohort.get(ci.id, []))
+            for ci in chrt_infos if ci.ext_id in chrt_defs_by_id]
+
+def test_joins_match():
+    rows = [rows[:200] for rows in _rows()]
+
+    assert [(ci.id, cd.id, len(cos)) for ci, cd, cos in nested_join(*rows)] == \
+           [(ci.id, cd.id, len(cos)) for ci, cd, cos in indexed_join(*rows)]
+
+@pytest.mark.bench
+def test_bench_joins(timed):
+    rows = _rows()
+
+    indexed = timed(indexed_join, *rows)
+    nested = timed(nested_join, *rows, repeat=1)
+
+    print(f"\n{COHORTS} cohorts: nested {nested * 1000:.0f}ms, indexed {indexed * 1000:.1f}ms ({nested / indexed:.0f}x)")
+
+    assert indexed * 100 < nested
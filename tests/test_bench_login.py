@@ -0,0 +1,65 @@
+import asyncio
+import time
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("passlib")
+pytest.importorskip("secret", reason="secret.py 가 필요함")
+
+from utils.auth import pwd_context, verify_password, HASH_WORKERS
+
+
+# 로그인이 몰릴 때 다른 요청이 event loop 를 얼마나 기다리는지 비교
+#   다른 endpoint 대신 1ms 마다 깨어나는 task 의 지연을 잼
+LOGINS = 32
+PROBE_INTERVAL = 0.001
+
+def _p99(values: list[float]) -> float:
+    values = sorted(values)
+
+    return values[min(len(values) - 1, int(len(values) * 0.99))]
+
+async def _probe(stop: asyncio.Event, lags: list[float]):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(PROBE_INTERVAL)
+        lags.append(time.perf_counter() - started - PROBE_INTERVAL)
+
+async def _storm(login) -> tuple[float, float]:
+    # (다른 요청의 p99 지연, 전체 시간)
+    stop = asyncio.Event()
+    lags = []
+
+    probe = asyncio.create_task(_probe(stop, lags))
+    await asyncio.sleep(0.01)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[login() for _ in range(LOGINS)])
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await probe
+
+    return _p99(lags), elapsed
+
+@pytest.mark.bench
+def test_bench_login_storm():
+    hashed = pwd_context.hash("password")
+
+    async def inline():
+        # 이전 방식: event loop 에서 바로 bcrypt 실행
+        assert pwd_context.verify("password", hashed)
+
+    async def pooled():
+        ok, _ = await verify_password("password", hashed)
+        assert ok
+
+    inline_p99, inline_elapsed = asyncio.run(_storm(inline))
+    pooled_p99, pooled_elapsed = asyncio.run(_storm(pooled))
+
+    print(f"\n{LOGINS} logins: inline p99 {inline_p99 * 1000:.1f}ms ({inline_elapsed:.2f}s)"
+          f" / pool of {HASH_WORKERS} p99 {pooled_p99 * 1000:.1f}ms ({pooled_elapsed:.2f}s)")
+
+    # bcrypt 한 번이 통째로 다른 요청을 막지 않아야 함
+    assert pooled_p99 * 5 < inline_p99
@@ -0,0 +1,60 @@
+import pytest
+
+pytest.importorskip("sqlmodel")
+pytest.importorskip("secret", reason="secret.py (DB 접속 정보) 가 필요함")
+
+from sqlalchemy import text
+
+from utils.dbm import stage_subjects, drop_stage, drop_table
+
+
+# 이전 방식 (person_id IN (1, 2, ...) 리터럴) 과 dc_stage 적재 후 chunk 배열 조건 비교
+#   복사 대상 테이블 대신 dc_stage 에 person_id 만 있는 테이블을 만들어 사용
+PERSON_TABLE = "bench_person"
+STAGE_NAME = "bench_subjects"
+
+def _explain(session_dc, sql: str) -> tuple[float, float]:
+    # (planning ms, execution ms)
+    plan = session_dc.exec(text(f"EXPLAIN (ANALYZE, FORMAT JSON) {sql}")).scalar()[0]
+
+    return plan["Planning Time"], plan["Execution Time"]
+
+@pytest.mark.bench
+@pytest.mark.parametrize("subjects", [1_000, 100_000, 1_000_000])
+def test_bench_subject_filter(dc_session, subjects):
+    # 대상자는 전체의 절반
+    subject_ids = list(range(2, subjects * 2 + 1, 2))
+
+    dc_session.exec(text(f"""
+        CREATE SCHEMA IF NOT EXISTS dc_stage;
+        DROP TABLE IF EXISTS dc_stage.{PERSON_TABLE};
+        CREATE UNLOGGED TABLE dc_stage.{PERSON_TABLE} AS SELECT g AS person_id FROM generate_series(1, {subjects * 2}) g;
+        CREATE INDEX ON dc_stage.{PERSON_TABLE} (person_id);
+        ANALYZE dc_stage.{PERSON_TABLE};
+        """))
+    dc_session.commit()
+
+    try:
+        literal = f"SELECT count(*) FROM dc_stage.{PERSON_TABLE} WHERE person_id IN ({', '.join(map(str, subject_ids))})"
+        literal_plan, literal_exec = _explain(dc_session, literal)
+
+        stage = stage_subjects(dc_session, STAGE_NAME, subject_ids)
+        staged_plan, staged_exec = 0.0, 0.0
+
+        for chunk_no in range(stage.chunks):
+            plan, execution = _explain(dc_session,
+                f"SELECT count(*) FROM dc_stage.{PERSON_TABLE} WHERE {stage.chunk_filter('person_id', chunk_no)}")
+
+            staged_plan += plan
+            staged_exec += execution
+
+        drop_stage(dc_session, stage)
+    finally:
+        drop_table(dc_session, "dc_stage", PERSON_TABLE)
+
+    print(f"\n{subjects} subjects: literal {len(literal) / 1024:.0f}KB plan {literal_plan:.1f}ms exec {literal_exec:.1f}ms"
+          f" / staged {stage.chunks} chunks plan {staged_plan:.1f}ms exec {staged_exec:.1f}ms")
+
+    # 문장 길이와 planning 시간이 대상자 수에 비례하지 않아야 함
+    if subjects >= 100_000:
+        assert staged_plan < literal_plan
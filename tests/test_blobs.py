@@ -0,0 +1,81 @@
+from datetime import datetime
+import hashlib
+import os
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("sqlmodel")
+pytest.importorskip("secret", reason="secret.py (DB 접속 정보) 가 필요함")
+
+from fastapi import HTTPException
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from utils import blobs
+from utils.dbm import dc_async_engine, ChrtInfo, CertOath
+from utils.uploads import StagedUpload
+
+
+# DB 에 없는 사용자, 행은 마지막에 rollback
+OWNER = -1
+OTHER = -2
+
+def _stage(tmp_path, content: bytes) -> StagedUpload:
+    tmp_file = tmp_path / "upload.part"
+    tmp_file.write_bytes(content)
+
+    return StagedUpload("irb.pdf", str(tmp_file), len(content), hashlib.sha256(content).hexdigest(), "application/pdf")
+
+async def _apply(session_dc: AsyncSession, cohort_id: int, sha256: str) -> CertOath:
+    co = CertOath(name="irb.pdf", path=blobs.blob_path(sha256), sha256=sha256, document_for=cohort_id)
+    session_dc.add(co)
+    await session_dc.flush()
+
+    return co
+
+def test_reuse_after_sync(run_db, tmp_path, monkeypatch):
+    # 파일은 임시 폴더에만 놓음
+    monkeypatch.setattr(blobs, "DOCS_PATH", str(tmp_path))
+
+    content = f"reuse test {datetime.now().isoformat()}".encode()
+
+    async def test():
+        now = datetime.now()
+
+        async with AsyncSession(dc_async_engine, expire_on_commit=False) as session_dc:
+            try:
+                chrt_info = ChrtInfo(ext_id=-1, owner=OWNER, origin="ATLAS", modified_at=now,
+                                     name="reuse test", created_at=now)
+                session_dc.add(chrt_info)
+                await session_dc.flush()
+
+                # apply: 업로드
+                sha256 = await blobs.acquire_blob(session_dc, _stage(tmp_path, content), OWNER)
+                co = await _apply(session_dc, chrt_info.id, sha256)
+
+                # sync: cohort 의 cert_oath 를 모두 제거
+                await blobs.release_cert_oaths(session_dc, [co])
+                await session_dc.flush()
+
+                found = await blobs.find_blob(session_dc, sha256, OWNER)
+                hidden = await blobs.find_blob(session_dc, sha256, OTHER)
+
+                # apply: 업로드 없이 다시 참조
+                size, mime = await blobs.acquire_stored_blob(session_dc, sha256, OWNER)
+                await _apply(session_dc, chrt_info.id, sha256)
+
+                # 올린 적 없는 사용자는 hash 를 알아도 참조할 수 없음
+                with pytest.raises(HTTPException) as denied:
+                    await blobs.acquire_stored_blob(session_dc, sha256, OTHER)
+
+                return found is not None, hidden, size, mime, denied.value.status_code
+            finally:
+                await session_dc.rollback()
+
+    found, hidden, size, mime, denied = run_db(test)
+
+    assert found
+    assert hidden is None
+    assert (size, mime) == (len(content), "application/pdf")
+    assert denied == 403
+    assert os.path.exists(os.path.join(tmp_path, "blobs"))
@@ -0,0 +1,49 @@
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip("sqlmodel")
+pytest.importorskip("secret", reason="secret.py (DB 접속 정보) 가 필요함")
+
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from utils.dbm import dc_async_engine, ChrtInfo, ChrtCert
+
+
+# 행을 만들고 바꾼 뒤 rollback (DB 에 남기지 않음)
+MISSING_OWNER = -1
+
+async def _update_status(statuses: list[str]) -> list[str]:
+    now = datetime.now()
+    seen = []
+
+    async with AsyncSession(dc_async_engine, expire_on_commit=False) as session_dc:
+        try:
+            chrt_info = ChrtInfo(ext_id=-1, owner=MISSING_OWNER, origin="ATLAS", modified_at=now,
+                                 name="status test", created_at=now)
+            session_dc.add(chrt_info)
+            await session_dc.flush()
+
+            chrt_cert = ChrtCert(id=chrt_info.id, cur_status="before_apply")
+            session_dc.add(chrt_cert)
+            await session_dc.flush()
+
+            # approve / reject / apply / sync 와 같은 방식으로 속성을 바꾸고 flush
+            for status in statuses:
+                chrt_cert.cur_status = status
+                session_dc.add(chrt_cert)
+                await session_dc.flush()
+
+                stmt = select(ChrtCert.cur_status).where(ChrtCert.id == chrt_info.id, ChrtCert.cur_status == status)
+                seen.append((await session_dc.exec(stmt)).first())
+        finally:
+            await session_dc.rollback()
+
+    return seen
+
+def test_status_update_through_async_session(run_db):
+    # asyncpg 는 bind 값에 열 타입으로 cast 하므로 모델 타입이 DB 열과 맞아야 함
+    statuses = ["applied", "approved", "rejected", "before_apply"]
+
+    assert run_db(lambda: _update_status(statuses)) == statuses
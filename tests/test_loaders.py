@@ -0,0 +1,37 @@
+import pytest
+
+pytest.importorskip("sqlmodel")
+pytest.importorskip("secret", reason="secret.py (DB 접속 정보) 가 필요함")
+
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from utils.dbm import dc_async_engine
+from utils.loaders import load_applied_cohorts, load_cert_oaths, load_connect_infos
+from utils.tracing import count_queries
+
+
+# 없는 사용자와 코호트 id 로 조회 (쿼리 수는 결과 행 수와 무관)
+MISSING_OWNER = -1
+
+async def _count(cohort_ids: list[int]) -> int:
+    async with AsyncSession(dc_async_engine, expire_on_commit=False) as session_dc:
+        with count_queries() as queries:
+            await load_applied_cohorts(session_dc, MISSING_OWNER)
+            await load_cert_oaths(session_dc, cohort_ids)
+            await load_connect_infos(session_dc, cohort_ids)
+
+    return queries.by_engine.get("dc_async", 0)
+
+def test_loaders_issue_fixed_queries(run_db):
+    async def test():
+        return await _count([1]), await _count(list(range(1, 201)))
+
+    one, many = run_db(test)
+
+    # 코호트 목록 1 + cert_oath 1 + 접속 정보 1
+    assert one == 3
+    assert many == one
+
+def test_loaders_skip_empty_ids(run_db):
+    # 코호트가 없으면 목록 조회만
+    assert run_db(lambda: _count([])) == 1
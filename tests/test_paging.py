@@ -0,0 +1,70 @@
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("sqlmodel")
+pytest.importorskip("secret", reason="secret.py (DB 접속 정보) 가 필요함")
+
+from fastapi import HTTPException
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from utils.dbm import dc_async_engine, ChrtInfo, ChrtCert
+from utils.paging import PageParams, APPLY_SORTS, apply_page, encode_cursor, decode_cursor
+
+
+def _params(sort: str, cursor: str | None = None) -> PageParams:
+    return PageParams(20, cursor, sort, "asc", None, None, None, None)
+
+def _applies(params: PageParams):
+    stmt = select(ChrtInfo, ChrtCert).join(ChrtCert, ChrtCert.id == ChrtInfo.id)
+
+    return apply_page(stmt, params, ChrtCert.applied_at, APPLY_SORTS)
+
+def _sql(stmt) -> str:
+    return str(stmt.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+
+def test_null_date_is_inline():
+    # bind parameter 면 COALESCE 식 index 와 맞지 않음
+    sql = _sql(_applies(_params("applied")))
+
+    assert "coalesce(dc_management.chrt_cert.applied_at, '1970-01-01'::TIMESTAMP)" in sql
+
+def test_cursor_of_other_sort_is_rejected():
+    cursor = encode_cursor("cohort", 3, "name")
+
+    assert decode_cursor(cursor, "name") == ("cohort", 3)
+
+    with pytest.raises(HTTPException) as error:
+        _applies(_params("applied", cursor))
+
+    assert error.value.status_code == 400
+
+def test_cursor_keeps_dates():
+    date = datetime(2025, 3, 1, 9, 30)
+
+    assert decode_cursor(encode_cursor(date, 7, "applied"), "applied") == (date, 7)
+
+@pytest.mark.parametrize("sort, index", [("applied", "chrt_cert_applied_idx"), ("resolved", "chrt_cert_resolved_idx")])
+def test_keyset_uses_expression_index(run_db, sort, index):
+    cursor = encode_cursor(datetime(2025, 1, 1), 1, sort)
+
+    async def test():
+        async with AsyncSession(dc_async_engine) as session_dc:
+            try:
+                # 행이 적으면 seq scan + sort 가 더 싸므로 끄고, index 를 쓸 수 있는지만 확인
+                await session_dc.exec(text("SET LOCAL enable_seqscan = off"))
+                await session_dc.exec(text("SET LOCAL enable_sort = off"))
+
+                result = await session_dc.exec(text("EXPLAIN " + _sql(_applies(_params(sort, cursor)))))
+
+                return "\n".join(row[0] for row in result.all())
+            finally:
+                await session_dc.rollback()
+
+    plan = run_db(test)
+
+    assert index in plan, plan
@@ -0,0 +1,66 @@
+import pytest
+
+pytest.importorskip("sqlalchemy")
+pytest.importorskip("secret", reason="secret.py 가 필요함")
+
+from sqlalchemy import create_engine
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+
+from utils.pools import InstrumentedQueuePool, instrument_engine, resize_pool, _engines
+
+
+# DB 없이 실제 QueuePool 을 쓰기 위해 sqlite 파일 engine 사용
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'pool.db'}", poolclass=InstrumentedQueuePool,
+                           pool_size=2, max_overflow=0, pool_timeout=0.1)
+    instrument_engine("test", engine)
+
+    yield engine
+
+    _engines.pop("test", None)
+    engine.dispose()
+
+def test_resize_pool_under_checkout(engine):
+    held = engine.connect()
+    held.exec_driver_sql("SELECT 1")
+
+    telemetry = engine.pool.telemetry
+    connects = telemetry.connects
+
+    resize_pool(engine, 3)
+
+    assert engine.pool.size() == 3
+    assert engine.pool.telemetry is telemetry
+
+    # 새 pool 에서 늘어난 크기만큼 연결 가능
+    others = [engine.connect() for _ in range(3)]
+
+    for conn in others:
+        conn.exec_driver_sql("SELECT 1")
+
+    # engine 의 connect event 도 새 pool 로 넘어감
+    assert telemetry.connects == connects + 3
+
+    # 교체 전에 빌린 연결도 그대로 사용 / 반환 가능
+    held.exec_driver_sql("SELECT 1")
+    held.close()
+
+    for conn in others:
+        conn.close()
+
+def test_shrink_pool_limits_checkouts(engine):
+    resize_pool(engine, 1)
+
+    with engine.connect() as conn:
+        conn.exec_driver_sql("SELECT 1")
+
+        with pytest.raises(PoolTimeout):
+            engine.connect()
+
+    assert engine.pool.telemetry.timeouts == 1
+
+    # engine.dispose() 로 다시 만들어도 바뀐 크기를 유지
+    engine.dispose()
+
+    assert engine.pool.size() == 1
@@ -0,0 +1,54 @@
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip("sqlmodel")
+pytest.importorskip("secret", reason="secret.py (DB 접속 정보) 가 필요함")
+
+from utils import stats
+
+
+# DB 에 없는 코호트 정의
+MISSING_EXT_ID = -1
+
+class InlineExecutor():
+    # 백그라운드 대신 바로 실행
+    def submit(self, fn):
+        fn()
+
+@pytest.fixture
+def failing_stats(monkeypatch):
+    calls = []
+
+    def compute_stats(ext_id, modified_date):
+        calls.append(ext_id)
+        raise RuntimeError("ATLAS is not reachable")
+
+    monkeypatch.setattr(stats, "compute_stats", compute_stats)
+    monkeypatch.setattr(stats, "_executor", InlineExecutor())
+    monkeypatch.setattr(stats, "_failed", dict())
+
+    return calls
+
+def test_failed_stats_wait_for_cooldown(failing_stats, monkeypatch):
+    modified_date = datetime(2024, 1, 1)
+
+    stats.schedule_stats(MISSING_EXT_ID, modified_date)
+    stats.schedule_stats(MISSING_EXT_ID, modified_date)
+
+    # 목록 요청이 반복되어도 대기 시간 동안은 다시 계산하지 않음
+    assert failing_stats == [MISSING_EXT_ID]
+
+    # 대기 시간이 지나면 다시 시도
+    monkeypatch.setattr(stats, "STATS_RETRY_SECONDS", 0)
+    stats.schedule_stats(MISSING_EXT_ID, modified_date)
+
+    assert failing_stats == [MISSING_EXT_ID, MISSING_EXT_ID]
+
+def test_modified_cohort_retries_immediately(failing_stats):
+    stats.schedule_stats(MISSING_EXT_ID, datetime(2024, 1, 1))
+
+    # ATLAS 에서 수정된 경우는 바로 다시 계산
+    stats.schedule_stats(MISSING_EXT_ID, datetime(2024, 1, 2))
+
+    assert failing_stats == [MISSING_EXT_ID, MISSING_EXT_ID]
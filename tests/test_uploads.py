@@ -0,0 +1,58 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("aiofiles")
+pytest.importorskip("secret", reason="secret.py 가 필요함")
+
+from fastapi import HTTPException
+
+from utils.uploads import UploadLimitMiddleware
+
+
+LIMIT = 1000
+
+def _scope(headers: dict) -> dict:
+    return {"type": "http", "method": "POST", "path": "/api/cohort/apply",
+            "headers": [(key.encode(), value.encode()) for key, value in headers.items()]}
+
+def _run(headers: dict, chunks: list[bytes]) -> tuple[list[dict], int]:
+    # (보낸 응답 메시지, app 이 읽은 bytes)
+    sent = []
+    read = [0]
+
+    async def app(scope, receive, send):
+        while True:
+            message = await receive()
+            read[0] += len(message.get("body", b""))
+
+            if not message.get("more_body"):
+                break
+
+    async def receive():
+        body = chunks.pop(0)
+        return {"type": "http.request", "body": body, "more_body": len(chunks) > 0}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(UploadLimitMiddleware(app, LIMIT)(_scope(headers), receive, send))
+
+    return sent, read[0]
+
+def test_rejects_by_content_length_without_reading():
+    sent, read = _run({"content-type": "multipart/form-data; boundary=x", "content-length": str(LIMIT + 1)}, [b"x" * 10])
+
+    assert sent[0]["status"] == 413
+    assert read == 0
+
+def test_rejects_chunked_body_while_receiving():
+    with pytest.raises(HTTPException) as error:
+        _run({"content-type": "multipart/form-data; boundary=x"}, [b"x" * 600, b"x" * 600, b"x" * 600])
+
+    assert error.value.status_code == 413
+
+def test_passes_small_and_other_requests():
+    assert _run({"content-type": "multipart/form-data; boundary=x", "content-length": "500"}, [b"x" * 500]) == ([], 500)
+    assert _run({"content-type": "application/json", "content-length": str(LIMIT * 10)}, [b"x" * LIMIT * 10]) == ([], LIMIT * 10)
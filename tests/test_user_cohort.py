@@ -0,0 +1,80 @@
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("sqlmodel")
+pytest.importorskip("secret", reason="secret.py (DB 접속 정보) 가 필요함")
+
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from api.userapi import user_cohort
+from utils import stats
+from utils.dbm import atlas_async_engine, dc_async_engine, ChrtInfo, ChrtCert
+from utils.identity import Identity
+from utils.paging import PageParams
+from utils.tracing import count_queries
+
+
+# DB 에 없는 사용자 (코호트 행은 아래에서 만들어서 넘김)
+MISSING_OWNER = -1
+
+def _applied(count: int) -> list[tuple[ChrtInfo, ChrtCert]]:
+    now = datetime.now()
+
+    return [
+        (ChrtInfo(id=-i, ext_id=-i, owner=MISSING_OWNER, tables=["person"], origin="ATLAS",
+                  modified_at=now, name=f"cohort {i}", created_at=now),
+         ChrtCert(id=-i, applied_at=now, cur_status="approved" if i % 2 == 1 else "applied"))
+        for i in range(1, count + 1)
+    ]
+
+@pytest.fixture
+def applied_cohorts(monkeypatch):
+    rows = []
+
+    async def load_applied_cohorts(session_dc, owner=None, page=None):
+        return rows
+
+    real_get_syncable = user_cohort.get_syncable
+
+    async def get_syncable(session_atlas, session_dc, user_id):
+        # 쿼리는 그대로 실행하고 만든 코호트만 채움
+        syncables = await real_get_syncable(session_atlas, session_dc, user_id)
+        return {ci.id: syncables.get(ci.id, False) for ci, _ in rows}
+
+    monkeypatch.setattr(user_cohort, "load_applied_cohorts", load_applied_cohorts)
+    monkeypatch.setattr(user_cohort, "get_syncable", get_syncable)
+
+    # 통계 계산 작업은 띄우지 않음
+    monkeypatch.setattr(stats, "schedule_stats", lambda ext_id, modified_date: None)
+
+    return rows
+
+async def _count(rows: list, count: int) -> int:
+    rows[:] = _applied(count)
+
+    page = PageParams(None, None, "id", "asc", None, None, None, None)
+    identity = Identity(MISSING_OWNER, "tester", "tester", "public")
+
+    async with AsyncSession(atlas_async_engine, expire_on_commit=False) as session_atlas, \
+               AsyncSession(dc_async_engine, expire_on_commit=False) as session_dc:
+
+        with count_queries() as queries:
+            results = await user_cohort.get_my_applied_cohorts(user_cohort.Response(), page, session_atlas, session_dc, identity)
+
+    assert len(results) == count
+
+    return queries.count
+
+def test_applied_cohorts_issue_fixed_queries(run_db, applied_cohorts):
+    async def test():
+        return await _count(applied_cohorts, 1), await _count(applied_cohorts, 50)
+
+    one, many = run_db(test)
+
+    # cert_oath 1 + 접속 정보 1 + 동기화 여부 2 (dc, atlas) + 통계 1
+    assert one == 5
+
+    # 코호트 수가 늘어도 쿼리 수는 그대로 (N+1 회귀 방지)
+    assert many == one
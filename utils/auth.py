@@ -2,36 +2,153 @@ from fastapi import Depends, HTTPException
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel
 
+from passlib.context import CryptContext
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone, timedelta
+import asyncio
+import hashlib
+import time
+import uuid
 import jwt
 
 
 # -------- Importing secret.py --------
+import secret
 from secret import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES
 
+REFRESH_TOKEN_EXPIRE_MINUTES = getattr(secret, "REFRESH_TOKEN_EXPIRE_MINUTES", 60 * 24)
+
+# bcrypt 는 요청마다 수백 ms CPU 를 쓰므로 이벤트 루프 밖에서 제한된 수만큼만 실행
+HASH_WORKERS = getattr(secret, "HASH_WORKERS", 4)
+
+# 토큰에 담긴 uid / role 을 DB 조회 없이 믿는 최대 시간
+# 이 시간이 지나면 DB (identity 캐시) 에서 다시 확인하므로 권한 변경이 이 시간 안에 반영됨
+CLAIMS_MAX_AGE_MINUTES = getattr(secret, "CLAIMS_MAX_AGE_MINUTES", 15)
+
+# 검증을 마친 토큰의 payload 를 만료 시각까지 보관할 최대 개수
+TOKEN_CACHE_SIZE = getattr(secret, "TOKEN_CACHE_SIZE", 4096)
+
+# 이미 사용한 refresh token 을 만료 시각까지 기억할 최대 개수
+REFRESH_CACHE_SIZE = getattr(secret, "REFRESH_CACHE_SIZE", 65536)
+
+# claim 구성이 바뀌면 올려서 이전 토큰의 claim 을 무시
+TOKEN_VERSION = 1
+
 
 # -------- Logging Setup --------
-import logging
-logger = logging.getLogger("uvicorn.error")
-logger.setLevel(logging.DEBUG)
+from utils.logs import get_logger
+logger = get_logger(__name__)
+
+
+# -------- Cache Imports --------
+from utils.cache import TTLCache, register_cache
 
 
 # -------- Setting Security --------
 security = HTTPBearer()
 
+# <a href> 나 PDF 뷰어처럼 헤더를 붙일 수 없는 요청은 ?token= 으로도 받음
+optional_security = HTTPBearer(auto_error=False)
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+_hash_pool = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="hash")
+
+async def verify_password(plain: str, hashed: str) -> tuple[bool, str | None]:
+    # (일치 여부, 새 해시) 를 반환. 새 해시는 rounds 등 설정이 바뀌어 다시 저장해야 할 때만 있음
+    loop = asyncio.get_running_loop()
+
+    return await loop.run_in_executor(_hash_pool, pwd_context.verify_and_update, plain, hashed)
+
 class Token(BaseModel):
     access_token: str
     token_type: str
 
-class TokenData(BaseModel):
-    sub: str = '1234567890'
-    aud: str = 'normal_user'
-    iat: int = datetime.now(timezone.utc)
-    exp: int = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+def create_access_token(sub: str, uid: int, name: str, role: str) -> str:
+    now = datetime.now(timezone.utc)
+
+    payload = {"sub": sub, "aud": "normal_user",
+               "uid": uid, "name": name, "role": role, "ver": TOKEN_VERSION,
+               "iat": now,
+               "exp": now + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)}
+
+    return jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHM)
+
+def create_refresh_token(sub: str) -> str:
+    now = datetime.now(timezone.utc)
+
+    # refresh token 은 audience 가 달라서 API 호출에 사용할 수 없음
+    payload = {"sub": sub, "aud": "refresh", "ver": TOKEN_VERSION, "jti": uuid.uuid4().hex,
+               "iat": now,
+               "exp": now + timedelta(minutes=REFRESH_TOKEN_EXPIRE_MINUTES)}
+
+    return jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHM)
+
+def fresh_claims(payload: dict) -> bool:
+    if payload.get("ver") != TOKEN_VERSION:
+        return False
+
+    if payload.get("uid") is None or payload.get("role") is None or payload.get("name") is None:
+        return False
+
+    issued_at = payload.get("iat")
+
+    if issued_at is None:
+        return False
+
+    age = datetime.now(timezone.utc).timestamp() - issued_at
+
+    return age < CLAIMS_MAX_AGE_MINUTES * 60
+
+# 사용한 refresh token 의 jti (process 메모리라 재시작하면 비워짐)
+_used_refresh = register_cache("refresh", TTLCache(REFRESH_CACHE_SIZE, REFRESH_TOKEN_EXPIRE_MINUTES * 60))
+
+def verify_refresh_token(creds: HTTPAuthorizationCredentials = Depends(security)):
+    try:
+        payload = jwt.decode(creds.credentials, SECRET_KEY, algorithms=[ALGORITHM],
+                             audience="refresh",
+                             options={"require": ["exp", "sub"]})
+    except jwt.PyJWTError as e:
+        logger.error("Refresh token verification failed: %s", e)
+        raise HTTPException(status_code=401, detail="Refresh token verification failed")
+
+    if payload.get("ver") != TOKEN_VERSION:
+        raise HTTPException(status_code=401, detail="Refresh token is outdated")
+
+    # /refresh 마다 새 refresh token 을 주므로 한 번 쓴 토큰은 다시 받지 않음
+    jti = payload.get("jti")
+
+    if jti is None or _used_refresh.get(jti) is not None:
+        logger.warning("Reused refresh token for %s", payload.get("sub"))
+        raise HTTPException(status_code=401, detail="Refresh token is already used")
+
+    _used_refresh.set(jti, True, ttl=max(payload["exp"] - time.time(), 1))
+
+    return payload
+
+# 서명 검증은 토큰마다 프로세스당 한 번만 수행
+# key 는 토큰 원문 대신 sha256, 항목은 토큰의 exp 에 맞춰 만료
+_tokens = register_cache("token", TTLCache(TOKEN_CACHE_SIZE, ACCESS_TOKEN_EXPIRE_MINUTES * 60))
+
+def _token_key(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+def token_cache_stats() -> dict:
+    return _tokens.stats()
+
+def invalidate_tokens(token: str | None = None):
+    # SECRET_KEY 교체 등으로 이미 검증한 토큰을 다시 확인해야 할 때
+    # token 이 없으면 전체 비움
+    _tokens.invalidate(None if token is None else _token_key(token))
 
 def verify_token(creds: HTTPAuthorizationCredentials = Depends(security)):
     token = creds.credentials
-    logger.debug(f"Verifying token: {token}")
+    key = _token_key(token)
+
+    payload = _tokens.get(key)
+
+    if payload is not None:
+        return dict(payload)
 
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM],
@@ -42,11 +159,28 @@ def verify_token(creds: HTTPAuthorizationCredentials = Depends(security)):
             logger.error("User data not found")
             raise HTTPException(status_code=401, detail="User data not found")
         
+        ttl = payload["exp"] - time.time()
+
+        if ttl > 0:
+            _tokens.set(key, dict(payload), ttl=ttl)
+
         return payload
     except jwt.PyJWTError as e:
-        logger.error(f"Token verification failed: {e}")
+        logger.error("Token verification failed: %s", e)
         raise HTTPException(status_code=401, detail="Token verification failed")
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expired")
     except jwt.InvalidAudienceError:
-        raise HTTPException(status_code=401, detail="Invalid audience")
\ No newline at end of file
+        raise HTTPException(status_code=401, detail="Invalid audience")
+
+def verify_token_or_param(
+    creds: HTTPAuthorizationCredentials | None = Depends(optional_security),
+    token: str | None = None):
+
+    if creds is None and token is None:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+
+    if creds is None:
+        creds = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+
+    return verify_token(creds)
@@ -0,0 +1,423 @@
+from fastapi import HTTPException
+
+from datetime import datetime, timedelta
+import hashlib
+import os
+import time
+
+from sqlmodel import Session, select
+from sqlalchemy import text
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+
+# -------- Importing secret.py --------
+import secret
+
+# ref_count 가 0 이 된 뒤 이 시간이 지나야 GC 대상 (같은 파일을 곧 다시 올리는 경우 대비)
+BLOB_GC_GRACE_SECONDS = getattr(secret, "BLOB_GC_GRACE_SECONDS", 60 * 60)
+
+# 한 transaction 에서 지울 doc_blob 행 수
+BLOB_GC_BATCH_SIZE = getattr(secret, "BLOB_GC_BATCH_SIZE", 100)
+
+
+# -------- DBM Imports --------
+from utils.dbm import dc_engine, CertOath, DocBlob, DocBlobOwner
+from utils.uploads import DOCS_PATH, StagedUpload, commit_upload, guess_mime
+
+
+# -------- Logging Setup --------
+from utils.logs import get_logger
+logger = get_logger(__name__)
+
+
+# -------- Paths --------
+# documents/blobs/{sha256 앞 2자리}/{sha256}
+BLOBS_DIR = "blobs"
+BLOBS_PATH = os.path.join(DOCS_PATH, BLOBS_DIR)
+
+# GC 가 행을 지우는 동안 파일을 옮겨두는 곳 (commit 후 삭제, 실패하면 되돌림)
+TRASH_PATH = os.path.join(DOCS_PATH, ".trash")
+
+def blob_path(sha256: str) -> str:
+    # CertOath.path 와 같은 형식 (documents 기준, "/" 로 시작)
+    return f"/{BLOBS_DIR}/{sha256[:2]}/{sha256}"
+
+def blob_file(sha256: str) -> str:
+    return DOCS_PATH + blob_path(sha256)
+
+def is_sha256(value: str) -> bool:
+    return len(value) == 64 and all(c in "0123456789abcdef" for c in value)
+
+
+# -------- Reference Counting --------
+# doc_blob 행 잠금으로 GC 와 순서를 맞춤
+#   GC 는 ref_count 0 인 행을 FOR UPDATE 로 잡고 파일을 .trash 로 옮긴 뒤 행을 삭제하고 commit
+#   acquire 는 같은 행을 갱신하므로 GC 의 commit 을 기다린 뒤 파일이 없으면 다시 놓음
+async def acquire_blob(session_dc: AsyncSession, upload: StagedUpload, owner: int) -> str:
+    stmt = text("""
+        INSERT INTO dc_management.doc_blob (sha256, size, mime, ref_count, created_at)
+        VALUES (:sha256, :size, :mime, 1, now())
+        ON CONFLICT (sha256) DO UPDATE
+            SET ref_count = dc_management.doc_blob.ref_count + 1, released_at = NULL
+        """)
+
+    await session_dc.exec(stmt, params={"sha256": upload.sha256, "size": upload.size, "mime": upload.mime})
+
+    # 내용을 직접 올린 사용자만 이후 업로드 없이 다시 참조할 수 있음
+    stmt = text("""
+        INSERT INTO dc_management.doc_blob_owner (sha256, owner) VALUES (:sha256, :owner)
+        ON CONFLICT DO NOTHING
+        """)
+
+    await session_dc.exec(stmt, params={"sha256": upload.sha256, "owner": owner})
+
+    if os.path.exists(blob_file(upload.sha256)):
+        # 이미 저장된 내용이면 새로 받은 파일은 버림
+        upload.discard()
+    else:
+        commit_upload(upload, blob_file(upload.sha256))
+
+    return upload.sha256
+
+async def owns_blob(session_dc: AsyncSession, sha256: str, owner: int) -> bool:
+    # hash 만 알아서는 다른 사람의 문서를 가져갈 수 없도록 본인이 올린 적 있는 blob 만 허용
+    #   cert_oath 가 모두 지워져도 (sync 후 재신청) GC 가 blob 을 지우기 전까지 유지
+    stmt = select(DocBlobOwner.sha256).where(DocBlobOwner.sha256 == sha256, DocBlobOwner.owner == owner)
+
+    return (await session_dc.exec(stmt)).first() is not None
+
+async def acquire_stored_blob(session_dc: AsyncSession, sha256: str, owner: int) -> tuple[int, str | None]:
+    # 업로드 없이 이미 저장된 blob 을 참조. (크기, MIME) 을 반환
+    if not await owns_blob(session_dc, sha256, owner):
+        raise HTTPException(status_code=403, detail=f"Document {sha256} is not available for reuse")
+
+    stmt = text("""
+        UPDATE dc_management.doc_blob SET ref_count = ref_count + 1, released_at = NULL
+        WHERE sha256 = :sha256
+        RETURNING size, mime
+        """)
+
+    row = (await session_dc.exec(stmt, params={"sha256": sha256})).first()
+
+    if row is None or not os.path.exists(blob_file(sha256)):
+        raise HTTPException(status_code=409, detail=f"Document {sha256} is not stored, upload it again")
+
+    return row[0], row[1]
+
+async def release_blob(session_dc: AsyncSession, sha256: str):
+    stmt = text("""
+        UPDATE dc_management.doc_blob
+        SET ref_count = GREATEST(ref_count - 1, 0),
+            released_at = CASE WHEN ref_count <= 1 THEN now() ELSE released_at END
+        WHERE sha256 = :sha256
+        """)
+
+    await session_dc.exec(stmt, params={"sha256": sha256})
+
+async def release_cert_oaths(session_dc: AsyncSession, cert_oaths: list[CertOath]):
+    # CertOath 행을 지우고 blob 참조를 반환 (commit 은 호출하는 쪽에서)
+    for co in cert_oaths:
+        if co.sha256 is not None:
+            await release_blob(session_dc, co.sha256)
+
+        elif co.path is not None and os.path.isfile(DOCS_PATH + co.path):
+            # blob 이전에 cohort 폴더에 저장된 파일
+            os.remove(DOCS_PATH + co.path)
+
+        await session_dc.delete(co)
+
+async def find_blob(session_dc: AsyncSession, sha256: str, owner: int) -> DocBlob | None:
+    # owns_blob 과 같은 기준 (다른 사람의 문서가 있는지는 알려주지 않음)
+    if not await owns_blob(session_dc, sha256, owner):
+        return None
+
+    # ref_count 가 0 이어도 GC 전이면 다시 참조할 수 있음
+    stmt = select(DocBlob).where(DocBlob.sha256 == sha256)
+    doc_blob = (await session_dc.exec(stmt)).first()
+
+    if doc_blob is None or not os.path.exists(blob_file(sha256)):
+        return None
+
+    return doc_blob
+
+
+# -------- Garbage Collection --------
+def recount_blobs(session_dc: Session):
+    # ref_count 를 cert_oath 기준으로 다시 계산 (중간에 실패한 요청 등으로 어긋난 경우)
+    stmt = text("""
+        UPDATE dc_management.doc_blob b
+        SET ref_count = c.refs,
+            released_at = CASE WHEN c.refs = 0 THEN COALESCE(b.released_at, now()) ELSE NULL END
+        FROM (
+            SELECT b2.sha256, COUNT(co.id) AS refs
+            FROM dc_management.doc_blob b2
+                LEFT JOIN dc_management.cert_oath co ON co.sha256 = b2.sha256
+            GROUP BY b2.sha256
+        ) c
+        WHERE b.sha256 = c.sha256 AND b.ref_count <> c.refs
+        """)
+
+    return session_dc.exec(stmt).rowcount
+
+def _trash_file(sha256: str) -> str:
+    return os.path.join(TRASH_PATH, sha256)
+
+def _restore_trash(sha256s: list[str]):
+    # commit 하지 못한 batch 의 파일을 제자리로
+    for sha256 in sha256s:
+        if os.path.exists(_trash_file(sha256)) and not os.path.exists(blob_file(sha256)):
+            os.replace(_trash_file(sha256), blob_file(sha256))
+
+def _empty_trash(sha256s: list[str], throttle):
+    for sha256 in sha256s:
+        if os.path.exists(_trash_file(sha256)):
+            os.remove(_trash_file(sha256))
+
+            if throttle is not None:
+                throttle.deleted()
+
+def _recover_trash():
+    # 이전 실행이 commit 과 삭제 사이에 멈춘 경우
+    # 행이 남아 있으면 (commit 전에 멈춤) 되돌리고, 없으면 삭제
+    if not os.path.isdir(TRASH_PATH):
+        return
+
+    names = os.listdir(TRASH_PATH)
+
+    if len(names) == 0:
+        return
+
+    with Session(dc_engine) as session_dc:
+        alive = set(session_dc.exec(select(DocBlob.sha256).where(DocBlob.sha256.in_(names))).all())
+
+    for name in names:
+        if name in alive:
+            _restore_trash([name])
+
+        if os.path.exists(_trash_file(name)):
+            os.remove(_trash_file(name))
+
+def _collect_batch(cutoff: datetime) -> list[tuple[str, int]]:
+    # 짧은 transaction 하나: 잠금 → 파일을 .trash 로 이동 → 행 삭제 → commit
+    # 파일 삭제와 대기는 commit 뒤에 하므로 acquire 가 오래 기다리지 않음
+    with Session(dc_engine) as session_dc:
+        stmt = select(DocBlob).where(DocBlob.ref_count <= 0, DocBlob.released_at < cutoff).limit(
+            BLOB_GC_BATCH_SIZE).with_for_update(skip_locked=True)
+        doc_blobs = session_dc.exec(stmt).all()
+
+        batch = [(doc_blob.sha256, doc_blob.size or 0) for doc_blob in doc_blobs]
+        moved = []
+
+        try:
+            for sha256, _ in batch:
+                if os.path.exists(blob_file(sha256)):
+                    os.replace(blob_file(sha256), _trash_file(sha256))
+                    moved.append(sha256)
+
+            for doc_blob in doc_blobs:
+                session_dc.delete(doc_blob)
+
+            session_dc.commit()
+        except BaseException:
+            session_dc.rollback()
+            _restore_trash(moved)
+            raise
+
+    return batch
+
+def collect_blobs(dry_run: bool = False, throttle = None) -> dict:
+    # throttle 은 utils.cleanup.Throttle (디렉터리 항목마다 tick, 삭제마다 deleted)
+    report = {"recounted": 0, "removed": [], "orphans": [], "freedBytes": 0}
+    cutoff = datetime.now() - timedelta(seconds=BLOB_GC_GRACE_SECONDS)
+
+    os.makedirs(TRASH_PATH, exist_ok=True)
+
+    if not dry_run:
+        _recover_trash()
+
+    # recount 는 따로 commit (이후 batch 가 잠금을 오래 잡지 않도록)
+    with Session(dc_engine) as session_dc:
+        report["recounted"] = recount_blobs(session_dc)
+
+        if dry_run:
+            stmt = select(DocBlob.sha256, DocBlob.size).where(DocBlob.ref_count <= 0, DocBlob.released_at < cutoff)
+
+            for sha256, size in session_dc.exec(stmt).all():
+                report["removed"].append(sha256)
+                report["freedBytes"] += size or 0
+
+            session_dc.rollback()
+        else:
+            session_dc.commit()
+
+    while not dry_run:
+        batch = _collect_batch(cutoff)
+
+        if len(batch) == 0:
+            break
+
+        for sha256, size in batch:
+            report["removed"].append(sha256)
+            report["freedBytes"] += size
+
+        _empty_trash([sha256 for sha256, _ in batch], throttle)
+
+        # 잠금이 없는 상태에서 batch 사이 대기
+        if throttle is not None:
+            throttle.pause_batch()
+
+        if len(batch) < BLOB_GC_BATCH_SIZE:
+            break
+
+    with Session(dc_engine) as session_dc:
+        known = set(session_dc.exec(select(DocBlob.sha256)).all())
+
+    # doc_blob 행이 없는 파일 (commit 전에 실패한 업로드)
+    # 방금 놓인 파일은 아직 commit 전일 수 있으므로 grace 시간이 지난 것만
+    if os.path.isdir(BLOBS_PATH):
+        for prefix in os.scandir(BLOBS_PATH):
+            if not prefix.is_dir():
+                continue
+
+            for entry in os.scandir(prefix.path):
+                if throttle is not None:
+                    throttle.tick()
+
+                if entry.name in known or not entry.is_file():
+                    continue
+
+                stat = entry.stat()
+
+                if time.time() - stat.st_mtime < BLOB_GC_GRACE_SECONDS:
+                    continue
+
+                report["orphans"].append(entry.name)
+                report["freedBytes"] += stat.st_size
+
+                if not dry_run:
+                    os.remove(entry.path)
+
+                    if throttle is not None:
+                        throttle.deleted()
+
+    logger.info("Blob GC%s: %s removed, %s orphans, %s bytes",
+                " (dry run)" if dry_run else "", len(report["removed"]), len(report["orphans"]), report["freedBytes"])
+
+    return report
+
+
+# -------- Reconciliation --------
+# DB 에 기록된 문서 정보와 디스크의 실제 파일을 비교
+#   missing       파일이 없음
+#   sizeMismatch  기록된 크기와 다름
+#   hashMismatch  내용이 sha256 과 다름 (verify 일 때만 확인)
+#   backfilled    size / mime / uploaded_at 이 비어 있어 채움 (fix)
+#   migrated      cohort 폴더의 이전 파일을 blob 으로 옮김 (fix)
+HASH_CHUNK_SIZE = 1024 * 1024
+
+def _hash_file(path: str) -> tuple[str, bytes]:
+    digest = hashlib.sha256()
+    head = b""
+
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(HASH_CHUNK_SIZE)
+
+            if not chunk:
+                break
+
+            digest.update(chunk)
+
+            if len(head) < 16:
+                head += chunk[:16]
+
+    return digest.hexdigest(), head
+
+def _migrate_legacy(session_dc: Session, co: CertOath, stat: os.stat_result):
+    sha256, head = _hash_file(DOCS_PATH + co.path)
+    mime = guess_mime(co.name or co.path, head)
+
+    stmt = text("""
+        INSERT INTO dc_management.doc_blob (sha256, size, mime, ref_count, created_at)
+        VALUES (:sha256, :size, :mime, 1, now())
+        ON CONFLICT (sha256) DO UPDATE
+            SET ref_count = dc_management.doc_blob.ref_count + 1, released_at = NULL
+        """)
+
+    session_dc.exec(stmt, params={"sha256": sha256, "size": stat.st_size, "mime": mime})
+
+    # 이전 파일은 cohort 소유자가 올린 것으로 봄
+    stmt = text("""
+        INSERT INTO dc_management.doc_blob_owner (sha256, owner)
+        SELECT :sha256, owner FROM dc_management.chrt_info WHERE id = :cohort_id
+        ON CONFLICT DO NOTHING
+        """)
+
+    session_dc.exec(stmt, params={"sha256": sha256, "cohort_id": co.document_for})
+
+    if os.path.exists(blob_file(sha256)):
+        os.remove(DOCS_PATH + co.path)
+    else:
+        os.makedirs(os.path.dirname(blob_file(sha256)), exist_ok=True)
+        os.replace(DOCS_PATH + co.path, blob_file(sha256))
+
+    co.sha256 = sha256
+    co.path = blob_path(sha256)
+    co.size = stat.st_size
+    co.mime = mime
+    co.uploaded_at = co.uploaded_at or datetime.fromtimestamp(stat.st_mtime)
+
+    # 행마다 commit 해서 옮긴 파일과 DB 가 어긋나지 않도록 함
+    session_dc.add(co)
+    session_dc.commit()
+
+def reconcile_documents(fix: bool = False, verify: bool = False) -> dict:
+    report = {"checked": 0, "missing": [], "sizeMismatch": [], "hashMismatch": [], "backfilled": [], "migrated": []}
+
+    # 이전 파일을 옮길 때마다 commit 하므로 나머지 행이 다시 조회되지 않도록 함
+    with Session(dc_engine, expire_on_commit=False) as session_dc:
+        cert_oaths = session_dc.exec(select(CertOath)).all()
+
+        for co in cert_oaths:
+            report["checked"] += 1
+
+            if co.path is None:
+                report["missing"].append(co.id)
+                continue
+
+            try:
+                stat = os.stat(DOCS_PATH + co.path)
+            except FileNotFoundError:
+                report["missing"].append(co.id)
+                continue
+
+            if co.size is not None and co.size != stat.st_size:
+                report["sizeMismatch"].append(co.id)
+                continue
+
+            if co.sha256 is None:
+                if fix:
+                    _migrate_legacy(session_dc, co, stat)
+                    report["migrated"].append(co.id)
+                continue
+
+            if verify and _hash_file(DOCS_PATH + co.path)[0] != co.sha256:
+                report["hashMismatch"].append(co.id)
+                continue
+
+            if co.size is None or co.mime is None or co.uploaded_at is None:
+                if fix:
+                    co.size = stat.st_size
+                    co.mime = co.mime or guess_mime(co.name or co.path)
+                    co.uploaded_at = co.uploaded_at or datetime.fromtimestamp(stat.st_mtime)
+                    session_dc.add(co)
+
+                report["backfilled"].append(co.id)
+
+        session_dc.commit()
+
+    logger.info("Document reconciliation%s: %s checked, %s missing, %s size mismatch, %s hash mismatch, %s backfilled, %s migrated",
+                "" if fix else " (report only)", report["checked"], len(report["missing"]), len(report["sizeMismatch"]),
+                len(report["hashMismatch"]), len(report["backfilled"]), len(report["migrated"]))
+
+    return report
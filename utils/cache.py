@@ -0,0 +1,94 @@
+from collections import OrderedDict
+import threading
+import time
+
+
+# -------- TTL / LRU Cache --------
+# 프로세스 단위 캐시. 크기를 넘으면 가장 오래 사용하지 않은 항목부터 제거
+class TTLCache():
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict = OrderedDict()     # key -> (만료 시각, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        now = time.monotonic()
+
+        with self._lock:
+            item = self._data.get(key)
+
+            if item is None or item[0] <= now:
+                if item is not None:
+                    del self._data[key]
+
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+
+            return item[1]
+
+    def set(self, key, value, ttl: float | None = None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hitRate": round(self.hits / total, 4) if total > 0 else None
+            }
+
+
+# -------- Metrics --------
+from utils.metrics import Counter, Gauge, register, register_collector
+
+CACHE_HITS = register(Counter("cache_hits_total", "Cache hits", ("cache",)))
+CACHE_MISSES = register(Counter("cache_misses_total", "Cache misses", ("cache",)))
+CACHE_EVICTIONS = register(Counter("cache_evictions_total", "Entries evicted by the size limit", ("cache",)))
+CACHE_SIZE = register(Gauge("cache_size", "Entries in the cache", ("cache",)))
+
+_caches: dict[str, TTLCache] = dict()
+
+def _collect_caches():
+    for name, cache in list(_caches.items()):
+        stats = cache.stats()
+
+        CACHE_HITS.child(name).set(stats["hits"])
+        CACHE_MISSES.child(name).set(stats["misses"])
+        CACHE_EVICTIONS.child(name).set(stats["evictions"])
+        CACHE_SIZE.set(name, value=stats["size"])
+
+register_collector(_collect_caches)
+
+def register_cache(name: str, cache: TTLCache) -> TTLCache:
+    # /metrics 에 cache 이름을 label 로 노출
+    _caches[name] = cache
+
+    return cache
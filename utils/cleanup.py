@@ -0,0 +1,275 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import itertools
+import os
+import threading
+import time
+
+from sqlmodel import Session, select
+
+
+# -------- Importing secret.py --------
+import secret
+
+GC_BATCH_SIZE = getattr(secret, "GC_BATCH_SIZE", 500)                  # 디렉터리 항목 수
+GC_BATCH_PAUSE = getattr(secret, "GC_BATCH_PAUSE", 0.05)               # seconds, batch 사이 대기
+GC_DELETES_PER_SEC = getattr(secret, "GC_DELETES_PER_SEC", 50)
+
+# 근무 시간 (평일, 시작 시 ~ 끝 시) 에는 대기를 늘리고 삭제 속도를 낮춤
+GC_WORK_HOURS = getattr(secret, "GC_WORK_HOURS", (9, 18))
+GC_WORK_HOURS_SLOWDOWN = getattr(secret, "GC_WORK_HOURS_SLOWDOWN", 10)
+
+# 0 이면 자동 실행하지 않음 (관리자 API 로만 실행)
+GC_INTERVAL_HOURS = getattr(secret, "GC_INTERVAL_HOURS", 0)
+
+# 업로드 도중 실패해 남은 임시 파일을 지우기까지의 시간
+GC_STAGING_MAX_AGE = getattr(secret, "GC_STAGING_MAX_AGE", 60 * 60 * 24)   # seconds
+
+# 보고서에 남길 경로 수
+GC_REPORT_LIMIT = getattr(secret, "GC_REPORT_LIMIT", 1000)
+
+# 메모리에 남겨둘 실행 기록 수 (끝난 실행부터 오래된 순으로 제거)
+GC_HISTORY = getattr(secret, "GC_HISTORY", 50)
+
+
+# -------- DBM Imports --------
+from utils.dbm import dc_engine, CertOath, ChrtInfo
+from utils.uploads import DOCS_PATH, STAGING_PATH
+from utils.blobs import collect_blobs
+
+
+# -------- Logging Setup --------
+from utils.logs import get_logger
+logger = get_logger(__name__)
+
+
+# -------- Throttle --------
+def in_work_hours(now: datetime | None = None) -> bool:
+    now = now or datetime.now()
+    start, end = GC_WORK_HOURS
+
+    return now.weekday() < 5 and start <= now.hour < end
+
+class Throttle():
+    def __init__(self, batch_size: int = GC_BATCH_SIZE, pause: float = GC_BATCH_PAUSE, deletes_per_sec: float = GC_DELETES_PER_SEC):
+        self.batch_size = batch_size
+        self.pause = pause
+        self.deletes_per_sec = deletes_per_sec
+        self._scanned = 0
+        self._last_delete = 0.0
+
+    def _slowdown(self) -> float:
+        return GC_WORK_HOURS_SLOWDOWN if in_work_hours() else 1
+
+    def tick(self):
+        # 디렉터리 항목 하나를 읽을 때마다 호출, batch 단위로 쉼
+        self._scanned += 1
+
+        if self._scanned % self.batch_size == 0:
+            self.pause_batch()
+
+    def pause_batch(self):
+        time.sleep(self.pause * self._slowdown())
+
+    def deleted(self):
+        # 삭제 사이 간격을 유지해서 초당 삭제 수를 제한
+        if self.deletes_per_sec <= 0:
+            return
+
+        interval = self._slowdown() / self.deletes_per_sec
+        wait = self._last_delete + interval - time.monotonic()
+
+        if wait > 0:
+            time.sleep(wait)
+
+        self._last_delete = time.monotonic()
+
+
+# -------- GC Runs --------
+def _format_date(date: datetime | None) -> str | None:
+    return None if date is None else date.strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+
+class GcRun():
+    def __init__(self, id: int, dry_run: bool):
+        self.id = id
+        self.dry_run = dry_run
+        self.status = "queued"      # queued, running, done, failed
+        self.scanned = 0
+        self.removed_files = 0
+        self.removed_dirs = 0
+        self.freed_bytes = 0
+        self.paths: list[str] = []  # 삭제한 (dry run 이면 삭제할) 경로, GC_REPORT_LIMIT 까지
+        self.blobs = None           # collect_blobs 결과
+        self.created_at = datetime.now()
+        self.started_at = None
+        self.finished_at = None
+        self.error = None
+
+    def record(self, path: str, size: int):
+        self.removed_files += 1
+        self.freed_bytes += size
+
+        if len(self.paths) < GC_REPORT_LIMIT:
+            self.paths.append(path)
+
+    def json(self):
+        return {
+            "id": self.id,
+            "dryRun": self.dry_run,
+            "status": self.status,
+            "scanned": self.scanned,
+            "removedFiles": self.removed_files,
+            "removedDirs": self.removed_dirs,
+            "freedBytes": self.freed_bytes + (self.blobs["freedBytes"] if self.blobs else 0),
+            "paths": self.paths,
+            "truncated": self.removed_files > len(self.paths),
+            "blobs": None if self.blobs is None else {
+                "recounted": self.blobs["recounted"],
+                "removed": len(self.blobs["removed"]),
+                "orphans": len(self.blobs["orphans"]),
+                "freedBytes": self.blobs["freedBytes"]
+            },
+            "createdAt": _format_date(self.created_at),
+            "startedAt": _format_date(self.started_at),
+            "finishedAt": _format_date(self.finished_at),
+            "error": self.error
+        }
+
+
+# -------- Scanning --------
+def _remove(run: GcRun, throttle: Throttle, entry: os.DirEntry, relative: str):
+    size = entry.stat().st_size
+    run.record(relative, size)
+
+    if not run.dry_run:
+        os.remove(entry.path)
+        throttle.deleted()
+
+def _sweep_cohort_dir(run: GcRun, throttle: Throttle, entry: os.DirEntry, cohort_ids: set[int], legacy_paths: set[str]):
+    # blob 이전에 cohort 폴더에 저장된 문서
+    #   cohort 가 없으면 폴더째, 있으면 cert_oath 에 없는 파일만 삭제
+    orphan_dir = int(entry.name) not in cohort_ids
+
+    with os.scandir(entry.path) as files:
+        for file in files:
+            throttle.tick()
+            run.scanned += 1
+
+            relative = f"/{entry.name}/{file.name}"
+
+            if file.is_file() and (orphan_dir or relative not in legacy_paths):
+                _remove(run, throttle, file, relative)
+
+    if orphan_dir and not run.dry_run:
+        try:
+            os.rmdir(entry.path)
+            run.removed_dirs += 1
+        except OSError as e:
+            # 하위 폴더 등 예상하지 못한 항목은 남겨둠
+            logger.warning("Folder %s is not removed: %s", entry.name, e)
+
+def _sweep_staging(run: GcRun, throttle: Throttle):
+    if not os.path.isdir(STAGING_PATH):
+        return
+
+    now = time.time()
+
+    with os.scandir(STAGING_PATH) as files:
+        for file in files:
+            throttle.tick()
+            run.scanned += 1
+
+            if file.is_file() and now - file.stat().st_mtime > GC_STAGING_MAX_AGE:
+                _remove(run, throttle, file, f"/{os.path.basename(STAGING_PATH)}/{file.name}")
+
+def _load_references() -> tuple[set[int], set[str]]:
+    # 필요한 열만 set 으로 (파일마다 O(1) 확인)
+    with Session(dc_engine) as session_dc:
+        cohort_ids = set(session_dc.exec(select(ChrtInfo.id)).all())
+        legacy_paths = set(session_dc.exec(select(CertOath.path).where(CertOath.sha256 == None)).all())
+
+    return cohort_ids, legacy_paths
+
+def _run_gc(run: GcRun):
+    run.status = "running"
+    run.started_at = datetime.now()
+
+    throttle = Throttle()
+
+    try:
+        if os.path.isdir(DOCS_PATH):
+            cohort_ids, legacy_paths = _load_references()
+
+            with os.scandir(DOCS_PATH) as entries:
+                for entry in entries:
+                    throttle.tick()
+                    run.scanned += 1
+
+                    if entry.name.isdigit() and entry.is_dir():
+                        _sweep_cohort_dir(run, throttle, entry, cohort_ids, legacy_paths)
+
+            _sweep_staging(run, throttle)
+
+            run.blobs = collect_blobs(run.dry_run, throttle)
+
+        run.status = "done"
+    except Exception as e:
+        logger.error("Document GC %s failed: %s", run.id, e)
+        run.status = "failed"
+        run.error = str(e)
+
+    run.finished_at = datetime.now()
+
+    logger.info("Document GC %s%s finished with status %s: %s files, %s bytes",
+                run.id, " (dry run)" if run.dry_run else "", run.status, run.removed_files, run.json()["freedBytes"])
+
+
+# -------- Queue --------
+# 실행 기록은 process 메모리에만 있음 (utils.jobs.claim_worker 로 process 하나만 실행)
+_runs: dict[int, GcRun] = {}
+_runs_lock = threading.Lock()
+_run_ids = itertools.count(1)
+
+# 한 번에 하나만 실행
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="document-gc")
+
+def _trim_runs():
+    # _runs_lock 안에서 호출
+    finished = [run_id for run_id, run in _runs.items() if run.status in ("done", "failed")]
+
+    for run_id in finished[:max(0, len(_runs) - GC_HISTORY)]:
+        del _runs[run_id]
+
+def enqueue_gc(dry_run: bool = True) -> GcRun:
+    with _runs_lock:
+        # 대기 / 실행 중인 같은 종류의 작업이 있으면 그대로 반환
+        for run in _runs.values():
+            if run.dry_run == dry_run and run.status in ("queued", "running"):
+                return run
+
+        run = GcRun(next(_run_ids), dry_run)
+        _runs[run.id] = run
+        _trim_runs()
+
+    logger.info("Document GC %s queued%s", run.id, " (dry run)" if dry_run else "")
+
+    _executor.submit(_run_gc, run)
+
+    return run
+
+def get_gc_run(run_id: int) -> GcRun | None:
+    return _runs.get(run_id)
+
+def list_gc_runs() -> list[GcRun]:
+    return list(_runs.values())
+
+def start_gc_scheduler():
+    if GC_INTERVAL_HOURS <= 0:
+        return
+
+    def run():
+        while True:
+            time.sleep(GC_INTERVAL_HOURS * 60 * 60)
+            enqueue_gc(dry_run=False)
+
+    threading.Thread(target=run, name="document-gc-scheduler", daemon=True).start()
@@ -1,7 +1,12 @@
-from typing import List, Optional
+from typing import Any, Callable, List, Optional
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import threading
 
 from sqlmodel import SQLModel, Field, create_engine, Session, Column, ARRAY, String
-from sqlalchemy import text, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import text, select, BigInteger
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
 
 from datetime import datetime
 
@@ -14,6 +19,21 @@ from secret import (
     fdw_server, app_user, app_pw,
     is_db_extension_installed
     )
+import secret
+
+COPY_CONCURRENCY = getattr(secret, "COPY_CONCURRENCY", 4)
+SUBJECT_CHUNK_SIZE = getattr(secret, "SUBJECT_CHUNK_SIZE", 50000)
+
+# API 요청용 async pool 크기 (ATLAS 와 DataCenter 를 따로 설정)
+ATLAS_POOL_SIZE = getattr(secret, "ATLAS_POOL_SIZE", 10)
+ATLAS_MAX_OVERFLOW = getattr(secret, "ATLAS_MAX_OVERFLOW", 5)
+DC_POOL_SIZE = getattr(secret, "DC_POOL_SIZE", 10)
+DC_MAX_OVERFLOW = getattr(secret, "DC_MAX_OVERFLOW", 5)
+
+
+# -------- Importing pools.py --------
+from utils.pools import InstrumentedQueuePool, InstrumentedAsyncPool, pool_options, instrument_engine
+from utils.tracing import instrument_queries
 
 
 # -------- Importing structure.py --------
@@ -21,23 +41,32 @@ from utils.structure import has_person_id, is_on_atlas, tables_pkey
 
 
 # -------- Logging Setup --------
-import logging
-logger = logging.getLogger("uvicorn.error")
-logger.setLevel(logging.DEBUG)
+from utils.logs import get_logger
+logger = get_logger(__name__)
 
 
 # -------- DBM Setup --------
+# pool 설정은 POOL_SETTINGS 로 engine 마다 덮어쓸 수 있음
 atlas_engine = create_engine(postgres_url,
-                             pool_pre_ping=True,
-                             pool_recycle=900,     # 15 분마다 새로고침
-                             pool_size=10,         # 동시 연결 수
-                             max_overflow=5)
+                             poolclass=InstrumentedQueuePool,
+                             **pool_options("atlas",
+                                            pool_pre_ping=True,
+                                            pool_recycle=900,     # 15 분마다 새로고침
+                                            pool_size=10,         # 동시 연결 수
+                                            max_overflow=5))
 
 dc_engine = create_engine(datacenter_url,
-                             pool_pre_ping=True,
-                             pool_recycle=900,     # 15 분마다 새로고침
-                             pool_size=10,         # 동시 연결 수
-                             max_overflow=5)
+                             poolclass=InstrumentedQueuePool,
+                             **pool_options("dc",
+                                            pool_pre_ping=True,
+                                            pool_recycle=900,     # 15 분마다 새로고침
+                                            pool_size=10,         # 동시 연결 수
+                                            max_overflow=5))
+
+instrument_engine("atlas", atlas_engine)
+instrument_engine("dc", dc_engine)
+instrument_queries("atlas", atlas_engine)
+instrument_queries("dc", dc_engine)
 
 def get_atlas_session():
     with Session(atlas_engine) as session:
@@ -47,6 +76,41 @@ def get_dc_session():
     with Session(dc_engine) as session:
         yield session
 
+# API 라우트는 이벤트 루프를 막지 않도록 asyncpg 를 사용
+# 위의 동기 engine 은 복사 작업, 통계 계산 등 백그라운드 스레드에서 사용
+def async_url(url: str) -> str:
+    return make_url(url).set(drivername="postgresql+asyncpg").render_as_string(hide_password=False)
+
+atlas_async_engine = create_async_engine(async_url(postgres_url),
+                             poolclass=InstrumentedAsyncPool,
+                             **pool_options("atlas_async",
+                                            pool_pre_ping=True,
+                                            pool_recycle=900,     # 15 분마다 새로고침
+                                            pool_size=ATLAS_POOL_SIZE,
+                                            max_overflow=ATLAS_MAX_OVERFLOW))
+
+dc_async_engine = create_async_engine(async_url(datacenter_url),
+                             poolclass=InstrumentedAsyncPool,
+                             **pool_options("dc_async",
+                                            pool_pre_ping=True,
+                                            pool_recycle=900,     # 15 분마다 새로고침
+                                            pool_size=DC_POOL_SIZE,
+                                            max_overflow=DC_MAX_OVERFLOW))
+
+instrument_engine("atlas_async", atlas_async_engine)
+instrument_engine("dc_async", dc_async_engine)
+instrument_queries("atlas_async", atlas_async_engine)
+instrument_queries("dc_async", dc_async_engine)
+
+# commit 이후 속성 접근이 lazy load (동기 IO) 를 일으키지 않도록 expire 하지 않음
+async def get_atlas_async_session():
+    async with AsyncSession(atlas_async_engine, expire_on_commit=False) as session:
+        yield session
+
+async def get_dc_async_session():
+    async with AsyncSession(dc_async_engine, expire_on_commit=False) as session:
+        yield session
+
 
 # -------- CDM Results Models --------
 class Cohort(SQLModel, table=True):
@@ -118,7 +182,7 @@ class ChrtCert(SQLModel, table=True):
     __table_args__ = {"schema": "dc_management"}
     id: int = Field(primary_key=True, default=None, foreign_key="dc_management.chrt_info.id")
     applied_at: datetime = Field(default=None, nullable=True)
-    cur_status: int = Field(default=None, nullable=True)
+    cur_status: str | None = Field(default=None, nullable=True)     # before_apply, applied, approved, rejected
     resolved_at: datetime = Field(default=None, nullable=True)
     review: str = Field(default=None, nullable=True)
 
@@ -145,6 +209,26 @@ class CertOath(SQLModel, table=True):
     type: str = Field(default=None, nullable=True)
     category: str = Field(default=None, nullable=True)
     document_for: int = Field(default=None, nullable=False, foreign_key="dc_management.chrt_info.id")
+    sha256: str | None = Field(default=None, nullable=True)       # doc_blob 참조 (없으면 cohort 폴더의 이전 파일)
+    size: int | None = Field(default=None, nullable=True)          # bytes, 업로드 시 기록
+    mime: str | None = Field(default=None, nullable=True)
+    uploaded_at: datetime | None = Field(default=None, nullable=True)
+
+class DocBlob(SQLModel, table=True):
+    __tablename__ = "doc_blob"
+    __table_args__ = {"schema": "dc_management"}
+    sha256: str = Field(primary_key=True, default=None)
+    size: int = Field(default=None, nullable=False)
+    ref_count: int = Field(default=0, nullable=False)              # 참조하는 cert_oath 수
+    mime: str | None = Field(default=None, nullable=True)
+    created_at: datetime = Field(default=None, nullable=True)
+    released_at: datetime = Field(default=None, nullable=True)     # ref_count 가 0 이 된 시점
+
+class DocBlobOwner(SQLModel, table=True):
+    __tablename__ = "doc_blob_owner"
+    __table_args__ = {"schema": "dc_management"}
+    sha256: str = Field(primary_key=True, default=None, foreign_key="dc_management.doc_blob.sha256")
+    owner: int = Field(primary_key=True, default=None)              # 이 내용을 올린 사용자 (blob 이 지워질 때까지 유지)
 
 class SchmInfo(SQLModel, table=True):
     __tablename__ = "schm_info"
@@ -164,6 +248,95 @@ class SchmConnectInfo(SQLModel, table=True):
     username: str = Field(default=None, nullable=False)
     password: str | None = Field(default=None, nullable=True)
 
+class ChrtStat(SQLModel, table=True):
+    __tablename__ = "chrt_stat"
+    __table_args__ = {"schema": "dc_management"}
+    ext_id: int = Field(primary_key=True, default=None)             # ATLAS cohort definition id
+    modified_date: datetime = Field(default=None, nullable=True)    # 통계를 계산한 시점의 ATLAS 수정일
+    subject_count: int = Field(default=None, nullable=True)
+    record_counts: List[int] | None = Field(sa_column=Column(ARRAY(BigInteger, dimensions=1), nullable=True))  # TABLE_NAME 순서
+    computed_at: datetime = Field(default=None, nullable=True)
+
+class SchmSync(SQLModel, table=True):
+    __tablename__ = "schm_sync"
+    __table_args__ = {"schema": "dc_management"}
+    id: int = Field(primary_key=True, default=None, foreign_key="dc_management.schm_info.id")
+    ext_modified_at: datetime = Field(default=None, nullable=True)     # 마지막으로 반영된 ATLAS 수정일
+    subject_count: int = Field(default=None, nullable=True)
+    added_count: int = Field(default=None, nullable=True)
+    removed_count: int = Field(default=None, nullable=True)
+    mode: str = Field(default=None, nullable=True)                    # full, incremental
+    synced_at: datetime = Field(default=None, nullable=True)
+
+
+
+# -------- DataCenter Bootstrap --------
+# 애플리케이션이 직접 관리하는 테이블은 서버 시작 시 생성
+def bootstrap_dc():
+    ddl = """
+    CREATE SCHEMA IF NOT EXISTS dc_stage;
+
+    CREATE TABLE IF NOT EXISTS dc_management.schm_sync (
+        id INT PRIMARY KEY REFERENCES dc_management.schm_info (id) ON DELETE CASCADE,
+        ext_modified_at TIMESTAMP,
+        subject_count INT,
+        added_count INT,
+        removed_count INT,
+        mode VARCHAR(20),
+        synced_at TIMESTAMP
+    );
+
+    CREATE INDEX IF NOT EXISTS chrt_info_owner_created_idx ON dc_management.chrt_info (owner, created_at, id);
+    CREATE INDEX IF NOT EXISTS chrt_info_created_idx ON dc_management.chrt_info (created_at, id);
+    CREATE INDEX IF NOT EXISTS chrt_info_modified_idx ON dc_management.chrt_info (modified_at, id);
+    CREATE INDEX IF NOT EXISTS chrt_cert_status_idx ON dc_management.chrt_cert (cur_status, id);
+    CREATE INDEX IF NOT EXISTS chrt_cert_applied_idx ON dc_management.chrt_cert ((COALESCE(applied_at, '1970-01-01'::TIMESTAMP)), id);
+    CREATE INDEX IF NOT EXISTS chrt_cert_resolved_idx ON dc_management.chrt_cert ((COALESCE(resolved_at, '1970-01-01'::TIMESTAMP)), id);
+    CREATE INDEX IF NOT EXISTS cert_oath_document_for_idx ON dc_management.cert_oath (document_for);
+    CREATE INDEX IF NOT EXISTS schm_info_schema_from_idx ON dc_management.schm_info (schema_from);
+
+    CREATE TABLE IF NOT EXISTS dc_management.doc_blob (
+        sha256 CHAR(64) PRIMARY KEY,
+        size BIGINT NOT NULL,
+        ref_count INT NOT NULL DEFAULT 0,
+        created_at TIMESTAMP,
+        released_at TIMESTAMP
+    );
+
+    ALTER TABLE dc_management.cert_oath ADD COLUMN IF NOT EXISTS sha256 CHAR(64);
+    CREATE INDEX IF NOT EXISTS cert_oath_sha256_idx ON dc_management.cert_oath (sha256);
+
+    ALTER TABLE dc_management.cert_oath ADD COLUMN IF NOT EXISTS size BIGINT;
+    ALTER TABLE dc_management.cert_oath ADD COLUMN IF NOT EXISTS mime VARCHAR(100);
+    ALTER TABLE dc_management.cert_oath ADD COLUMN IF NOT EXISTS uploaded_at TIMESTAMP;
+    ALTER TABLE dc_management.doc_blob ADD COLUMN IF NOT EXISTS mime VARCHAR(100);
+    CREATE INDEX IF NOT EXISTS doc_blob_released_idx ON dc_management.doc_blob (released_at) WHERE ref_count = 0;
+
+    CREATE TABLE IF NOT EXISTS dc_management.doc_blob_owner (
+        sha256 CHAR(64) REFERENCES dc_management.doc_blob (sha256) ON DELETE CASCADE,
+        owner INT NOT NULL,
+        PRIMARY KEY (sha256, owner)
+    );
+
+    INSERT INTO dc_management.doc_blob_owner (sha256, owner)
+    SELECT DISTINCT co.sha256, ci.owner
+    FROM dc_management.cert_oath co
+        JOIN dc_management.chrt_info ci ON ci.id = co.document_for
+        JOIN dc_management.doc_blob b ON b.sha256 = co.sha256
+    ON CONFLICT DO NOTHING;
+
+    CREATE TABLE IF NOT EXISTS dc_management.chrt_stat (
+        ext_id INT PRIMARY KEY,
+        modified_date TIMESTAMP,
+        subject_count INT,
+        record_counts BIGINT[],
+        computed_at TIMESTAMP
+    );
+    """
+
+    with Session(dc_engine) as session_dc:
+        session_dc.exec(text(ddl))
+        session_dc.commit()
 
 
 # -------- Custom Schema --------
@@ -176,123 +349,476 @@ def make_school_model(schema: str):
 
     return School
 
-def copy_tables_by_cohort_id(
+# -------- Copy Steps --------
+# 테이블 단위로 나누어 실패한 테이블만 다시 복사할 수 있도록 함
+def load_copy_plan(
         session_atlas: Session,
         session_dc: Session,
-        schema_name: str,
-        cohort_id: int):
-    
+        cohort_id: int) -> tuple[list[str], list[int], CohortDefinition]:
+
     stmt = select(ChrtInfo).where(ChrtInfo.id == cohort_id)
     chrt_info = session_dc.exec(stmt).scalars().first()
 
     stmt = select(CohortDefinition).where(CohortDefinition.id == chrt_info.ext_id)
     chrt_def = session_atlas.exec(stmt).scalars().first()
 
-    logger.debug(f"Cohort def is {type(chrt_def)}")
+    logger.debug("Cohort def is %s", type(chrt_def))
 
     stmt = select(Cohort).where(Cohort.cohort_definition_id == chrt_def.id)
     cohorts = session_atlas.exec(stmt).scalars().all()
 
     subject_ids = [c.subject_id for c in cohorts]
-    subject_id_str = "(" + ", ".join(map(str, subject_ids)) + ")"
 
-    tables = chrt_info.tables
+    tables = [table.lower() for table in chrt_info.tables if is_on_atlas(table)]
 
-    table_str = "(" + ", ".join(map(str, tables)) + ")"
-    table_str = table_str.lower()
+    logger.debug("Get tables %s", tables)
 
-    logger.debug(f"Get tables {table_str}")
+    return tables, subject_ids, chrt_def
 
+# -------- FDW Bootstrap --------
+# 서버, user mapping, foreign schema 는 한 번만 만들고 계속 유지
+# 다른 승인 작업이 사용 중인 서버를 DROP 하지 않도록 DDL 은 advisory lock 으로 직렬화
+FDW_SCHEMA = getattr(secret, "FDW_SCHEMA", "atlas_fdw")
+FDW_LOCK_KEY = 720_001
 
-    # DB A
-    base_db = DATACENTER_DB
-    base_schema = schema_name
+_fdw_lock = threading.Lock()
+_fdw_ready = False
+_fdw_signatures: dict[str, str] = {}
 
-    # DB B
-    target_db = ATLAS_DB
-    target_schema = ATLAS_TARGET_SCHEMA
+def _lock_fdw_ddl(session_dc: Session):
+    # transaction 이 끝나면 자동으로 해제됨
+    session_dc.exec(text(f"SELECT pg_advisory_xact_lock({FDW_LOCK_KEY})"))
 
-    # DB B
-    ddl_b = f"""
-    GRANT CONNECT ON DATABASE {target_db} TO {app_user};
-    GRANT USAGE ON SCHEMA {target_schema} TO {app_user};
-    GRANT SELECT ON ALL TABLES IN SCHEMA {target_schema} TO {app_user};
-    ALTER DEFAULT PRIVILEGES IN SCHEMA {target_schema}
-            GRANT SELECT ON TABLES TO {app_user};
-    """
+def _column_signatures(session: Session, schema: str, tables: list[str]) -> dict[str, str]:
+    stmt = text("""
+        SELECT c.relname,
+            string_agg(a.attname || ':' || format_type(a.atttypid, a.atttypmod), ',' ORDER BY a.attnum)
+        FROM pg_attribute a
+            JOIN pg_class c ON c.oid = a.attrelid
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = :schema AND c.relname = ANY(:tables) AND a.attnum > 0 AND NOT a.attisdropped
+        GROUP BY c.relname
+        """)
 
-    # DB A
-    # Only once
+    rows = session.exec(stmt, params={"schema": schema, "tables": tables}).all()
 
-    ddl_install_extension = "CREATE EXTENSION IF NOT EXISTS postgres_fdw;"
+    return {row[0]: row[1] for row in rows}
 
-    ddl_a1 = f"""
-    DO $$BEGIN
-        IF NOT EXISTS (SELECT FROM pg_roles WHERE rolname = '{app_user}') THEN
-            CREATE ROLE {app_user} LOGIN PASSWORD '{app_pw}';
-        END IF;
-    END$$;
+def ensure_fdw(
+        session_atlas: Session,
+        session_dc: Session):
 
-    GRANT CONNECT ON DATABASE {base_db} TO {app_user};
-
-    DROP SERVER IF EXISTS {fdw_server} CASCADE;
-    CREATE SERVER {fdw_server}
-        FOREIGN DATA WRAPPER postgres_fdw
-        OPTIONs (host '127.0.0.1', port '5432', dbname '{target_db}');
-    
-    CREATE USER MAPPING IF NOT EXISTS
-        FOR {db_host}
-        SERVER {fdw_server}
-        OPTIONS (user '{app_user}', password '{app_pw}');
-    """
+    global _fdw_ready
 
-    ddl_a2 = f"""
-    CREATE SCHEMA IF NOT EXISTS temp_fdw;
+    if _fdw_ready:
+        return
 
-    IMPORT FOREIGN SCHEMA {target_schema}
-        LIMIT TO {table_str}
-        FROM SERVER {fdw_server}
-        INTO temp_fdw;
-    """
+    with _fdw_lock:
+        if _fdw_ready:
+            return
+
+        # DB A
+        base_db = DATACENTER_DB
+
+        # DB B
+        target_db = ATLAS_DB
+        target_schema = ATLAS_TARGET_SCHEMA
 
-    ddl_tables = [f"""
-    CREATE TABLE IF NOT EXISTS {base_schema}.{table.lower()} AS
-    SELECT * FROM temp_fdw.{table.lower()} WHERE temp_fdw.{table.lower()}.person_id IN {subject_id_str};
+        # DB B
+        ddl_b = f"""
+        GRANT CONNECT ON DATABASE {target_db} TO {app_user};
+        GRANT USAGE ON SCHEMA {target_schema} TO {app_user};
+        GRANT SELECT ON ALL TABLES IN SCHEMA {target_schema} TO {app_user};
+        ALTER DEFAULT PRIVILEGES IN SCHEMA {target_schema}
+                GRANT SELECT ON TABLES TO {app_user};
+        """
 
-    ALTER TABLE {base_schema}.{table.lower()} ADD COLUMN IF NOT EXISTS { tables_pkey[table.upper()] if table.upper() in tables_pkey.keys() else "id" } INT GENERATED ALWAYS AS IDENTITY;
-    ALTER TABLE {base_schema}.{table.lower()} ADD PRIMARY KEY ({ tables_pkey[table.upper()] if table.upper() in tables_pkey.keys() else "id" });
-    
-    GRANT SELECT, INSERT, UPDATE, DELETE
-        ON {base_schema}.{table.lower()} TO {app_user};
+        # DB A
+        ddl_install_extension = "CREATE EXTENSION IF NOT EXISTS postgres_fdw;"
 
-    """ if has_person_id(table) else f"""
+        ddl_a1 = f"""
+        DO $$BEGIN
+            IF NOT EXISTS (SELECT FROM pg_roles WHERE rolname = '{app_user}') THEN
+                CREATE ROLE {app_user} LOGIN PASSWORD '{app_pw}';
+            END IF;
+        END$$;
 
-    CREATE TABLE IF NOT EXISTS {base_schema}.{table.lower()} AS
-    SELECT * FROM temp_fdw.{table.lower()};
-    GRANT SELECT, INSERT, UPDATE, DELETE
-        ON {base_schema}.{table.lower()} TO {app_user};
+        GRANT CONNECT ON DATABASE {base_db} TO {app_user};
 
-    """ for table in tables if is_on_atlas(table)]
+        CREATE SERVER IF NOT EXISTS {fdw_server}
+            FOREIGN DATA WRAPPER postgres_fdw
+            OPTIONs (host '127.0.0.1', port '5432', dbname '{target_db}');
+        
+        CREATE USER MAPPING IF NOT EXISTS
+            FOR {db_host}
+            SERVER {fdw_server}
+            OPTIONS (user '{app_user}', password '{app_pw}');
+
+        CREATE SCHEMA IF NOT EXISTS {FDW_SCHEMA};
+        """
 
-    ddl_drop = "DROP SCHEMA temp_fdw CASCADE;"
+        _lock_fdw_ddl(session_dc)
 
-    # logger.debug(f"DDL TABLES length is {ddl_tables}")
+        if not is_db_extension_installed:
+            session_dc.exec(text(ddl_install_extension))
 
-    if not is_db_extension_installed:
-        session_dc.exec(text(ddl_install_extension))
+        session_dc.exec(text(ddl_a1))
         session_dc.commit()
-        
-    session_dc.exec(text(ddl_a1))
+
+        session_atlas.exec(text(ddl_b))
+        session_atlas.commit()
+
+        _fdw_ready = True
+
+        logger.info("FDW server %s and schema %s are ready", fdw_server, FDW_SCHEMA)
+
+def prepare_fdw(
+        session_atlas: Session,
+        session_dc: Session,
+        tables: list[str]):
+
+    ensure_fdw(session_atlas, session_dc)
+
+    tables = [table.lower() for table in tables]
+
+    # 원격 테이블 구조가 바뀌었거나 아직 import 되지 않은 테이블만 다시 import
+    remote = _column_signatures(session_atlas, ATLAS_TARGET_SCHEMA, tables)
+    stale = [table for table in tables if table in remote and _fdw_signatures.get(table) != remote[table]]
+
+    if len(stale) == 0:
+        return
+
+    _lock_fdw_ddl(session_dc)
+
+    local = _column_signatures(session_dc, FDW_SCHEMA, stale)
+    changed = [table for table in stale if table in local and local[table] != remote[table]]
+    missing = [table for table in stale if table not in local]
+
+    for table in changed:
+        session_dc.exec(text(f"DROP FOREIGN TABLE IF EXISTS {FDW_SCHEMA}.{table};"))
+
+    if len(changed + missing) > 0:
+        table_str = "(" + ", ".join(changed + missing) + ")"
+
+        ddl_import = f"""
+        IMPORT FOREIGN SCHEMA {ATLAS_TARGET_SCHEMA}
+            LIMIT TO {table_str}
+            FROM SERVER {fdw_server}
+            INTO {FDW_SCHEMA};
+        """
+
+        session_dc.exec(text(ddl_import))
+
+        logger.debug("Foreign tables imported: %s", table_str)
+
+    session_dc.commit()
+
+    for table in stale:
+        _fdw_signatures[table] = remote[table]
+
+def bootstrap_fdw():
+    with Session(atlas_engine) as session_atlas, Session(dc_engine) as session_dc:
+        ensure_fdw(session_atlas, session_dc)
+
+# -------- Subject Staging --------
+# person_id IN (1, 2, ...) 리터럴 대신 대상자를 테이블에 한 번만 적재하고
+# chunk 단위 배열 파라미터로 넘겨서 postgres_fdw 가 조건을 원격으로 push down 하도록 함
+class SubjectStage():
+    def __init__(self, name: str, count: int, chunks: int):
+        self.name = name
+        self.count = count
+        self.chunks = chunks
+
+    def chunk_filter(self, column: str, chunk_no: int) -> str:
+        return f"{column} = ANY(ARRAY(SELECT subject_id FROM dc_stage.{self.name} WHERE chunk_no = {chunk_no}))"
+
+def stage_subjects(
+        session_dc: Session,
+        name: str,
+        subject_ids: list[int],
+        chunk_size: int = SUBJECT_CHUNK_SIZE) -> SubjectStage:
+
+    subject_ids = sorted(set(subject_ids))
+
+    ddl = f"""
+    CREATE SCHEMA IF NOT EXISTS dc_stage;
+
+    DROP TABLE IF EXISTS dc_stage.{name};
+    CREATE UNLOGGED TABLE dc_stage.{name} (
+        subject_id BIGINT PRIMARY KEY,
+        chunk_no INT NOT NULL
+    );
+    """
+
+    session_dc.exec(text(ddl))
+
+    chunks = 0
+
+    for i in range(0, len(subject_ids), chunk_size):
+        session_dc.exec(
+            text(f"INSERT INTO dc_stage.{name} (subject_id, chunk_no) SELECT unnest(CAST(:ids AS BIGINT[])), :chunk_no"),
+            params={"ids": subject_ids[i:i + chunk_size], "chunk_no": chunks},
+        )
+        chunks += 1
+
+    session_dc.exec(text(f"CREATE INDEX ON dc_stage.{name} (chunk_no); ANALYZE dc_stage.{name};"))
     session_dc.commit()
-    session_atlas.exec(text(ddl_b))
-    session_atlas.commit()
-    session_dc.exec(text(ddl_a2))
+
+    logger.debug("Staged %s subjects into dc_stage.%s (%s chunks)", len(subject_ids), name, chunks)
+
+    return SubjectStage(name, len(subject_ids), chunks)
+
+def drop_stage(session_dc: Session, stage: SubjectStage):
+    session_dc.exec(text(f"DROP TABLE IF EXISTS dc_stage.{stage.name};"))
     session_dc.commit()
 
-    for ddl_table in ddl_tables:
-        session_dc.exec(text(ddl_table))
+def table_exists(session_dc: Session, schema_name: str, table: str) -> bool:
+    return session_dc.exec(text(f"SELECT to_regclass('{schema_name}.{table}')")).scalar() is not None
+
+def drop_table(session_dc: Session, schema_name: str, table: str):
+    session_dc.exec(text(f"DROP TABLE IF EXISTS {schema_name}.{table.lower()};"))
+    session_dc.commit()
+
+def table_finish_ddl(schema_name: str, table: str) -> str:
+    table = table.lower()
+    pkey = tables_pkey[table.upper()] if table.upper() in tables_pkey.keys() else "id"
+
+    if has_person_id(table):
+        return f"""
+        ALTER TABLE {schema_name}.{table} ADD COLUMN IF NOT EXISTS {pkey} INT GENERATED ALWAYS AS IDENTITY;
+        ALTER TABLE {schema_name}.{table} ADD PRIMARY KEY ({pkey});
+        
+        GRANT SELECT, INSERT, UPDATE, DELETE
+            ON {schema_name}.{table} TO {app_user};
+        """
+
+    return f"""
+        GRANT SELECT, INSERT, UPDATE, DELETE
+            ON {schema_name}.{table} TO {app_user};
+        """
+
+def copy_table(
+        session_dc: Session,
+        schema_name: str,
+        table: str,
+        stage: SubjectStage) -> int:
+
+    table = table.lower()
+
+    # CREATE TABLE IF NOT EXISTS 와 같이 이미 복사된 테이블은 건너뜀
+    if table_exists(session_dc, schema_name, table):
+        logger.debug("%s.%s already exists, skipped", schema_name, table)
+        return 0
+
+    if has_person_id(table):
+        ddl_create = f"""
+        CREATE TABLE {schema_name}.{table} AS
+        SELECT * FROM {FDW_SCHEMA}.{table} WITH NO DATA;
+        """
+
+        ddl_chunks = [f"""
+        INSERT INTO {schema_name}.{table}
+        SELECT * FROM {FDW_SCHEMA}.{table} WHERE {stage.chunk_filter("person_id", chunk_no)};
+        """ for chunk_no in range(stage.chunks)]
+    else:
+        ddl_create = f"""
+        CREATE TABLE {schema_name}.{table} AS
+        SELECT * FROM {FDW_SCHEMA}.{table};
+        """
+
+        ddl_chunks = []
+
+    ddl_after = table_finish_ddl(schema_name, table)
+
+    # 테이블 하나가 실패하면 해당 테이블만 롤백
+    try:
+        result = session_dc.exec(text(ddl_create))
+        rows = max(result.rowcount, 0)
+
+        for ddl_chunk in ddl_chunks:
+            result = session_dc.exec(text(ddl_chunk))
+            rows += max(result.rowcount, 0)
+
+        session_dc.exec(text(ddl_after))
+        session_dc.commit()
+    except Exception:
+        session_dc.rollback()
+        raise
+
+    return rows
+
+def copy_table_isolated(
+        schema_name: str,
+        table: str,
+        stage: SubjectStage) -> int:
+
+    # 테이블마다 pool 에서 별도의 connection 을 사용
+    with Session(dc_engine) as session_dc:
+        return copy_table(session_dc, schema_name, table, stage)
+
+def run_tables_parallel(
+        tables: list[str],
+        copy_fn: Callable[[str], Any],
+        concurrency: int = COPY_CONCURRENCY,
+        on_start: Callable[[str], None] | None = None,
+        on_done: Callable[[str, Any, Exception | None], None] | None = None,
+        engines: list | None = None) -> dict[str, Any]:
+
+    results = dict()
+
+    if len(tables) == 0:
+        return results
+
+    if engines is None:
+        engines = [dc_engine]
+
+    # pool 크기를 넘겨서 checkout 대기가 생기지 않도록 제한
+    workers = max(1, min(concurrency, len(tables), *[engine.pool.size() for engine in engines]))
+
+    def run(table: str):
+        if on_start is not None:
+            on_start(table)
+
+        return copy_fn(table)
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="copy") as executor:
+        futures = {executor.submit(run, table): table for table in tables}
+
+        for future in as_completed(futures):
+            table = futures[future]
+
+            try:
+                results[table] = future.result()
+                error = None
+            except Exception as e:
+                results[table] = e
+                error = e
+                logger.error("Copying %s failed: %s", table, e)
+
+            if on_done is not None:
+                on_done(table, results[table] if error is None else None, error)
+
+    return results
+
+def copy_tables_parallel(
+        schema_name: str,
+        tables: list[str],
+        stage: SubjectStage,
+        concurrency: int = COPY_CONCURRENCY,
+        on_start: Callable[[str], None] | None = None,
+        on_done: Callable[[str, int | None, Exception | None], None] | None = None) -> dict[str, int | Exception]:
+
+    return run_tables_parallel(
+        tables,
+        lambda table: copy_table_isolated(schema_name, table, stage),
+        concurrency, on_start, on_done)
+
+# -------- Incremental Refresh --------
+# 승인된 스키마의 대상자 목록(dc_stage.{schema_name})과 새 대상자 목록을 비교해서
+# 빠진 대상자의 행은 지우고 새로 들어온 대상자의 행만 복사
+def load_staged_subjects(session_dc: Session, name: str) -> set[int] | None:
+    if not table_exists(session_dc, "dc_stage", name):
+        return None
+
+    return set(session_dc.exec(text(f"SELECT subject_id FROM dc_stage.{name}")).scalars().all())
+
+def _foreign_columns(session_dc: Session, table: str) -> list[str]:
+    stmt = text("""
+        SELECT column_name FROM information_schema.columns
+        WHERE table_schema = :schema AND table_name = :table
+        ORDER BY ordinal_position
+        """)
+
+    return list(session_dc.exec(stmt, params={"schema": FDW_SCHEMA, "table": table}).scalars().all())
+
+def refresh_table(
+        session_dc: Session,
+        schema_name: str,
+        table: str,
+        added: SubjectStage,
+        removed: SubjectStage) -> int:
+
+    table = table.lower()
+
+    if not table_exists(session_dc, schema_name, table):
+        logger.warning("%s.%s is not materialized, skipped", schema_name, table)
+        return 0
+
+    column_str = ", ".join(f'"{column}"' for column in _foreign_columns(session_dc, table))
+
+    ddl_delete = f"""
+    DELETE FROM {schema_name}.{table}
+    WHERE person_id IN (SELECT subject_id FROM dc_stage.{removed.name});
+    """
+
+    ddl_chunks = [f"""
+    INSERT INTO {schema_name}.{table} ({column_str})
+    SELECT {column_str} FROM {FDW_SCHEMA}.{table} WHERE {added.chunk_filter("person_id", chunk_no)};
+    """ for chunk_no in range(added.chunks)]
+
+    # 테이블 하나가 실패하면 해당 테이블만 롤백
+    try:
+        result = session_dc.exec(text(ddl_delete))
+        rows = max(result.rowcount, 0)
+
+        for ddl_chunk in ddl_chunks:
+            result = session_dc.exec(text(ddl_chunk))
+            rows += max(result.rowcount, 0)
+
+        session_dc.commit()
+    except Exception:
+        session_dc.rollback()
+        raise
+
+    return rows
+
+def refresh_table_isolated(
+        schema_name: str,
+        table: str,
+        added: SubjectStage,
+        removed: SubjectStage) -> int:
+
+    with Session(dc_engine) as session_dc:
+        return refresh_table(session_dc, schema_name, table, added, removed)
+
+def record_watermark(
+        session_dc: Session,
+        cohort_id: int,
+        ext_modified_at: datetime,
+        subject_count: int,
+        mode: str,
+        added_count: int | None = None,
+        removed_count: int | None = None):
+
+    stmt = select(SchmInfo).where(SchmInfo.schema_from == cohort_id)
+    schm_info = session_dc.exec(stmt).scalars().first()
+
+    if schm_info is None:
+        return
+
+    stmt = select(SchmSync).where(SchmSync.id == schm_info.id)
+    schm_sync = session_dc.exec(stmt).scalars().first()
+
+    if schm_sync is None:
+        schm_sync = SchmSync(id=schm_info.id)
+
+    schm_sync.ext_modified_at = ext_modified_at
+    schm_sync.subject_count = subject_count
+    schm_sync.added_count = added_count
+    schm_sync.removed_count = removed_count
+    schm_sync.mode = mode
+    schm_sync.synced_at = datetime.now()
+
+    session_dc.add(schm_sync)
+
+    # 복사가 끝난 시점에만 cohort 를 최신으로 표시 (실패하면 다음 요청에서 다시 갱신)
+    stmt = select(ChrtInfo).where(ChrtInfo.id == cohort_id)
+    chrt_info = session_dc.exec(stmt).scalars().first()
+
+    if chrt_info is not None and chrt_info.modified_at < ext_modified_at:
+        chrt_info.modified_at = ext_modified_at
+        session_dc.add(chrt_info)
 
-    session_dc.exec(text(ddl_drop))
     session_dc.commit()
 
 
@@ -325,4 +851,14 @@ def provision_user(
         text(f"ALTER ROLE {new_user} WITH PASSWORD :p"),
         params={"p": new_pw},
     )
-    session.commit()
\ No newline at end of file
+    session.commit()
+
+def provision_user_isolated(
+    new_user: str,
+    new_pw: str,
+    target_db: str,
+    target_schema: str):
+
+    # 여러 문장으로 된 DDL 은 asyncpg 로 보낼 수 없으므로 동기 연결에서 실행
+    with Session(dc_engine) as session:
+        provision_user(session, new_user, new_pw, target_db, target_schema)
\ No newline at end of file
@@ -1,13 +1,119 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from fastapi.responses import FileResponse
-from utils.auth import verify_token
 
-# 보안 강화
-# router = APIRouter(prefix="/documents", dependencies=[Depends(verify_token)], tags=["documents"])
+import os
+
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+
+# -------- DBM Imports --------
+from utils.dbm import get_atlas_async_session, get_dc_async_session, CertOath, ChrtInfo
+from utils.auth import verify_token_or_param
+from utils.identity import Identity, identity_from_claims
+from utils.uploads import DOCS_PATH
+
+
+# -------- Logging Setup --------
+from utils.logs import get_logger
+logger = get_logger(__name__)
+
+
 router = APIRouter(prefix="/documents", tags=["documents"])
 
 
+# -------- Dependencies --------
+async def get_link_identity(
+    user = Depends(verify_token_or_param),
+    session_atlas: AsyncSession = Depends(get_atlas_async_session)) -> Identity:
+
+    return await identity_from_claims(session_atlas, user)
+
+
+# -------- Lookup --------
+async def find_document(session_dc: AsyncSession, cert_oath_id: int, identity: Identity) -> CertOath | None:
+    # 요청한 cert_oath 행이 속한 cohort 의 소유자인지 확인 (관리자는 모두 허용)
+    # 파일 경로는 행에서 가져오므로 요청 값이 파일 시스템에 붙지 않음
+    stmt = select(CertOath, ChrtInfo.owner).join(ChrtInfo, ChrtInfo.id == CertOath.document_for).where(
+        CertOath.id == cert_oath_id)
+
+    row = (await session_dc.exec(stmt)).first()
+
+    if row is None:
+        return None
+
+    co, owner = row
+
+    if not identity.is_admin and owner != identity.id:
+        return None
+
+    return co
+
+def _resolve(path: str) -> str | None:
+    full_path = os.path.realpath(DOCS_PATH + path)
+
+    if os.path.commonpath([full_path, os.path.realpath(DOCS_PATH)]) != os.path.realpath(DOCS_PATH):
+        return None
+
+    return full_path if os.path.isfile(full_path) else None
+
+
+# -------- Validators --------
+def document_etag(co: CertOath, stat: os.stat_result) -> str:
+    # sha256 이 있으면 내용 기준의 strong ETag, 이전 파일은 수정 시각과 크기로 대신함
+    if co.sha256 is not None:
+        return f'"{co.sha256}"'
+
+    return f'"{int(stat.st_mtime)}-{stat.st_size}"'
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if if_none_match is None:
+        return False
+
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+
+    return False
+
+
 # -------- Routes --------
-@router.get("/{path:path}")
-async def protected_documents(path: str):
-    return FileResponse(f"documents/{path}")
\ No newline at end of file
+# Range 요청 (206, If-Range) 은 FileResponse 가 처리
+@router.api_route("/{cert_oath_id}", methods=["GET", "HEAD"])
+async def protected_documents(
+    cert_oath_id: int,
+    request: Request,
+    session_dc: AsyncSession = Depends(get_dc_async_session),
+    identity: Identity = Depends(get_link_identity)):
+
+    co = await find_document(session_dc, cert_oath_id, identity)
+
+    if co is None:
+        raise HTTPException(status_code=404, detail="Document not found")
+
+    full_path = _resolve(co.path)
+
+    if full_path is None:
+        logger.warning("Document %s of cohort %s is missing on disk", co.id, co.document_for)
+        raise HTTPException(status_code=404, detail="Document not found")
+
+    stat = os.stat(full_path)
+    etag = document_etag(co, stat)
+
+    headers = {
+        "ETag": etag,
+        # 캐시된 사본도 매번 다시 확인해서 권한이 없어지면 바로 막힘 (바뀌지 않았으면 304)
+        "Cache-Control": "private, no-cache",
+        "Vary": "Authorization",
+        # ?token= 이 Referer 로 새어 나가지 않도록
+        "Referrer-Policy": "no-referrer",
+        "X-Content-Type-Options": "nosniff",
+    }
+
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    return FileResponse(full_path, headers=headers, stat_result=stat,
+                        media_type=co.mime, filename=co.name, content_disposition_type="inline")
@@ -0,0 +1,33 @@
+import asyncio
+
+
+# -------- Fan-out --------
+# ATLAS 와 DataCenter 처럼 서로 다른 DB 에 보내는 독립적인 쿼리를 동시에 실행
+# AsyncSession 하나로는 쿼리를 동시에 보낼 수 없으므로 각 작업은 서로 다른 session 을 사용해야 함
+async def fan_out(*aws) -> list:
+    tasks = [asyncio.ensure_future(aw) for aw in aws]
+
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        # 하나가 실패하면 나머지는 취소하고 끝날 때까지 기다린 뒤 예외를 그대로 전달
+        for task in tasks:
+            task.cancel()
+
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+async def sequence(*aws) -> list:
+    # 같은 session 을 쓰는 쿼리는 순서대로 실행해서 하나의 fan-out 작업으로 묶음
+    results = []
+
+    try:
+        for aw in aws:
+            results.append(await aw)
+    finally:
+        # 중간에 실패하거나 취소되면 시작하지 않은 coroutine 을 닫음
+        for aw in aws[len(results) + 1:]:
+            if asyncio.iscoroutine(aw):
+                aw.close()
+
+    return results
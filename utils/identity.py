@@ -0,0 +1,115 @@
+from fastapi import Depends, HTTPException
+from sqlmodel import Session, select, or_
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+
+# -------- Importing secret.py --------
+import secret
+
+IDENTITY_CACHE_SIZE = getattr(secret, "IDENTITY_CACHE_SIZE", 1024)
+IDENTITY_CACHE_TTL = getattr(secret, "IDENTITY_CACHE_TTL", 300)       # seconds
+
+
+# -------- DBM Imports --------
+from utils.dbm import get_atlas_async_session, SecUser, SecUserRole
+from utils.auth import verify_token, fresh_claims
+from utils.cache import TTLCache, register_cache
+
+
+# -------- Logging Setup --------
+from utils.logs import get_logger
+logger = get_logger(__name__)
+
+
+# -------- Identity --------
+class Identity():
+    def __init__(self, id: int, name: str, login: str, role: str):
+        self.id = id
+        self.name = name
+        self.login = login
+        self.role = role            # admin, public
+
+    @property
+    def is_admin(self) -> bool:
+        return self.role == "admin"
+
+    def json(self):
+        return {
+            "id": self.id,
+            "name": self.name,
+            "login": self.login,
+            "role": self.role
+        }
+
+_identities = register_cache("identity", TTLCache(IDENTITY_CACHE_SIZE, IDENTITY_CACHE_TTL))
+
+def _user_stmt(name: str):
+    return select(SecUser).where(SecUser.name == name)
+
+def _role_stmt(user_id: int):
+    return select(SecUserRole).where(SecUserRole.user_id == user_id).where(
+        or_(SecUserRole.role_id==2, SecUserRole.role_id>=1000)
+    )
+
+def _store_identity(name: str, user: SecUser | None, roles: list) -> Identity:
+    if not user:
+        logger.error("User not found in database")
+        raise HTTPException(status_code=404, detail="User not found")
+
+    identity = Identity(user.id, user.name, user.login, "admin" if roles else "public")
+    _identities.set(name, identity)
+
+    return identity
+
+async def resolve_identity(session_atlas: AsyncSession, name: str) -> Identity:
+    identity = _identities.get(name)
+
+    if identity is not None:
+        return identity
+
+    user = (await session_atlas.exec(_user_stmt(name))).first()
+    roles = (await session_atlas.exec(_role_stmt(user.id))).all() if user else []
+
+    return _store_identity(name, user, roles)
+
+def resolve_identity_sync(session_atlas: Session, name: str) -> Identity:
+    # 동기 Session 을 쓰는 곳 (temp 라우터 등) 에서 사용
+    identity = _identities.get(name)
+
+    if identity is not None:
+        return identity
+
+    user = session_atlas.exec(_user_stmt(name)).first()
+    roles = session_atlas.exec(_role_stmt(user.id)).all() if user else []
+
+    return _store_identity(name, user, roles)
+
+def invalidate_identity(name: str | None = None):
+    _identities.invalidate(name)
+
+def identity_cache_stats() -> dict:
+    return _identities.stats()
+
+
+# -------- Dependencies --------
+# FastAPI 는 요청 하나 안에서 같은 dependency 결과를 재사용하므로 요청당 한 번만 확인
+async def get_identity(
+    user = Depends(verify_token),
+    session_atlas: AsyncSession = Depends(get_atlas_async_session)) -> Identity:
+
+    return await identity_from_claims(session_atlas, user)
+
+async def identity_from_claims(session_atlas: AsyncSession, user: dict) -> Identity:
+    # 서명된 claim 이 충분히 최근이면 ATLAS 조회 없이 사용
+    if fresh_claims(user):
+        return Identity(user["uid"], user["name"], user["sub"], user["role"])
+
+    return await resolve_identity(session_atlas, user["sub"])
+
+async def require_admin(
+    identity: Identity = Depends(get_identity)) -> Identity:
+
+    if not identity.is_admin:
+        raise HTTPException(status_code=402, detail="User is not an admin")
+
+    return identity
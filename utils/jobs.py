@@ -0,0 +1,379 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import itertools
+import threading
+
+from sqlalchemy import text
+from sqlmodel import Session
+
+
+# -------- Importing secret.py --------
+import secret
+
+JOB_WORKERS = getattr(secret, "JOB_WORKERS", 2)
+
+# 메모리에 남겨둘 작업 수 (끝난 작업부터 오래된 순으로 제거)
+JOB_HISTORY = getattr(secret, "JOB_HISTORY", 200)
+
+# 한 process 만 작업을 실행하도록 잡는 advisory lock
+JOB_LOCK_KEY = getattr(secret, "JOB_LOCK_KEY", 0x534E5548)
+
+
+# -------- DBM Imports --------
+from utils.dbm import (
+    atlas_engine, dc_engine,
+    load_copy_plan, prepare_fdw, copy_tables_parallel, run_tables_parallel,
+    stage_subjects, drop_stage, load_staged_subjects, refresh_table_isolated, record_watermark,
+    table_exists, drop_table,
+    COPY_CONCURRENCY
+)
+from utils.structure import has_person_id
+from utils.transfer import TRANSFER_ENGINE, TransferStats, stream_tables_parallel
+
+
+# -------- Logging Setup --------
+from utils.logs import get_logger
+logger = get_logger(__name__)
+
+
+# -------- Job Models --------
+def _format_date(date: datetime | None) -> str | None:
+    return None if date is None else date.strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+
+def _elapsed(started_at: datetime | None, finished_at: datetime | None) -> float | None:
+    if started_at is None:
+        return None
+
+    end = finished_at if finished_at is not None else datetime.now()
+    return round((end - started_at).total_seconds(), 3)
+
+class TableStep():
+    def __init__(self, name: str):
+        self.name = name
+        self.status = "pending"     # pending, running, done, failed
+        self.rows = 0
+        self.bytes = None
+        self.transfer_elapsed = None
+        self.started_at = None
+        self.finished_at = None
+        self.error = None
+
+    def start(self):
+        self.status = "running"
+        self.rows = 0
+        self.bytes = None
+        self.transfer_elapsed = None
+        self.started_at = datetime.now()
+        self.finished_at = None
+        self.error = None
+
+    def finish(self, result: int | TransferStats):
+        self.status = "done"
+        self.finished_at = datetime.now()
+
+        if isinstance(result, TransferStats):
+            self.rows = result.rows
+            self.bytes = result.bytes
+            self.transfer_elapsed = result.elapsed
+        else:
+            self.rows = result
+            self.transfer_elapsed = _elapsed(self.started_at, self.finished_at)
+
+    def rows_per_sec(self) -> float | None:
+        if not self.transfer_elapsed:
+            return None
+
+        return round(self.rows / self.transfer_elapsed, 1)
+
+    def mb_per_sec(self) -> float | None:
+        if not self.transfer_elapsed or self.bytes is None:
+            return None
+
+        return round(self.bytes / 1024 / 1024 / self.transfer_elapsed, 2)
+
+    def fail(self, error: Exception):
+        self.status = "failed"
+        self.finished_at = datetime.now()
+        self.error = str(error)
+
+    def json(self):
+        return {
+            "name": self.name,
+            "status": self.status,
+            "rows": self.rows,
+            "bytes": self.bytes,
+            "rowsPerSec": self.rows_per_sec(),
+            "mbPerSec": self.mb_per_sec(),
+            "startedAt": _format_date(self.started_at),
+            "finishedAt": _format_date(self.finished_at),
+            "elapsed": _elapsed(self.started_at, self.finished_at),
+            "error": self.error
+        }
+
+class MaterializeJob():
+    def __init__(self, id: int, cohort_id: int, schema_name: str, kind: str = "full"):
+        self.id = id
+        self.cohort_id = cohort_id
+        self.schema_name = schema_name
+        self.kind = kind            # full, incremental
+        self.diff = None            # incremental 작업의 (추가된 대상자, 빠진 대상자)
+        self.engine = TRANSFER_ENGINE if kind == "full" else "fdw"
+        self.status = "queued"      # queued, running, done, failed
+        self.steps: dict[str, TableStep] = {}
+        self.created_at = datetime.now()
+        self.started_at = None
+        self.finished_at = None
+        self.error = None
+
+    def pending_steps(self) -> list[TableStep]:
+        return [step for step in self.steps.values() if step.status != "done"]
+
+    def json(self):
+        steps = list(self.steps.values())
+
+        return {
+            "id": self.id,
+            "cohortId": self.cohort_id,
+            "schema": self.schema_name,
+            "kind": self.kind,
+            "engine": self.engine,
+            "added": None if self.diff is None else len(self.diff[0]),
+            "removed": None if self.diff is None else len(self.diff[1]),
+            "status": self.status,
+            "tablesDone": len([step for step in steps if step.status == "done"]),
+            "tablesTotal": len(steps),
+            "rows": sum(step.rows for step in steps),
+            "createdAt": _format_date(self.created_at),
+            "startedAt": _format_date(self.started_at),
+            "finishedAt": _format_date(self.finished_at),
+            "elapsed": _elapsed(self.started_at, self.finished_at),
+            "error": self.error,
+            "tables": [step.json() for step in steps]
+        }
+
+
+# -------- Single Worker --------
+# 작업과 문서 GC 의 상태는 process 메모리에만 있음
+#   여러 worker 가 뜨면 조회 / 재시도가 다른 process 로 가고, 재시작하면 기록이 사라짐
+#   그래서 서버는 process 하나로만 실행 (uvicorn --workers 1)
+# 같은 DB 에 붙는 두 번째 process 는 lock 을 얻지 못해 시작하지 않음
+_worker_conn = None
+
+def claim_worker():
+    global _worker_conn
+
+    if _worker_conn is not None:
+        return
+
+    conn = dc_engine.connect()
+
+    # session 단위 lock 이라 commit 후에도 connection 을 닫을 때까지 유지
+    claimed = conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": JOB_LOCK_KEY}).scalar()
+    conn.commit()
+
+    if not claimed:
+        conn.close()
+        raise RuntimeError("Another server process is running jobs on this database; run a single worker (uvicorn --workers 1)")
+
+    _worker_conn = conn
+
+    logger.info("Job worker lock %s claimed", JOB_LOCK_KEY)
+
+
+# -------- Job Queue --------
+_jobs: dict[int, MaterializeJob] = {}
+_jobs_lock = threading.Lock()
+_job_ids = itertools.count(1)
+
+_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="materialize")
+
+def _trim_jobs():
+    # _jobs_lock 안에서 호출
+    finished = [job_id for job_id, job in _jobs.items() if job.status in ("done", "failed")]
+
+    for job_id in finished[:max(0, len(_jobs) - JOB_HISTORY)]:
+        del _jobs[job_id]
+
+def enqueue_materialization(cohort_id: int, schema_name: str, kind: str = "full") -> MaterializeJob:
+    with _jobs_lock:
+        job = MaterializeJob(next(_job_ids), cohort_id, schema_name, kind)
+        _jobs[job.id] = job
+        _trim_jobs()
+
+    logger.info("Materialization job %s (%s) queued for cohort %s into %s", job.id, kind, cohort_id, schema_name)
+
+    _executor.submit(_run_job, job)
+
+    return job
+
+def enqueue_refresh(cohort_id: int, schema_name: str) -> MaterializeJob:
+    # incremental 갱신은 postgres_fdw 로만 가능
+    #   COPY 전송을 쓰면 full 작업으로 대신함 (대상자가 바뀐 테이블만 다시 복사)
+    kind = "incremental" if TRANSFER_ENGINE == "fdw" else "full"
+
+    return enqueue_materialization(cohort_id, schema_name, kind)
+
+def retry_job(job_id: int) -> MaterializeJob | None:
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+
+        if job is None or job.status != "failed":
+            return None
+
+        job.status = "queued"
+        job.error = None
+
+    logger.info("Materialization job %s queued for retry", job.id)
+
+    _executor.submit(_run_job, job)
+
+    return job
+
+def get_job(job_id: int) -> MaterializeJob | None:
+    return _jobs.get(job_id)
+
+def list_jobs(cohort_id: int | None = None) -> list[MaterializeJob]:
+    jobs = list(_jobs.values())
+
+    if cohort_id is not None:
+        jobs = [job for job in jobs if job.cohort_id == cohort_id]
+
+    return jobs
+
+
+# -------- Job Runner --------
+def _track(job: MaterializeJob):
+    def on_start(table: str):
+        job.steps[table].start()
+
+    def on_done(table: str, result: int | TransferStats | None, error: Exception | None):
+        step = job.steps[table]
+
+        if error is None:
+            step.finish(result)
+            logger.debug("Job %s: %s copied (%s rows)", job.id, table, step.rows)
+        else:
+            step.fail(error)
+
+    return on_start, on_done
+
+def _run_full(job: MaterializeJob, session_atlas: Session, session_dc: Session,
+              tables: list[str], subject_ids: list[int], cohort_definition_id: int):
+
+    for table in tables:
+        job.steps.setdefault(table, TableStep(table))
+
+    # 이미 있는 대상자 테이블은 이전 snapshot 의 대상자로 복사된 것
+    #   대상자가 바뀌었으면 (또는 snapshot 이 없으면) 지우고 다시 복사해서 snapshot 과 내용을 맞춤
+    old_ids = load_staged_subjects(session_dc, job.schema_name)
+
+    if old_ids != set(subject_ids):
+        for table in tables:
+            if has_person_id(table) and table_exists(session_dc, job.schema_name, table):
+                logger.info("Job %s: subjects of %s changed, %s is copied again", job.id, job.schema_name, table)
+
+                drop_table(session_dc, job.schema_name, table)
+                job.steps[table] = TableStep(table)
+
+    # 이미 복사된 테이블은 다시 복사하지 않음
+    pending = [step.name for step in job.pending_steps()]
+
+    # 대상자 목록은 이후 incremental 갱신의 기준이 됨
+    stage = stage_subjects(session_dc, job.schema_name, subject_ids)
+
+    if len(pending) == 0:
+        return
+
+    on_start, on_done = _track(job)
+
+    if job.engine == "copy":
+        # COPY TO STDOUT / COPY FROM STDIN 으로 직접 전송
+        stream_tables_parallel(job.schema_name, pending, cohort_definition_id,
+                               COPY_CONCURRENCY, on_start, on_done)
+    else:
+        prepare_fdw(session_atlas, session_dc, pending)
+
+        # 테이블마다 별도의 connection 과 commit 을 사용
+        copy_tables_parallel(job.schema_name, pending, stage,
+                             COPY_CONCURRENCY, on_start, on_done)
+
+def _run_incremental(job: MaterializeJob, session_atlas: Session, session_dc: Session,
+                     tables: list[str], subject_ids: list[int]):
+
+    # 재시도할 때도 처음 계산한 차이를 그대로 사용
+    if job.diff is None:
+        old_ids = load_staged_subjects(session_dc, job.schema_name)
+
+        if old_ids is None:
+            raise ValueError(f"Subject snapshot of {job.schema_name} is not found")
+
+        new_ids = set(subject_ids)
+        job.diff = (sorted(new_ids - old_ids), sorted(old_ids - new_ids))
+
+    added_ids, removed_ids = job.diff
+
+    # 대상자와 관계없는 테이블은 바뀌지 않음
+    for table in tables:
+        if has_person_id(table):
+            job.steps.setdefault(table, TableStep(table))
+
+    pending = [step.name for step in job.pending_steps()]
+
+    if len(pending) > 0 and len(added_ids) + len(removed_ids) > 0:
+        prepare_fdw(session_atlas, session_dc, pending)
+
+        added = stage_subjects(session_dc, f"{job.schema_name}_added", added_ids)
+        removed = stage_subjects(session_dc, f"{job.schema_name}_removed", removed_ids)
+
+        on_start, on_done = _track(job)
+
+        run_tables_parallel(
+            pending,
+            lambda table: refresh_table_isolated(job.schema_name, table, added, removed),
+            COPY_CONCURRENCY, on_start, on_done)
+
+        drop_stage(session_dc, added)
+        drop_stage(session_dc, removed)
+
+    else:
+        for step in job.pending_steps():
+            step.start()
+            step.finish(0)
+
+    if len(job.pending_steps()) == 0:
+        stage_subjects(session_dc, job.schema_name, subject_ids)
+
+def _run_job(job: MaterializeJob):
+    job.status = "running"
+    job.started_at = datetime.now()
+    job.finished_at = None
+
+    try:
+        with Session(atlas_engine) as session_atlas, Session(dc_engine) as session_dc:
+            tables, subject_ids, chrt_def = load_copy_plan(session_atlas, session_dc, job.cohort_id)
+
+            if job.kind == "incremental":
+                _run_incremental(job, session_atlas, session_dc, tables, subject_ids)
+            else:
+                _run_full(job, session_atlas, session_dc, tables, subject_ids, chrt_def.id)
+
+            failed = [step.name for step in job.steps.values() if step.status == "failed"]
+
+            if len(failed) > 0:
+                job.status = "failed"
+                job.error = f"Failed tables: {', '.join(failed)}"
+            else:
+                job.status = "done"
+
+                record_watermark(session_dc, job.cohort_id, chrt_def.modified_date, len(set(subject_ids)), job.kind,
+                                 None if job.diff is None else len(job.diff[0]),
+                                 None if job.diff is None else len(job.diff[1]))
+
+    except Exception as e:
+        logger.error("Materialization job %s failed: %s", job.id, e)
+        job.status = "failed"
+        job.error = str(e)
+
+    job.finished_at = datetime.now()
+
+    logger.info("Materialization job %s finished with status %s", job.id, job.status)
@@ -0,0 +1,77 @@
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+
+# -------- DBM Imports --------
+from utils.dbm import (
+    SecUser,
+    CertOath, ChrtInfo, ChrtCert,
+    SchmInfo, SchmConnectInfo
+)
+from utils.paging import PageParams, APPLY_SORTS, apply_page
+
+
+# -------- Batched Loaders --------
+# 목록 API 에서 코호트마다 쿼리를 보내지 않도록 필요한 행을 한 번에 가져와서 dict 로 묶음
+async def load_cohorts_with_cert(
+        session_dc: AsyncSession,
+        owner: int | None = None,
+        applied_only: bool = False,
+        page: PageParams | None = None) -> list[tuple[ChrtInfo, ChrtCert]]:
+
+    # ChrtInfo 와 ChrtCert 는 DB 에서 join
+    stmt = select(ChrtInfo, ChrtCert).join(ChrtCert, ChrtCert.id == ChrtInfo.id)
+
+    if owner is not None:
+        stmt = stmt.where(ChrtInfo.owner == owner)
+
+    if applied_only:
+        stmt = stmt.where(ChrtCert.cur_status != "before_apply")
+
+    # 필터, 정렬, 페이지 처리도 DB 에서
+    if page is not None:
+        stmt = apply_page(stmt, page, ChrtCert.applied_at if applied_only else ChrtInfo.created_at, APPLY_SORTS)
+
+    return [(ci, cc) for ci, cc in (await session_dc.exec(stmt)).all()]
+
+async def load_applied_cohorts(
+        session_dc: AsyncSession,
+        owner: int | None = None,
+        page: PageParams | None = None) -> list[tuple[ChrtInfo, ChrtCert]]:
+
+    return await load_cohorts_with_cert(session_dc, owner, True, page)
+
+async def load_cert_oaths(session_dc: AsyncSession, cohort_ids: list[int]) -> dict[int, list[CertOath]]:
+    results = {cohort_id: [] for cohort_id in cohort_ids}
+
+    if len(cohort_ids) == 0:
+        return results
+
+    stmt = select(CertOath).where(CertOath.document_for.in_(cohort_ids))
+
+    for co in (await session_dc.exec(stmt)).all():
+        results[co.document_for].append(co)
+
+    return results
+
+async def load_connect_infos(session_dc: AsyncSession, cohort_ids: list[int]) -> dict[int, tuple[SchmInfo, SchmConnectInfo]]:
+    results = dict()
+
+    if len(cohort_ids) == 0:
+        return results
+
+    stmt = select(SchmInfo, SchmConnectInfo).join(SchmConnectInfo, SchmConnectInfo.id == SchmInfo.id).where(
+        SchmInfo.schema_from.in_(cohort_ids))
+
+    for si, sci in (await session_dc.exec(stmt)).all():
+        results[si.schema_from] = (si, sci)
+
+    return results
+
+async def load_user_names(session_atlas: AsyncSession, user_ids: list[int]) -> dict[int, str]:
+    if len(user_ids) == 0:
+        return dict()
+
+    stmt = select(SecUser).where(SecUser.id.in_(user_ids))
+
+    return {user.id: user.name for user in (await session_atlas.exec(stmt)).all()}
@@ -0,0 +1,128 @@
+from datetime import datetime, timezone
+import json
+import logging
+import random
+import re
+import sys
+
+
+# -------- Importing secret.py --------
+import secret
+
+LOG_LEVEL = getattr(secret, "LOG_LEVEL", "INFO")
+LOG_FORMAT = getattr(secret, "LOG_FORMAT", "json")          # json, text
+
+# 모듈별 level, 예: {"utils.transfer": "DEBUG"}
+LOG_LEVELS = getattr(secret, "LOG_LEVELS", {})
+
+# 모듈별 DEBUG 기록 비율 (0 ~ 1), 예: {"utils.tracing": 0.1}
+LOG_SAMPLING = getattr(secret, "LOG_SAMPLING", {})
+
+
+# -------- Logging Setup --------
+ROOT = "datacenter"
+
+# LogRecord 기본 속성 (그 외 속성은 extra 로 넘어온 구조화 필드)
+_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+SENSITIVE_KEYS = {"password", "pw", "pwd", "token", "access_token", "refresh_token", "authorization", "secret"}
+
+_SCRUB_PATTERNS = [
+    (re.compile(r"eyJ[\w-]+\.[\w-]+\.[\w-]+"), "[REDACTED_JWT]"),
+    (re.compile(r"(?i)(bearer\s+)\S+"), r"\1[REDACTED]"),
+    (re.compile(r"(?i)\b(password|pw|pwd|token|secret)(\s*[=:]\s*)\S+"), r"\1\2[REDACTED]"),
+]
+
+def scrub(text: str) -> str:
+    for pattern, replacement in _SCRUB_PATTERNS:
+        text = pattern.sub(replacement, text)
+
+    return text
+
+def _scrub_value(key: str, value):
+    if key.lower() in SENSITIVE_KEYS:
+        return "[REDACTED]"
+
+    if isinstance(value, dict):
+        return {k: _scrub_value(k, v) for k, v in value.items()}
+
+    return value
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": scrub(record.getMessage()),
+        }
+
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_FIELDS and not key.startswith("_"):
+                data[key] = _scrub_value(key, value)
+
+        if record.exc_info:
+            data["exc"] = scrub(self.formatException(record.exc_info))
+
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        return scrub(super().format(record))
+
+class SamplingFilter(logging.Filter):
+    # DEBUG 기록만 비율에 맞춰 남김 (INFO 이상은 항상 기록)
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno > logging.DEBUG or random.random() < self.rate
+
+
+class ScrubFilter(logging.Filter):
+    # 다른 라이브러리 logger (uvicorn access log 의 ?token= 등) 의 인자를 가림
+    def filter(self, record: logging.LogRecord) -> bool:
+        if isinstance(record.args, tuple):
+            record.args = tuple(scrub(arg) if isinstance(arg, str) else arg for arg in record.args)
+
+        return True
+
+
+def _logger_name(name: str) -> str:
+    return name if name == ROOT or name.startswith(ROOT + ".") else f"{ROOT}.{name}"
+
+def get_logger(name: str) -> logging.Logger:
+    # 모듈에서는 get_logger(__name__) 으로 사용
+    # level 확인이 먼저 일어나므로 logger.debug("... %s", value) 형태면 꺼진 level 은 포맷 비용이 없음
+    return logging.getLogger(_logger_name(name))
+
+def setup_logging():
+    root = logging.getLogger(ROOT)
+
+    if getattr(root, "_configured", False):
+        return
+
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else TextFormatter())
+
+    root.handlers = [handler]
+    root.setLevel(LOG_LEVEL)
+    root.propagate = False
+
+    for name, level in LOG_LEVELS.items():
+        logging.getLogger(_logger_name(name)).setLevel(level)
+
+    for name, rate in LOG_SAMPLING.items():
+        logging.getLogger(_logger_name(name)).addFilter(SamplingFilter(rate))
+
+    logging.getLogger("uvicorn.access").addFilter(ScrubFilter())
+
+    root._configured = True
+
+# import 시 한 번 설정 (서버, 스크립트 모두)
+setup_logging()
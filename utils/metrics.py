@@ -0,0 +1,275 @@
+from contextvars import ContextVar
+import bisect
+import threading
+import time
+
+
+# -------- Importing secret.py --------
+import secret
+
+# /metrics 는 내부 수집기만 접근
+METRICS_ALLOWED_HOSTS = getattr(secret, "METRICS_ALLOWED_HOSTS", ["127.0.0.1", "::1"])
+
+
+# -------- Metric Types --------
+# 기본 bucket (초 단위)
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class Histogram():
+    def __init__(self, buckets: tuple = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0 for _ in range(len(self.buckets) + 1)]      # 마지막은 +Inf
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        i = bisect.bisect_left(self.buckets, value)
+
+        with self._lock:
+            self._counts[i] += 1
+            self._sum += value
+            self._count += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counts = list(self._counts)
+            total, count = self._sum, self._count
+
+        # 누적 bucket (le 이하 관측 수)
+        cumulative = []
+        running = 0
+
+        for bound, n in zip(list(self.buckets) + ["+Inf"], counts):
+            running += n
+            cumulative.append((bound, running))
+
+        return {"buckets": cumulative, "sum": total, "count": count}
+
+
+# -------- Metric Families --------
+# label 값 조합마다 값을 따로 보관
+class _Family():
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._children: dict = dict()
+        self._lock = threading.Lock()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def child(self, *values):
+        child = self._children.get(values)
+
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+
+        return child
+
+    def _label_text(self, values: tuple, extra: str = "") -> str:
+        pairs = [f'{key}="{_escape(str(value))}"' for key, value in zip(self.labels, values)]
+
+        if extra:
+            pairs.append(extra)
+
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def expose(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+        for values, child in list(self._children.items()):
+            lines.extend(self._expose_child(values, child))
+
+        return lines
+
+class _Value():
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+class Counter(_Family):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, *values, amount: float = 1):
+        self.child(*values).inc(amount)
+
+    def _expose_child(self, values, child):
+        return [f"{self.name}{self._label_text(values)} {_number(child.value)}"]
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *values, amount: float = 1):
+        self.child(*values).dec(amount)
+
+    def set(self, *values, value: float):
+        self.child(*values).set(value)
+
+class HistogramFamily(_Family):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = buckets
+
+    def _new_child(self):
+        return Histogram(self.buckets)
+
+    def observe(self, *values, value: float):
+        self.child(*values).observe(value)
+
+    def bind(self, *values, histogram: Histogram):
+        # 다른 곳에서 이미 관리하는 Histogram 을 그대로 노출
+        with self._lock:
+            self._children[values] = histogram
+
+    def _expose_child(self, values, child):
+        snapshot = child.snapshot()
+        lines = []
+
+        for bound, count in snapshot["buckets"]:
+            le = f'le="{bound}"'
+            lines.append(f"{self.name}_bucket{self._label_text(values, le)} {count}")
+
+        lines.append(f"{self.name}_sum{self._label_text(values)} {_number(snapshot['sum'])}")
+        lines.append(f"{self.name}_count{self._label_text(values)} {snapshot['count']}")
+
+        return lines
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+
+# -------- Registry --------
+_families: list[_Family] = []
+_collectors: list = []          # 노출 직전에 값을 채우는 함수 (pool 상태 등)
+
+def register(family: _Family) -> _Family:
+    _families.append(family)
+    return family
+
+def register_collector(collector):
+    _collectors.append(collector)
+
+def expose() -> str:
+    for collector in _collectors:
+        collector()
+
+    lines = []
+
+    for family in _families:
+        lines.extend(family.expose())
+
+    return "\n".join(lines) + "\n"
+
+
+# -------- HTTP / DB Metrics --------
+REQUESTS = register(Counter("http_requests_total", "HTTP requests by route and status", ("method", "route", "status")))
+REQUEST_LATENCY = register(HistogramFamily("http_request_duration_seconds", "HTTP request latency", ("method", "route")))
+IN_FLIGHT = register(Gauge("http_requests_in_flight", "HTTP requests being served"))
+
+QUERIES = register(Counter("db_queries_total", "SQL statements executed", ("engine",)))
+QUERY_LATENCY = register(HistogramFamily("db_query_duration_seconds", "SQL statement latency", ("engine",)))
+REQUEST_QUERIES = register(HistogramFamily("http_request_db_queries", "SQL statements per HTTP request", ("route",),
+                                           buckets=(0, 1, 2, 5, 10, 20, 50, 100, 200)))
+REQUEST_QUERY_TIME = register(HistogramFamily("http_request_db_seconds", "SQL time per HTTP request", ("route",)))
+
+
+class RequestStats():
+    def __init__(self, scope: dict):
+        self.scope = scope
+        self.method = scope["method"]
+        self.queries = 0
+        self.query_time = 0.0
+        self.statements: dict[str, int] = dict()     # 문장별 실행 횟수 (반복 쿼리 확인용)
+
+    @property
+    def route(self) -> str:
+        # routing 이 끝나면 scope 에 route 가 채워짐
+        return route_of(self.scope)
+
+# 요청 처리 중에 실행된 쿼리를 요청 단위로 모으기 위한 context
+current_request: ContextVar[RequestStats | None] = ContextVar("current_request", default=None)
+
+def route_of(scope: dict) -> str:
+    # 경로 파라미터 대신 route 템플릿을 label 로 사용 (label 수 제한)
+    route = scope.get("route")
+
+    return getattr(route, "path", None) or "unmatched"
+
+class MetricsMiddleware():
+    # BaseHTTPMiddleware 보다 부담이 적은 순수 ASGI middleware
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = RequestStats(scope)
+        token = current_request.set(stats)
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+
+            await send(message)
+
+        IN_FLIGHT.inc()
+        started = time.perf_counter()
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            route = stats.route
+
+            IN_FLIGHT.dec()
+            REQUESTS.inc(stats.method, route, status[0])
+            REQUEST_LATENCY.observe(stats.method, route, value=elapsed)
+            REQUEST_QUERIES.observe(route, value=stats.queries)
+            REQUEST_QUERY_TIME.observe(route, value=stats.query_time)
+
+            for hook in _request_hooks:
+                hook(stats)
+
+            current_request.reset(token)
+
+# 요청이 끝날 때 RequestStats 를 받아 처리 (query budget 확인 등)
+_request_hooks: list = []
+
+def register_request_hook(hook):
+    _request_hooks.append(hook)
+
+def record_query(engine_name: str, elapsed: float):
+    QUERIES.inc(engine_name)
+    QUERY_LATENCY.observe(engine_name, value=elapsed)
+
+    stats = current_request.get()
+
+    if stats is not None:
+        stats.queries += 1
+        stats.query_time += elapsed
@@ -0,0 +1,162 @@
+from datetime import datetime
+import base64
+import json
+
+from fastapi import HTTPException, Query
+from sqlalchemy import tuple_, func, literal_column
+
+
+# -------- DBM Imports --------
+from utils.dbm import ChrtInfo, ChrtCert
+
+
+# -------- Paging Setup --------
+MAX_PAGE_SIZE = 500
+
+# NULL 인 날짜는 가장 앞으로 정렬
+NULL_DATE = datetime(1970, 1, 1)
+
+# bind parameter 가 아닌 상수로 넣어야 bootstrap_dc 의 COALESCE 식 index 와 맞음
+NULL_DATE_SQL = literal_column("'1970-01-01'::TIMESTAMP")
+
+# sort 이름: (모델, 컬럼, NULL 허용 여부)
+COHORT_SORTS = {
+    "id": (ChrtInfo, "id", False),
+    "name": (ChrtInfo, "name", False),
+    "created": (ChrtInfo, "created_at", False),
+    "modified": (ChrtInfo, "modified_at", False),
+}
+
+APPLY_SORTS = {
+    **COHORT_SORTS,
+    "applied": (ChrtCert, "applied_at", True),
+    "resolved": (ChrtCert, "resolved_at", True),
+}
+
+
+class PageParams():
+    def __init__(self, limit: int | None, cursor: str | None, sort: str, order: str,
+                 status: str | None, owner: int | None, date_from: datetime | None, date_to: datetime | None):
+        self.limit = limit
+        self.cursor = cursor
+        self.sort = sort
+        self.order = order
+        self.status = status
+        self.owner = owner
+        self.date_from = date_from
+        self.date_to = date_to
+
+def page_params(
+    limit: int | None = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    sort: str = "id",
+    order: str = Query("asc", pattern="^(asc|desc)$"),
+    status: str | None = None,
+    owner: int | None = None,
+    date_from: datetime | None = None,
+    date_to: datetime | None = None) -> PageParams:
+
+    return PageParams(limit, cursor, sort, order, status, owner, date_from, date_to)
+
+
+# -------- Cursor --------
+# 값의 타입이 정렬 키마다 다르므로 cursor 를 만든 sort 도 함께 담음
+def encode_cursor(value, id: int, sort: str) -> str:
+    if isinstance(value, datetime):
+        data = {"t": "dt", "v": value.isoformat(), "id": id, "s": sort}
+    else:
+        data = {"t": "raw", "v": value, "id": id, "s": sort}
+
+    return base64.urlsafe_b64encode(json.dumps(data).encode()).decode()
+
+def decode_cursor(cursor: str, sort: str) -> tuple[object, int]:
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        value = datetime.fromisoformat(data["v"]) if data["t"] == "dt" and data["v"] is not None else data["v"]
+        id = int(data["id"])
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    if data.get("s") != sort:
+        raise HTTPException(status_code=400, detail="Cursor was issued for another sort key")
+
+    return value, id
+
+
+# -------- Keyset Pagination --------
+def _sort_field(params: PageParams, sorts: dict):
+    if params.sort not in sorts:
+        raise HTTPException(status_code=400, detail=f"Unknown sort key, use one of {list(sorts.keys())}")
+
+    return sorts[params.sort]
+
+def _sort_column(params: PageParams, sorts: dict):
+    model, attr, nullable = _sort_field(params, sorts)
+    column = getattr(model, attr)
+
+    if nullable:
+        column = func.coalesce(column, NULL_DATE_SQL)
+
+    return column
+
+def _id_column(params: PageParams, sorts: dict):
+    # 정렬 키와 같은 테이블의 id 를 써야 (정렬 키, id) index 를 그대로 사용 (join 이라 값은 같음)
+    model, _, _ = _sort_field(params, sorts)
+
+    return model.id
+
+def apply_page(stmt, params: PageParams, date_column, sorts: dict = COHORT_SORTS):
+    # 필터
+    if params.status is not None:
+        stmt = stmt.where(ChrtCert.cur_status == params.status)
+
+    if params.owner is not None:
+        stmt = stmt.where(ChrtInfo.owner == params.owner)
+
+    if params.date_from is not None:
+        stmt = stmt.where(date_column >= params.date_from)
+
+    if params.date_to is not None:
+        stmt = stmt.where(date_column < params.date_to)
+
+    # 정렬 (정렬 키가 같은 경우 id 로 구분)
+    sort_column = _sort_column(params, sorts)
+    id_column = _id_column(params, sorts)
+
+    if params.cursor is not None:
+        value, id = decode_cursor(params.cursor, params.sort)
+
+        if value is None and _sort_field(params, sorts)[2]:
+            value = NULL_DATE
+
+        if params.order == "asc":
+            stmt = stmt.where(tuple_(sort_column, id_column) > tuple_(value, id))
+        else:
+            stmt = stmt.where(tuple_(sort_column, id_column) < tuple_(value, id))
+
+    if params.order == "asc":
+        stmt = stmt.order_by(sort_column.asc(), id_column.asc())
+    else:
+        stmt = stmt.order_by(sort_column.desc(), id_column.desc())
+
+    # 다음 페이지 존재 여부 확인을 위해 하나 더 가져옴
+    if params.limit is not None:
+        stmt = stmt.limit(params.limit + 1)
+
+    return stmt
+
+def page_rows(rows: list, params: PageParams, sorts: dict = COHORT_SORTS) -> tuple[list, str | None]:
+    if params.limit is None or len(rows) <= params.limit:
+        return rows, None
+
+    rows = rows[:params.limit]
+    last = rows[-1]
+
+    model, attr, _ = _sort_field(params, sorts)
+
+    # row 는 ChrtInfo 또는 (ChrtInfo, ChrtCert)
+    items = last if isinstance(last, tuple) else (last,)
+    chrt_info = next(item for item in items if isinstance(item, ChrtInfo))
+    sort_item = next(item for item in items if isinstance(item, model))
+
+    return rows, encode_cursor(getattr(sort_item, attr), chrt_info.id, params.sort)
@@ -0,0 +1,261 @@
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+
+
+# -------- Importing secret.py --------
+import secret
+
+# engine 이름별 pool 설정 (환경마다 secret.py 에서 덮어씀)
+# 예: POOL_SETTINGS = {"dc": {"pool_size": 20, "max_overflow": 10}}
+POOL_SETTINGS = getattr(secret, "POOL_SETTINGS", {})
+
+# 대기 시간에 따라 pool 크기를 자동으로 조절 (동기 engine 만)
+POOL_ADAPTIVE = getattr(secret, "POOL_ADAPTIVE", False)
+POOL_TUNE_INTERVAL = getattr(secret, "POOL_TUNE_INTERVAL", 30)         # seconds
+POOL_GROW_WAIT = getattr(secret, "POOL_GROW_WAIT", 0.05)               # seconds
+
+
+# -------- Metrics Imports --------
+from utils.metrics import Histogram, HistogramFamily, Gauge, Counter, register, register_collector
+
+
+# -------- Logging Setup --------
+from utils.logs import get_logger
+logger = get_logger(__name__)
+
+
+# -------- Settings --------
+def pool_options(name: str, **defaults) -> dict:
+    options = dict(defaults)
+    options.update({key: value for key, value in POOL_SETTINGS.get(name, {}).items()
+                    if key not in ("min_size", "max_size")})
+
+    return options
+
+
+# -------- Telemetry --------
+WAIT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0, 30.0)
+LIFETIME_BUCKETS = (1, 10, 60, 300, 900, 1800, 3600, 4 * 3600, 24 * 3600)
+
+class PoolTelemetry():
+    def __init__(self, name: str):
+        self.name = name
+        self.wait = Histogram(WAIT_BUCKETS)
+        self.lifetime = Histogram(LIFETIME_BUCKETS)
+        self.checkouts = 0
+        self.connects = 0
+        self.closes = 0
+        self.invalidations = 0      # pre-ping 실패, 끊긴 연결 포함
+        self.timeouts = 0
+        self._lock = threading.Lock()
+        self._reset_window()
+
+    def _reset_window(self):
+        self._window_waits = 0
+        self._window_wait_sum = 0.0
+        self._window_timeouts = 0
+        self._window_peak = 0
+
+    def observe_wait(self, seconds: float, checked_out: int):
+        self.wait.observe(seconds)
+
+        with self._lock:
+            self._window_waits += 1
+            self._window_wait_sum += seconds
+            self._window_peak = max(self._window_peak, checked_out)
+
+    def count(self, field: str):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+            if field == "timeouts":
+                self._window_timeouts += 1
+
+    def take_window(self) -> tuple[float, int, int]:
+        # (평균 대기 시간, timeout 수, 최대 사용 연결 수) 를 반환하고 초기화
+        with self._lock:
+            avg_wait = self._window_wait_sum / self._window_waits if self._window_waits > 0 else 0.0
+            window = (avg_wait, self._window_timeouts, self._window_peak)
+            self._reset_window()
+
+        return window
+
+class InstrumentedPoolMixin():
+    telemetry: PoolTelemetry | None = None
+
+    def __init__(self, creator, **kwargs):
+        super().__init__(creator, **kwargs)
+
+        # 크기만 바꾼 pool 을 같은 설정으로 다시 만들기 위해 생성 인자를 보관
+        self.creator = creator
+        self.options = kwargs
+
+    def _do_get(self):
+        started = time.perf_counter()
+
+        try:
+            return super()._do_get()
+        except PoolTimeout:
+            if self.telemetry is not None:
+                self.telemetry.count("timeouts")
+            raise
+        finally:
+            if self.telemetry is not None:
+                self.telemetry.observe_wait(time.perf_counter() - started, self.checkedout())
+
+    def recreate(self):
+        # engine.dispose() 로 새로 만든 pool 도 같은 telemetry 를 사용
+        pool = super().recreate()
+        pool.telemetry = self.telemetry
+
+        return pool
+
+    def resized(self, pool_size: int):
+        # recreate() 와 같지만 pool_size 만 바꿈 (engine event 도 그대로 넘김)
+        pool = self.__class__(self.creator, **{**self.options, "pool_size": pool_size, "_dispatch": self.dispatch})
+        pool.telemetry = self.telemetry
+
+        return pool
+
+class InstrumentedQueuePool(InstrumentedPoolMixin, QueuePool):
+    pass
+
+class InstrumentedAsyncPool(InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+# -------- Registry --------
+_engines: dict = dict()         # name -> (sync engine, telemetry)
+
+POOL_WAIT = register(HistogramFamily("db_pool_wait_seconds", "Connection checkout wait", ("pool",), WAIT_BUCKETS))
+POOL_LIFETIME = register(HistogramFamily("db_pool_connection_lifetime_seconds", "Connection lifetime", ("pool",), LIFETIME_BUCKETS))
+POOL_SIZE = register(Gauge("db_pool_size", "Configured pool size", ("pool",)))
+POOL_CHECKED_OUT = register(Gauge("db_pool_checked_out", "Connections in use", ("pool",)))
+POOL_OVERFLOW = register(Gauge("db_pool_overflow", "Connections beyond the pool size", ("pool",)))
+POOL_EVENTS = register(Counter("db_pool_events_total", "Pool events", ("pool", "event")))
+
+def _collect_pools():
+    for name, stats in pool_stats().items():
+        POOL_SIZE.set(name, value=stats["size"])
+        POOL_CHECKED_OUT.set(name, value=stats["checkedOut"])
+        POOL_OVERFLOW.set(name, value=stats["overflow"])
+
+        for field in ("checkouts", "connects", "closes", "invalidations", "timeouts"):
+            POOL_EVENTS.child(name, field).set(stats[field])
+
+register_collector(_collect_pools)
+
+def instrument_engine(name: str, engine):
+    # async engine 은 내부 sync engine 에 event 를 등록
+    sync_engine = getattr(engine, "sync_engine", engine)
+    telemetry = PoolTelemetry(name)
+    sync_engine.pool.telemetry = telemetry
+
+    @event.listens_for(sync_engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        connection_record.info["connected_at"] = time.monotonic()
+        telemetry.count("connects")
+
+    @event.listens_for(sync_engine, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        telemetry.count("checkouts")
+
+    @event.listens_for(sync_engine, "invalidate")
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        telemetry.count("invalidations")
+
+    @event.listens_for(sync_engine, "close")
+    def on_close(dbapi_connection, connection_record):
+        telemetry.count("closes")
+
+        connected_at = connection_record.info.pop("connected_at", None)
+
+        if connected_at is not None:
+            telemetry.lifetime.observe(time.monotonic() - connected_at)
+
+    _engines[name] = (sync_engine, telemetry)
+
+    POOL_WAIT.bind(name, histogram=telemetry.wait)
+    POOL_LIFETIME.bind(name, histogram=telemetry.lifetime)
+
+    return engine
+
+def pool_stats() -> dict:
+    results = dict()
+
+    for name, (engine, telemetry) in _engines.items():
+        pool = engine.pool
+
+        results[name] = {
+            "size": pool.size(),
+            "checkedOut": pool.checkedout(),
+            "checkedIn": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+            "maxOverflow": pool._max_overflow,
+            "checkouts": telemetry.checkouts,
+            "connects": telemetry.connects,
+            "closes": telemetry.closes,
+            "invalidations": telemetry.invalidations,
+            "timeouts": telemetry.timeouts,
+            "waitSeconds": telemetry.wait.snapshot(),
+            "lifetimeSeconds": telemetry.lifetime.snapshot(),
+        }
+
+    return results
+
+
+# -------- Adaptive Sizing --------
+def resize_pool(engine, new_size: int):
+    # QueuePool 내부 값을 고치지 않고 engine.dispose() 처럼 새 pool 로 교체
+    # 사용 중인 연결은 이전 pool 로 반환된 뒤 이전 pool 과 함께 정리됨
+    old_pool = engine.pool
+    engine.pool = old_pool.resized(new_size)
+    old_pool.dispose()
+
+def _size_bounds(name: str, size: int) -> tuple[int, int]:
+    settings = POOL_SETTINGS.get(name, {})
+
+    return settings.get("min_size", max(1, size // 2)), settings.get("max_size", size * 2)
+
+def _tune(bounds: dict):
+    for name, (engine, telemetry) in list(_engines.items()):
+        pool = engine.pool
+
+        if name not in bounds or type(pool) is not InstrumentedQueuePool:
+            continue
+
+        min_size, max_size = bounds[name]
+        avg_wait, timeouts, peak = telemetry.take_window()
+        size = pool.size()
+
+        if (avg_wait > POOL_GROW_WAIT or timeouts > 0) and size < max_size:
+            resize_pool(engine, size + 1)
+            logger.info("Pool %s grows to %s (avg wait %.1fms, timeouts %s)", name, size + 1, avg_wait * 1000, timeouts)
+
+        elif avg_wait <= POOL_GROW_WAIT and timeouts == 0 and peak < size - 1 and size > min_size:
+            resize_pool(engine, size - 1)
+            logger.info("Pool %s shrinks to %s (peak checked out %s)", name, size - 1, peak)
+
+def start_pool_tuner():
+    if not POOL_ADAPTIVE:
+        return
+
+    # 설정된 크기를 기준으로 범위를 고정
+    bounds = {name: _size_bounds(name, engine.pool.size())
+              for name, (engine, _) in _engines.items()
+              if type(engine.pool) is InstrumentedQueuePool}
+
+    def run():
+        while True:
+            time.sleep(POOL_TUNE_INTERVAL)
+
+            try:
+                _tune(bounds)
+            except Exception as e:
+                logger.error("Pool tuning failed: %s", e)
+
+    threading.Thread(target=run, name="pool-tuner", daemon=True).start()
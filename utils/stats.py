@@ -0,0 +1,160 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import threading
+import time
+
+from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import text
+
+
+# -------- Importing secret.py --------
+from secret import ATLAS_TARGET_SCHEMA
+import secret
+
+STATS_WORKERS = getattr(secret, "STATS_WORKERS", 1)
+STATS_RETRY_SECONDS = getattr(secret, "STATS_RETRY_SECONDS", 600)     # 계산 실패 후 다시 시도하기까지
+
+
+# -------- DBM Imports --------
+from utils.dbm import atlas_engine, dc_engine, ChrtInfo, ChrtStat
+from utils.structure import TABLE_NAME, has_person_id, is_on_atlas
+
+
+# -------- Logging Setup --------
+from utils.logs import get_logger
+logger = get_logger(__name__)
+
+
+# -------- Statistics --------
+# 코호트별 테이블 행 수는 요청마다 계산하지 않고 chrt_stat 에 저장된 값을 사용
+# 값이 없거나 ATLAS 수정일이 바뀐 경우 백그라운드에서 다시 계산
+_executor = ThreadPoolExecutor(max_workers=STATS_WORKERS, thread_name_prefix="stats")
+_in_flight: set[int] = set()
+_in_flight_lock = threading.Lock()
+
+# 계산에 실패한 코호트는 잠시 다시 시도하지 않음 (목록 요청마다 재시도 방지)
+_failed: dict[int, tuple[datetime, float]] = dict()     # ext_id -> (modified_date, 실패 시각)
+
+def _count_subjects(session_atlas: Session, ext_id: int) -> int:
+    stmt = text("""
+        SELECT COUNT(DISTINCT subject_id) FROM demo_cdm_results.cohort
+        WHERE cohort_definition_id = :ext_id
+        """)
+
+    return session_atlas.exec(stmt, params={"ext_id": ext_id}).scalar() or 0
+
+def _count_records(session_atlas: Session, table: str, ext_id: int) -> int:
+    table = table.lower()
+
+    exists = session_atlas.exec(text(f"SELECT to_regclass('{ATLAS_TARGET_SCHEMA}.{table}')")).scalar()
+
+    if exists is None:
+        return 0
+
+    if has_person_id(table):
+        stmt = text(f"""
+            SELECT COUNT(*) FROM {ATLAS_TARGET_SCHEMA}.{table}
+            WHERE person_id IN (
+                SELECT subject_id FROM demo_cdm_results.cohort
+                WHERE cohort_definition_id = :ext_id)
+            """)
+
+        return session_atlas.exec(stmt, params={"ext_id": ext_id}).scalar() or 0
+
+    # 대상자와 관계없는 테이블(vocabulary 등)은 통계 정보의 추정치를 사용
+    stmt = text("""
+        SELECT GREATEST(c.reltuples, 0)::BIGINT FROM pg_class c
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = :schema AND c.relname = :table
+        """)
+
+    return session_atlas.exec(stmt, params={"schema": ATLAS_TARGET_SCHEMA, "table": table}).scalar() or 0
+
+def compute_stats(ext_id: int, modified_date: datetime):
+    started_at = datetime.now()
+
+    with Session(atlas_engine) as session_atlas:
+        subject_count = _count_subjects(session_atlas, ext_id)
+        record_counts = [_count_records(session_atlas, table, ext_id) if is_on_atlas(table) else 0
+                         for table in TABLE_NAME.__members__.keys()]
+
+    with Session(dc_engine) as session_dc:
+        stmt = select(ChrtStat).where(ChrtStat.ext_id == ext_id)
+        chrt_stat = session_dc.exec(stmt).first()
+
+        if chrt_stat is None:
+            chrt_stat = ChrtStat(ext_id=ext_id)
+
+        chrt_stat.modified_date = modified_date
+        chrt_stat.subject_count = subject_count
+        chrt_stat.record_counts = record_counts
+        chrt_stat.computed_at = datetime.now()
+
+        session_dc.add(chrt_stat)
+        session_dc.commit()
+
+    logger.debug("Statistics of cohort definition %s computed in %.2fs", ext_id, (datetime.now() - started_at).total_seconds())
+
+def schedule_stats(ext_id: int, modified_date: datetime):
+    with _in_flight_lock:
+        if ext_id in _in_flight:
+            return
+
+        # ATLAS 수정일이 바뀌었으면 대기 시간과 관계없이 다시 계산
+        failed = _failed.get(ext_id)
+
+        if failed is not None and failed[0] == modified_date and time.monotonic() - failed[1] < STATS_RETRY_SECONDS:
+            return
+
+        _in_flight.add(ext_id)
+
+    def run():
+        try:
+            compute_stats(ext_id, modified_date)
+
+            with _in_flight_lock:
+                _failed.pop(ext_id, None)
+        except Exception as e:
+            logger.error("Computing statistics of cohort definition %s failed: %s", ext_id, e)
+
+            with _in_flight_lock:
+                _failed[ext_id] = (modified_date, time.monotonic())
+        finally:
+            with _in_flight_lock:
+                _in_flight.discard(ext_id)
+
+    _executor.submit(run)
+
+async def load_stats(session_dc: AsyncSession, chrt_infos: list[ChrtInfo]) -> dict[int, ChrtStat]:
+    if len(chrt_infos) == 0:
+        return dict()
+
+    stmt = select(ChrtStat).where(ChrtStat.ext_id.in_([ci.ext_id for ci in chrt_infos]))
+    chrt_stats = {cs.ext_id: cs for cs in (await session_dc.exec(stmt)).all()}
+
+    results = dict()
+
+    for ci in chrt_infos:
+        chrt_stat = chrt_stats.get(ci.ext_id)
+
+        # 오래된 값은 그대로 보여주고 새로 계산
+        if chrt_stat is None or chrt_stat.modified_date != ci.modified_at:
+            schedule_stats(ci.ext_id, ci.modified_at)
+
+        if chrt_stat is not None:
+            results[ci.id] = chrt_stat
+
+    return results
+
+def patient_count(chrt_stat: ChrtStat | None) -> int:
+    if chrt_stat is None or chrt_stat.subject_count is None:
+        return 0
+
+    return chrt_stat.subject_count
+
+def record_counts(chrt_stat: ChrtStat | None) -> list[int]:
+    if chrt_stat is None or chrt_stat.record_counts is None or len(chrt_stat.record_counts) != len(TABLE_NAME):
+        return [0 for i in range(len(TABLE_NAME))]
+
+    return list(chrt_stat.record_counts)
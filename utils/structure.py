@@ -3,9 +3,8 @@ from enum import Enum, auto
 
 
 # -------- Logging Setup --------
-import logging
-logger = logging.getLogger("uvicorn.error")
-logger.setLevel(logging.DEBUG)
+from utils.logs import get_logger
+logger = get_logger(__name__)
 
 
 class TABLE_NAME(Enum):
@@ -178,16 +177,25 @@ class SchemaInfoTemp():
         }
     
 class IRBDRBTemp():
-    def __init__(self, name: str, path: str, size: int):
+    def __init__(self, name: str, path: str, size: int | None,
+                 mime: str | None = None, sha256: str | None = None, uploaded_at: datetime | None = None, id: int | None = None):
+        self.id = id                # cert_oath id (/documents/{id} 로 내려받음)
         self.name = name
         self.path = path
         self.size = size
+        self.mime = mime
+        self.sha256 = sha256
+        self.uploaded_at = uploaded_at
 
     def json(self):
         return {
+            "id": self.id,
             "name": self.name,
             "path": self.path,
-            "size": f"{self.size / 1024 / 1024:.2}MB"
+            "size": None if self.size is None else f"{self.size / 1024 / 1024:.2}MB",
+            "mime": self.mime,
+            "sha256": self.sha256,
+            "uploadedAt": None if self.uploaded_at is None else self.uploaded_at.strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
         }
 
 class FileGroupTemp():
@@ -8,22 +8,37 @@ from sqlmodel import select, Session
 from utils.dbm import (
     CohortDefinition,
     SecUser, SecUserRole,
-    ChrtInfo, SchmInfo
+    ChrtInfo, ChrtCert, SchmInfo, SchmSync
 )
+from utils.jobs import enqueue_refresh, list_jobs
+from utils.identity import resolve_identity_sync
+from utils.fanout import fan_out
 
 from sqlmodel import Session, select, or_
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 
 # -------- Logging Setup --------
-import logging
-logger = logging.getLogger("uvicorn.error")
-logger.setLevel(logging.DEBUG)
+from utils.logs import get_logger
+logger = get_logger(__name__)
 
 
 # -------- Functions --------
 def compare_dates(date1: datetime, date2: datetime) -> bool:
     return date1 < date2
 
+def index_by(items: list, key: str) -> dict:
+    # 중첩 for 문 대신 dict 로 join
+    return {getattr(item, key): item for item in items}
+
+def group_by(items: list, key: str) -> dict[object, list]:
+    groups = dict()
+
+    for item in items:
+        groups.setdefault(getattr(item, key), []).append(item)
+
+    return groups
+
 def convert_size(size_bytes):
     import math
     if size_bytes == 0:
@@ -37,16 +52,8 @@ def convert_size(size_bytes):
 
 # -------- DB Funcitons --------
 def findout_id(session_atlas: Session, name: str) -> int:
-    stmt = select(SecUser).where(SecUser.name == name)
-    user = session_atlas.exec(stmt).first()
-
-    if not user:
-        logger.error("User not found in database")
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    logger.debug(f"User id is {user.id}")
-
-    return user.id
+    # 사용자 정보는 identity 캐시에서 조회
+    return resolve_identity_sync(session_atlas, name).id
 
 def findout_name(session_atlas: Session, id: int) -> str:
     stmt = select(SecUser).where(SecUser.id == id)
@@ -56,21 +63,11 @@ def findout_name(session_atlas: Session, id: int) -> str:
         logger.error("User not found in database")
         raise HTTPException(status_code=404, detail="User not found")
     
-    logger.debug(f"User name is {user.name}")
-
     return user.name
 
 def findout_role(session_atlas: Session, name: str) -> bool:
-    user_id = findout_id(session_atlas, name)
-    stmt = select(SecUserRole).where(SecUserRole.user_id == user_id).where(
-        or_(SecUserRole.role_id==2, SecUserRole.role_id>=1000)
-    )
-    role = session_atlas.exec(stmt).all()
-
-    if not role:
-        return True
-    
-    return False
+    # True 면 public, False 면 admin
+    return not resolve_identity_sync(session_atlas, name).is_admin
 
 def mapping_id_name(session_atlas: Session, ids: list[int]) -> dict:
     stmt = select(SecUser).where(SecUser.id.in_(ids))
@@ -78,27 +75,66 @@ def mapping_id_name(session_atlas: Session, ids: list[int]) -> dict:
 
     return {user.id: user.name for user in users}
 
-def get_syncable(session_atlas: Session, session_dc: Session, name: str) -> dict:
+async def _all(session: AsyncSession, stmt) -> list:
+    return (await session.exec(stmt)).all()
+
+async def get_syncable(session_atlas: AsyncSession, session_dc: AsyncSession, user_id: int) -> dict:
 
     results = dict()
 
-    stmt = select(SecUser).where(SecUser.name == name)
-    sec_user = session_atlas.exec(stmt).first()
+    # DataCenter 코호트와 사용자가 만든 ATLAS 코호트 정의를 동시에 조회
+    stmt_dc = select(ChrtInfo).where(ChrtInfo.owner == user_id)
+    stmt_atlas = select(CohortDefinition).where(CohortDefinition.created_by_id == user_id)
+
+    chrt_infos, chrt_defs = await fan_out(
+        _all(session_dc, stmt_dc),
+        _all(session_atlas, stmt_atlas))
+
+    chrt_defs_by_id = index_by(chrt_defs, "id")
+
+    # 만든 사람이 다른 정의만 한 번 더 조회
+    missing_ext_ids = [ci.ext_id for ci in chrt_infos if ci.ext_id not in chrt_defs_by_id]
+
+    if len(missing_ext_ids) > 0:
+        stmt = select(CohortDefinition).where(CohortDefinition.id.in_(missing_ext_ids))
+        chrt_defs_by_id.update(index_by(await _all(session_atlas, stmt), "id"))
+
+    for ci in chrt_infos:
+        cd = chrt_defs_by_id.get(ci.ext_id)
+
+        if cd is not None:
+            results[ci.id] = not ci.modified_at < cd.modified_date
+
+    return results
+
+async def refresh_incrementally(session_dc: AsyncSession, chrt_info: ChrtInfo, chrt_def: CohortDefinition) -> bool:
+    # 승인되어 이미 복사된 스키마만 incremental 갱신 가능
+    stmt = select(ChrtCert).where(ChrtCert.id == chrt_info.id)
+    chrt_cert = (await session_dc.exec(stmt)).first()
+
+    if chrt_cert is None or chrt_cert.cur_status != "approved":
+        return False
+
+    stmt = select(SchmInfo).where(SchmInfo.schema_from == chrt_info.id)
+    schm_info = (await session_dc.exec(stmt)).first()
+
+    if schm_info is None:
+        return False
+
+    stmt = select(SchmSync).where(SchmSync.id == schm_info.id)
+    schm_sync = (await session_dc.exec(stmt)).first()
 
-    stmt = select(ChrtInfo).where(ChrtInfo.owner == sec_user.id)
-    chrt_infos = session_dc.exec(stmt).all()
+    if schm_sync is None or schm_sync.ext_modified_at is None:
+        return False
 
-    holding_ext_ids = [ci.ext_id for ci in chrt_infos]
+    # modified_at 은 작업이 성공한 뒤 record_watermark 에서 갱신
+    #   그 전에 다시 요청하면 진행 중인 작업을 그대로 사용
+    for job in list_jobs(chrt_info.id):
+        if job.status in ("queued", "running"):
+            return True
 
-    stmt = select(CohortDefinition).where(CohortDefinition.id.in_(holding_ext_ids))
-    chrt_defs = session_atlas.exec(stmt).all()
+    job = enqueue_refresh(chrt_info.id, f"schema_{schm_info.owner}_{schm_info.id}")
 
-    for cd in chrt_defs:
-        for ci in chrt_infos:
-            if ci.ext_id == cd.id:
-                if ci.modified_at < cd.modified_date:
-                    results[ci.id] = False
-                else:
-                    results[ci.id] = True
+    logger.debug("Cohort %s is refreshed incrementally by job %s", chrt_info.id, job.id)
 
-    return results
\ No newline at end of file
+    return True
\ No newline at end of file
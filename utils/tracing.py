@@ -0,0 +1,144 @@
+from contextlib import contextmanager
+import threading
+import time
+
+from sqlalchemy import event
+
+
+# -------- Importing secret.py --------
+import secret
+
+SLOW_QUERY_SECONDS = getattr(secret, "SLOW_QUERY_SECONDS", 0.5)
+QUERY_BUDGET = getattr(secret, "QUERY_BUDGET", 50)                 # 요청당 최대 쿼리 수
+
+# SQL 앞에 route 주석을 붙여 pg_stat_activity 등 DB 쪽에서도 출처를 확인
+QUERY_ROUTE_COMMENT = getattr(secret, "QUERY_ROUTE_COMMENT", False)
+
+
+# -------- Metrics Imports --------
+from utils.metrics import current_request, record_query, register_request_hook, register, Counter
+
+
+# -------- Logging Setup --------
+from utils.logs import get_logger
+logger = get_logger(__name__)
+
+
+# -------- Redaction --------
+def redact(parameters) -> object:
+    # 값은 남기지 않고 타입만 기록
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+
+    if isinstance(parameters, (list, tuple)):
+        if len(parameters) > 0 and isinstance(parameters[0], (list, tuple, dict)):
+            return f"<{len(parameters)} rows>"
+
+        return [type(value).__name__ for value in parameters]
+
+    return type(parameters).__name__
+
+def _short(statement: str, limit: int = 500) -> str:
+    statement = " ".join(statement.split())
+
+    return statement if len(statement) <= limit else statement[:limit] + " ..."
+
+
+# -------- Query Counting Harness --------
+# 테스트에서 endpoint 별 쿼리 수를 확인할 때 사용
+#   with count_queries() as queries:
+#       client.get("/api/cohort/")
+#   assert queries.by_route["/api/cohort/"] <= 5
+class QueryCounter():
+    def __init__(self):
+        self.count = 0
+        self.by_route: dict[str, int] = dict()
+        self.by_engine: dict[str, int] = dict()
+        self.statements: list[str] = []
+        self._lock = threading.Lock()
+
+    def add(self, engine_name: str, route: str, statement: str):
+        with self._lock:
+            self.count += 1
+            self.by_route[route] = self.by_route.get(route, 0) + 1
+            self.by_engine[engine_name] = self.by_engine.get(engine_name, 0) + 1
+            self.statements.append(statement)
+
+_counters: list[QueryCounter] = []
+_counters_lock = threading.Lock()
+
+@contextmanager
+def count_queries():
+    counter = QueryCounter()
+
+    with _counters_lock:
+        _counters.append(counter)
+
+    try:
+        yield counter
+    finally:
+        with _counters_lock:
+            _counters.remove(counter)
+
+
+# -------- Tracing --------
+BUDGET_EXCEEDED = register(Counter("http_request_query_budget_exceeded_total",
+                                   "Requests that ran more SQL statements than QUERY_BUDGET", ("route",)))
+
+def _route() -> str:
+    stats = current_request.get()
+
+    return stats.route if stats is not None else "background"
+
+def instrument_queries(name: str, engine):
+    # async engine 은 내부 sync engine 에 event 를 등록
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(sync_engine, "before_cursor_execute", retval=True)
+    def before_execute(conn, cursor, statement, parameters, context, executemany):
+        context._query_started = time.perf_counter()
+
+        if QUERY_ROUTE_COMMENT:
+            statement = f"/* route:{_route().replace('*/', '')} */ {statement}"
+
+        return statement, parameters
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context._query_started
+
+        record_query(name, elapsed)
+
+        stats = current_request.get()
+        route = stats.route if stats is not None else "background"
+
+        if stats is not None:
+            stats.statements[statement] = stats.statements.get(statement, 0) + 1
+
+        if elapsed >= SLOW_QUERY_SECONDS:
+            logger.warning("Slow query on %s (%.1fms) route=%s params=%s sql=%s", name, elapsed * 1000, route, redact(parameters), _short(statement))
+
+        if _counters:
+            with _counters_lock:
+                for counter in _counters:
+                    counter.add(name, route, statement)
+
+    return engine
+
+def check_budget(stats):
+    if stats.queries <= QUERY_BUDGET:
+        return
+
+    try:
+        route = stats.route
+        BUDGET_EXCEEDED.inc(route)
+
+        # 가장 많이 반복된 문장을 함께 남겨 루프 안의 쿼리를 찾기 쉽게 함
+        repeated = sorted(stats.statements.items(), key=lambda item: item[1], reverse=True)[:3]
+        top = "; ".join(f"{count}x {_short(statement, 200)}" for statement, count in repeated)
+
+        logger.warning("Query budget exceeded: %s %s ran %s queries (%.1fms, budget %s). Top: %s", stats.method, route, stats.queries, stats.query_time * 1000, QUERY_BUDGET, top)
+    except Exception as e:
+        logger.error("Checking query budget failed: %s", e)
+
+register_request_hook(check_budget)
@@ -0,0 +1,249 @@
+from datetime import datetime
+import queue
+import threading
+
+from sqlmodel import Session
+
+
+# -------- Importing secret.py --------
+from secret import ATLAS_TARGET_SCHEMA
+import secret
+
+# "fdw" 또는 "copy"
+TRANSFER_ENGINE = getattr(secret, "TRANSFER_ENGINE", "fdw")
+COPY_BUFFER_SIZE = getattr(secret, "COPY_BUFFER_SIZE", 1024 * 1024)     # chunk 하나의 크기
+COPY_BUFFER_CHUNKS = getattr(secret, "COPY_BUFFER_CHUNKS", 16)          # 메모리에 쌓아둘 최대 chunk 수
+
+
+# -------- DBM Imports --------
+from utils.dbm import (
+    atlas_engine, dc_engine,
+    table_exists, table_finish_ddl, run_tables_parallel,
+    COPY_CONCURRENCY
+)
+from utils.structure import has_person_id
+
+
+# -------- Logging Setup --------
+from utils.logs import get_logger
+logger = get_logger(__name__)
+
+
+# -------- Transfer Stats --------
+class TransferStats():
+    def __init__(self, table: str, rows: int = 0, bytes: int = 0, elapsed: float = 0.0):
+        self.table = table
+        self.rows = rows
+        self.bytes = bytes
+        self.elapsed = elapsed
+
+    def rows_per_sec(self) -> float:
+        return round(self.rows / self.elapsed, 1) if self.elapsed > 0 else 0.0
+
+    def mb_per_sec(self) -> float:
+        return round(self.bytes / 1024 / 1024 / self.elapsed, 2) if self.elapsed > 0 else 0.0
+
+    def json(self):
+        return {
+            "table": self.table,
+            "rows": self.rows,
+            "bytes": self.bytes,
+            "elapsed": round(self.elapsed, 3),
+            "rowsPerSec": self.rows_per_sec(),
+            "mbPerSec": self.mb_per_sec()
+        }
+
+
+# -------- Bounded Pipe --------
+# COPY TO STDOUT 으로 받은 데이터를 COPY FROM STDIN 으로 바로 넘기는 파이프
+# 최대 COPY_BUFFER_CHUNKS 개의 chunk 만 메모리에 유지
+class _BoundedPipe():
+    def __init__(self, chunk_size: int = COPY_BUFFER_SIZE, max_chunks: int = COPY_BUFFER_CHUNKS):
+        self.chunk_size = chunk_size
+        self.chunks = queue.Queue(maxsize=max_chunks)
+        self.pending = bytearray()
+        self.buffer = b""
+        self.bytes = 0
+        self.error = None
+        self.aborted = threading.Event()
+        self.eof = False
+
+    # -------- Writer (source) --------
+    def write(self, data) -> int:
+        self.pending += data
+
+        if len(self.pending) >= self.chunk_size:
+            self._put(bytes(self.pending))
+            self.pending = bytearray()
+
+        return len(data)
+
+    def close_writer(self, error: Exception | None = None):
+        self.error = error
+
+        # reader 가 이미 중단된 경우 더 넘길 필요 없음
+        if self.aborted.is_set():
+            return
+
+        if len(self.pending) > 0 and error is None:
+            self._put(bytes(self.pending))
+            self.pending = bytearray()
+
+        self._put(None)
+
+    def _put(self, chunk: bytes | None):
+        while not self.aborted.is_set():
+            try:
+                self.chunks.put(chunk, timeout=1)
+                return
+            except queue.Full:
+                continue
+
+        raise RuntimeError("Reader aborted the transfer")
+
+    # -------- Reader (target) --------
+    def read(self, size: int = -1) -> bytes:
+        while not self.eof and (size < 0 or len(self.buffer) < size):
+            chunk = self.chunks.get()
+
+            if chunk is None:
+                self.eof = True
+
+                if self.error is not None:
+                    raise self.error
+                break
+
+            self.buffer += chunk
+            self.bytes += len(chunk)
+
+        if size < 0:
+            data, self.buffer = self.buffer, b""
+        else:
+            data, self.buffer = self.buffer[:size], self.buffer[size:]
+
+        return data
+
+    def abort(self):
+        self.aborted.set()
+
+
+# -------- Table Definition --------
+def _source_columns(cursor, table: str) -> list[tuple[str, str]]:
+    cursor.execute("""
+        SELECT a.attname, format_type(a.atttypid, a.atttypmod)
+        FROM pg_attribute a
+            JOIN pg_class c ON c.oid = a.attrelid
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = %s AND c.relname = %s AND a.attnum > 0 AND NOT a.attisdropped
+        ORDER BY a.attnum
+        """, (ATLAS_TARGET_SCHEMA, table))
+
+    return cursor.fetchall()
+
+def _source_query(table: str, columns: list[tuple[str, str]], cohort_definition_id: int) -> str:
+    column_str = ", ".join(f'"{name}"' for name, _ in columns)
+
+    if has_person_id(table):
+        return f"""
+        SELECT {column_str} FROM {ATLAS_TARGET_SCHEMA}.{table}
+        WHERE person_id IN (
+            SELECT subject_id FROM demo_cdm_results.cohort
+            WHERE cohort_definition_id = {int(cohort_definition_id)})
+        """
+
+    return f"SELECT {column_str} FROM {ATLAS_TARGET_SCHEMA}.{table}"
+
+
+# -------- Streaming Copy --------
+def stream_table(
+        schema_name: str,
+        table: str,
+        cohort_definition_id: int) -> TransferStats:
+
+    table = table.lower()
+    stats = TransferStats(table)
+
+    with Session(dc_engine) as session_dc:
+        if table_exists(session_dc, schema_name, table):
+            logger.debug("%s.%s already exists, skipped", schema_name, table)
+            return stats
+
+    src_conn = atlas_engine.raw_connection()
+    dst_conn = dc_engine.raw_connection()
+
+    try:
+        src_cur = src_conn.cursor()
+        dst_cur = dst_conn.cursor()
+
+        columns = _source_columns(src_cur, table)
+
+        if len(columns) == 0:
+            raise ValueError(f"{ATLAS_TARGET_SCHEMA}.{table} is not found on ATLAS")
+
+        column_defs = ", ".join(f'"{name}" {type_name}' for name, type_name in columns)
+        dst_cur.execute(f"CREATE TABLE {schema_name}.{table} ({column_defs});")
+
+        pipe = _BoundedPipe()
+        copy_to = f"COPY ({_source_query(table, columns, cohort_definition_id)}) TO STDOUT WITH (FORMAT binary)"
+        copy_from = f"COPY {schema_name}.{table} FROM STDIN WITH (FORMAT binary)"
+
+        def produce():
+            try:
+                src_cur.copy_expert(copy_to, pipe, size=COPY_BUFFER_SIZE)
+                pipe.close_writer()
+            except Exception as e:
+                try:
+                    pipe.close_writer(e)
+                except RuntimeError:
+                    pass
+
+        started_at = datetime.now()
+
+        producer = threading.Thread(target=produce, name=f"copy-out-{table}", daemon=True)
+        producer.start()
+
+        try:
+            dst_cur.copy_expert(copy_from, pipe, size=COPY_BUFFER_SIZE)
+        except Exception:
+            pipe.abort()
+            raise
+        finally:
+            producer.join()
+
+        stats.rows = max(dst_cur.rowcount, 0)
+        stats.bytes = pipe.bytes
+        stats.elapsed = (datetime.now() - started_at).total_seconds()
+
+        dst_cur.execute(table_finish_ddl(schema_name, table))
+
+        # 테이블 하나가 실패하면 해당 테이블만 롤백
+        dst_conn.commit()
+        src_conn.commit()
+
+    except Exception:
+        dst_conn.rollback()
+        src_conn.rollback()
+        raise
+
+    finally:
+        dst_conn.close()
+        src_conn.close()
+
+    logger.info("Streamed %s.%s: %s rows, %s rows/s, %s MB/s", schema_name, table, stats.rows, stats.rows_per_sec(), stats.mb_per_sec())
+
+    return stats
+
+def stream_tables_parallel(
+        schema_name: str,
+        tables: list[str],
+        cohort_definition_id: int,
+        concurrency: int = COPY_CONCURRENCY,
+        on_start=None,
+        on_done=None) -> dict:
+
+    # 테이블마다 ATLAS, DataCenter 양쪽 connection 을 하나씩 사용
+    return run_tables_parallel(
+        tables,
+        lambda table: stream_table(schema_name, table, cohort_definition_id),
+        concurrency, on_start, on_done,
+        engines=[atlas_engine, dc_engine])
@@ -0,0 +1,207 @@
+from fastapi import HTTPException, UploadFile
+
+import hashlib
+import json
+import mimetypes
+import os
+import tempfile
+
+import aiofiles
+
+
+# -------- Importing secret.py --------
+import secret
+
+UPLOAD_CHUNK_SIZE = getattr(secret, "UPLOAD_CHUNK_SIZE", 1024 * 1024)                 # 1 MB
+UPLOAD_MAX_FILE_SIZE = getattr(secret, "UPLOAD_MAX_FILE_SIZE", 50 * 1024 * 1024)       # 50 MB
+UPLOAD_MAX_REQUEST_SIZE = getattr(secret, "UPLOAD_MAX_REQUEST_SIZE", 200 * 1024 * 1024)
+
+# multipart 경계, 헤더, 일반 form 필드에 허용하는 크기
+UPLOAD_FORM_OVERHEAD = getattr(secret, "UPLOAD_FORM_OVERHEAD", 1024 * 1024)
+
+
+# -------- Logging Setup --------
+from utils.logs import get_logger
+logger = get_logger(__name__)
+
+
+# -------- Paths --------
+DOCS_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "documents"))
+
+# 같은 파일 시스템 안에 있어야 os.replace 가 원자적으로 동작
+STAGING_PATH = os.path.join(DOCS_PATH, ".staging")
+
+
+# -------- MIME --------
+# 확장자보다 파일 앞부분을 우선 (이름만 .pdf 인 파일 구분)
+_SIGNATURES = [
+    (b"%PDF-", "application/pdf"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF8", "image/gif"),
+    (b"\xd0\xcf\x11\xe0", "application/x-ole-storage"),        # hwp, doc, xls
+]
+
+def guess_mime(filename: str, head: bytes = b"") -> str:
+    for signature, mime in _SIGNATURES:
+        if head.startswith(signature):
+            # OLE 파일은 확장자로 세부 형식 판단
+            if mime == "application/x-ole-storage":
+                return mimetypes.guess_type(filename)[0] or mime
+
+            return mime
+
+    return mimetypes.guess_type(filename)[0] or "application/octet-stream"
+
+
+# -------- Staged Uploads --------
+class StagedUpload():
+    def __init__(self, filename: str, tmp_path: str, size: int, sha256: str, mime: str):
+        self.filename = filename
+        self.tmp_path = tmp_path
+        self.size = size
+        self.sha256 = sha256
+        self.mime = mime
+
+    def discard(self):
+        if self.tmp_path is not None and os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+        self.tmp_path = None
+
+class UploadBudget():
+    # 요청 하나에서 받은 전체 크기를 제한
+    def __init__(self, limit: int = UPLOAD_MAX_REQUEST_SIZE):
+        self.limit = limit
+        self.used = 0
+
+    def take(self, size: int):
+        self.used += size
+
+        if self.used > self.limit:
+            raise HTTPException(status_code=413, detail=f"Upload exceeds {self.limit} bytes per request")
+
+async def stage_upload(file: UploadFile, budget: UploadBudget) -> StagedUpload:
+    # 고정 크기 chunk 로 임시 파일에 쓰면서 hash 계산 (메모리 사용량은 chunk 크기)
+    os.makedirs(STAGING_PATH, exist_ok=True)
+
+    fd, tmp_path = tempfile.mkstemp(dir=STAGING_PATH, suffix=".part")
+    os.close(fd)
+
+    digest = hashlib.sha256()
+    size = 0
+    head = b""
+
+    try:
+        async with aiofiles.open(tmp_path, "wb") as out_file:
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_SIZE)
+
+                if not chunk:
+                    break
+
+                size += len(chunk)
+
+                if size > UPLOAD_MAX_FILE_SIZE:
+                    raise HTTPException(status_code=413, detail=f"{file.filename} exceeds {UPLOAD_MAX_FILE_SIZE} bytes")
+
+                budget.take(len(chunk))
+                digest.update(chunk)
+
+                if len(head) < 16:
+                    head += chunk[:16]
+
+                await out_file.write(chunk)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+    return StagedUpload(file.filename, tmp_path, size, digest.hexdigest(), guess_mime(file.filename, head))
+
+async def stage_uploads(files: list[UploadFile]) -> dict[str, StagedUpload]:
+    # 파일 이름 -> StagedUpload. 하나라도 실패하면 이미 받은 파일도 정리
+    budget = UploadBudget()
+    staged: dict[str, StagedUpload] = dict()
+
+    try:
+        for file in files:
+            previous = staged.pop(file.filename, None)
+
+            if previous is not None:
+                previous.discard()
+
+            staged[file.filename] = await stage_upload(file, budget)
+    except BaseException:
+        discard_uploads(staged)
+        raise
+
+    logger.debug("Staged %s uploads (%s bytes)", len(staged), budget.used)
+
+    return staged
+
+def commit_upload(staged: StagedUpload, dest_path: str):
+    # 완성된 파일만 최종 위치에 보이도록 rename
+    os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+    os.replace(staged.tmp_path, dest_path)
+
+    staged.tmp_path = None
+
+def discard_uploads(staged: dict[str, StagedUpload]):
+    for upload in staged.values():
+        try:
+            upload.discard()
+        except OSError as e:
+            logger.warning("Removing staged upload %s failed: %s", upload.tmp_path, e)
+
+
+# -------- Request Size Limit --------
+class UploadLimitMiddleware():
+    # form 을 읽기 전에 (Starlette 가 body 전체를 임시 파일로 받기 전에) 요청 크기를 제한
+    #   Content-Length 가 있으면 body 를 읽지 않고 413, 없으면 (chunked) 받는 도중 초과할 때 413
+    def __init__(self, app, limit: int = UPLOAD_MAX_REQUEST_SIZE + UPLOAD_FORM_OVERHEAD):
+        self.app = app
+        self.limit = limit
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        headers = dict(scope["headers"])
+
+        if not headers.get(b"content-type", b"").startswith(b"multipart/form-data"):
+            return await self.app(scope, receive, send)
+
+        content_length = headers.get(b"content-length")
+
+        if content_length is not None and content_length.isdigit() and int(content_length) > self.limit:
+            logger.info("Upload of %s bytes rejected before reading", int(content_length))
+            return await self._reject(send)
+
+        received = 0
+
+        async def receive_wrapper():
+            nonlocal received
+
+            message = await receive()
+
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+
+                if received > self.limit:
+                    # form 을 읽는 route 에서 발생하므로 HTTPException 처리로 413 응답
+                    raise HTTPException(status_code=413, detail=f"Upload exceeds {UPLOAD_MAX_REQUEST_SIZE} bytes per request")
+
+            return message
+
+        await self.app(scope, receive_wrapper, send)
+
+    async def _reject(self, send):
+        body = json.dumps({"detail": f"Upload exceeds {UPLOAD_MAX_REQUEST_SIZE} bytes per request"}).encode()
+
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()),
+                        (b"connection", b"close")],
+        })
+        await send({"type": "http.response.body", "body": body})